@@ -2,8 +2,8 @@ import sys
 import os
 import logging
 import chardet
-import re
 from logger import get_workflow_logger
+from text_normalizer import format_subtitle_line
 
 # 設定日誌記錄
 logger = get_workflow_logger('3', 'subtitle_formatter')  # Stage 3 因為這是字幕處理階段
@@ -77,26 +77,7 @@ def format_subtitle_spacing(input_file, output_file=None):
                 processed_lines.append(line)
                 continue
             
-            line = line.replace(r'\N', '__NEWLINE__')
-            line = line.replace('……', '⋯⋯')
-            
-            half_width_punctuation = ['-', '=', '+', '*', '/', '\\']
-            for punct in half_width_punctuation:
-                line = re.sub(re.escape(punct), f' {punct} ', line)
-            
-            patterns = [
-                (r'([\u4e00-\u9fff])([a-zA-Z])', r'\1 \2'),
-                (r'([a-zA-Z])([\u4e00-\u9fff])', r'\1 \2'),
-                (r'([\u4e00-\u9fff])([0-9])', r'\1 \2'),
-                (r'([0-9])([\u4e00-\u9fff])', r'\1 \2')
-            ]
-            
-            for pattern, repl in patterns:
-                line = re.sub(pattern, repl, line)
-                
-            line = line.replace('__NEWLINE__', r'\N')
-            line = re.sub(r'\s+', ' ', line)
-            processed_lines.append(line.strip() + '\n')
+            processed_lines.append(format_subtitle_line(line) + '\n')
 
         # 寫入最終檔案
         with open(output_file, 'w', encoding='utf-8-sig') as f:
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# analysis_proxy.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+import argparse
+import subprocess
+from typing import Optional, Dict
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'analysis_proxy')
+
+FFMPEG_PATH = '/usr/local/bin/ffmpeg'
+FFPROBE_PATH = '/usr/local/bin/ffprobe'
+
+# Gemini 約以每秒 1 格取樣影片，分析用的代理檔不需要更高的畫質
+DEFAULT_HEIGHT = 360
+DEFAULT_FPS = 1
+
+# 代理檔存放在來源檔案旁的子目錄，避免與下載的影片檔名混在一起
+PROXY_DIR_NAME = '.analysis_proxy'
+
+
+def _resolve_binary(path: str) -> str:
+    """優先使用固定路徑，找不到時改用 PATH 中的同名程式"""
+    if os.path.exists(path):
+        return path
+    return shutil.which(os.path.basename(path)) or path
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    """使用 ffprobe 取得影片時長（秒），失敗時返回 None"""
+    try:
+        result = subprocess.run(
+            [
+                _resolve_binary(FFPROBE_PATH), '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1',
+                video_path
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return float(result.stdout.strip())
+    except Exception as e:
+        logger.warning(f"無法取得影片時長 {video_path}: {str(e)}")
+        return None
+
+
+def proxy_path_for(source_path: str, height: int = DEFAULT_HEIGHT, fps: int = DEFAULT_FPS) -> str:
+    """代理檔的存放路徑"""
+    directory, filename = os.path.split(os.path.abspath(source_path))
+    base = os.path.splitext(filename)[0]
+    return os.path.join(directory, PROXY_DIR_NAME, f"{base}_{height}p_{fps}fps.mp4")
+
+
+def make_analysis_proxy(source_path: str, height: int = DEFAULT_HEIGHT, fps: int = DEFAULT_FPS) -> Optional[Dict]:
+    """產生給 Gemini 分析用的低位元率代理檔
+
+    以 ffmpeg 縮小解析度、降低影格率並轉為單聲道。
+    代理檔比來源新時直接沿用，不重新轉檔。
+
+    Args:
+        source_path: 來源影片路徑
+        height: 代理檔高度，預設 360
+        fps: 代理檔影格率，預設 1
+
+    Returns:
+        Dict: 代理檔報告（path、source_mb、proxy_mb、ratio、duration、elapsed、cached），
+              轉檔失敗時返回 None
+    """
+    if not os.path.exists(source_path):
+        logger.error(f"找不到來源影片: {source_path}")
+        return None
+
+    output_path = proxy_path_for(source_path, height, fps)
+    cached = (
+        os.path.exists(output_path)
+        and os.path.getmtime(output_path) >= os.path.getmtime(source_path)
+    )
+
+    start_time = time.time()
+    if not cached:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # 暫存檔名含行程與執行緒編號，同時轉同一支影片時不會互相覆寫；保留 .mp4 讓 ffmpeg 判斷格式
+        tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+        command = [
+            _resolve_binary(FFMPEG_PATH), '-y', '-loglevel', 'error',
+            '-i', source_path,
+            '-vf', f"scale=-2:{height},fps={fps}",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+            '-c:a', 'aac', '-ac', '1', '-b:a', '48k',
+            '-movflags', '+faststart',
+            tmp_path
+        ]
+        try:
+            subprocess.run(command, capture_output=True, text=True, check=True)
+            os.replace(tmp_path, output_path)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"產生分析代理檔失敗: {e.stderr.strip()}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        except Exception as e:
+            logger.error(f"產生分析代理檔時發生錯誤: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+    source_mb = os.path.getsize(source_path) / 1024 / 1024
+    proxy_mb = os.path.getsize(output_path) / 1024 / 1024
+    report = {
+        'path': output_path,
+        'height': height,
+        'fps': fps,
+        'source_mb': round(source_mb, 2),
+        'proxy_mb': round(proxy_mb, 2),
+        'ratio': round(proxy_mb / source_mb, 4) if source_mb else None,
+        'duration': probe_duration(output_path),
+        'elapsed': round(time.time() - start_time, 2),
+        'cached': cached
+    }
+    ratio = f"{report['ratio']:.1%}" if report['ratio'] is not None else "N/A"
+    logger.info(
+        f"分析代理檔{'（沿用）' if cached else ''}: {source_mb:.1f} MB → {proxy_mb:.1f} MB "
+        f"({ratio}), {height}p {fps}fps, 耗時 {report['elapsed']} 秒"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='產生 Gemini 分析用的低位元率代理檔')
+    parser.add_argument('video_path', help='來源影片路徑')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='代理檔高度')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help='代理檔影格率')
+    args = parser.parse_args()
+
+    report = make_analysis_proxy(args.video_path, args.height, args.fps)
+    if not report:
+        sys.exit(1)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
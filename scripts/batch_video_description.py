@@ -6,6 +6,7 @@ import time
 import random
 import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Tuple
 import gspread
@@ -16,15 +17,21 @@ import re
 from logger import get_workflow_logger
 from wordpress_api import WordPressAPI
 from gemini_video_analyzer import GeminiVideoAnalyzer
-from tag_suggestion import TagSuggester
+from tag_suggestion import TagSuggester, TAG_BATCH_SIZE
 from update_video_description import VideoDescriptionUpdater
+from gemini_scheduler import GEMINI_MAX_CONCURRENT
 
 # 設定日誌
 logger = get_workflow_logger('1', 'batch_processor')
 
 class BatchProcessor:
-    def __init__(self):
-        """初始化批次處理器"""
+    def __init__(self, workers: int = GEMINI_MAX_CONCURRENT, tag_batch_size: int = 1):
+        """初始化批次處理器
+        
+        Args:
+            workers: 同時處理的資料列數，Gemini 請求另由共用的配額排程器依 RPM/TPM 控管
+            tag_batch_size: 大於 1 時，一批資料列的標籤合併為多影片請求生成
+        """
         # 載入環境變數
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         load_dotenv(os.path.join(base_dir, 'config', '.env'))
@@ -38,10 +45,8 @@ class BatchProcessor:
         # 連接 Google Sheets
         self.sheet = self._setup_google_sheets()
         
-        # 設定限流參數
-        self.gemini_calls_per_minute = 10
-        self.last_gemini_call = time.time() - 60
-        self.gemini_call_count = 0
+        self.workers = max(1, workers)
+        self.tag_batch_size = max(1, tag_batch_size)
         
         # 欄位對應
         self.column_mapping = {
@@ -79,27 +84,6 @@ class BatchProcessor:
             logger.error(f"Google Sheets 連接失敗: {str(e)}")
             raise
             
-    def _respect_rate_limit(self):
-        """尊重 API 限流"""
-        now = time.time()
-        elapsed = now - self.last_gemini_call
-        
-        # 如果在一分鐘內已經呼叫超過限制次數，則等待
-        if elapsed < 60 and self.gemini_call_count >= self.gemini_calls_per_minute:
-            wait_time = 60 - elapsed + random.uniform(1, 5)  # 加入隨機等待時間
-            logger.info(f"達到限流上限，等待 {wait_time:.2f} 秒")
-            time.sleep(wait_time)
-            self.gemini_call_count = 0
-            self.last_gemini_call = time.time()
-        
-        # 如果已經過了一分鐘，重置計數器
-        if elapsed >= 60:
-            self.gemini_call_count = 0
-            self.last_gemini_call = now
-            
-        # 每次呼叫之間加入短暫延遲，避免過於頻繁的請求
-        time.sleep(random.uniform(0.5, 2))
-        
     def _get_pending_rows(self, batch_size: int = 5, row_range: tuple = None) -> List[Dict]:
         """獲取待處理的資料列，可指定 row 範圍"""
         try:
@@ -210,12 +194,8 @@ class BatchProcessor:
                     logger.info(f"WP ID {wp_id} 已有 video_description 欄位，跳過處理")
                     self._update_row_status(row_number, 'video_description_status', 'completed')
                 else:
-                    # 尊重限流
-                    self._respect_rate_limit()
-                    
                     # 使用 VideoDescriptionUpdater 處理
                     success = self.video_updater.process_post(wp_id)
-                    self.gemini_call_count += 1
                     
                     if success:
                         logger.info(f"WP ID {wp_id} 的 video_description 欄位更新成功")
@@ -339,13 +319,57 @@ class BatchProcessor:
             
     def _process_tags(self, row_index: int, wp_id: int):
         """處理標籤生成"""
+        tag_input = self._prepare_tag_input(row_index, wp_id)
+        if tag_input is None:
+            return
+        title, combined_content = tag_input
+        
+        # 使用 TagSuggester 生成標籤
+        try:
+            tags = self.tag_suggester.suggest_tags(title, combined_content)
+            logger.debug(f"TagSuggester 返回結果: {tags}")
+        except Exception as tag_error:
+            error_msg = f"TagSuggester 發生錯誤: {str(tag_error)}"
+            logger.error(error_msg)
+            self._update_row_status(row_index, 'tags_from_description_status', 'failed')
+            return
+        
+        self._apply_tags(row_index, wp_id, tags)
+    
+    def _process_tags_batch(self, rows: List[Dict]):
+        """以多影片請求為一批資料列生成標籤，再逐列更新 WordPress"""
+        prepared = []
+        for row in rows:
+            tag_input = self._prepare_tag_input(row['index'], row['wp_id'])
+            if tag_input is not None:
+                prepared.append((row, tag_input))
+        if not prepared:
+            return
+        
+        logger.info(f"批次生成 {len(prepared)} 筆資料列的標籤")
+        try:
+            results = self.tag_suggester.suggest_tags_batch(
+                [tag_input for _, tag_input in prepared], batch_size=self.tag_batch_size
+            )
+        except Exception as tag_error:
+            logger.error(f"TagSuggester 發生錯誤: {str(tag_error)}")
+            for row, _ in prepared:
+                self._update_row_status(row['index'], 'tags_from_description_status', 'failed')
+            return
+        
+        for (row, _), tags in zip(prepared, results):
+            logger.debug(f"TagSuggester 返回結果: {tags}")
+            self._apply_tags(row['index'], row['wp_id'], tags)
+    
+    def _prepare_tag_input(self, row_index: int, wp_id: int) -> Optional[Tuple[str, str]]:
+        """取得生成標籤所需的標題與內容，不需處理或失敗時返回 None"""
         try:
             # 檢查是否需要處理標籤
             tags_status = self.sheet.cell(row_index, ord(self.column_mapping['tags_from_description_status']) - ord('A') + 1).value
             
             if tags_status == 'completed':
                 logger.info(f"WP ID {wp_id} 的標籤已處理完成，跳過")
-                return
+                return None
                 
             # 更新狀態為處理中
             self._update_row_status(row_index, 'tags_from_description_status', 'processing')
@@ -358,7 +382,7 @@ class BatchProcessor:
                 error_msg = f"獲取文章失敗: {response.status_code}"
                 logger.error(error_msg)
                 self._update_row_status(row_index, 'tags_from_description_status', 'failed')
-                return
+                return None
                 
             data = response.json()
             title = data.get('title', {}).get('rendered', '')
@@ -369,7 +393,7 @@ class BatchProcessor:
                 error_msg = f"WP ID {wp_id} 沒有 video_description 欄位"
                 logger.error(error_msg)
                 self._update_row_status(row_index, 'tags_from_description_status', 'failed')
-                return
+                return None
             
             # 移除 HTML 標籤
             content = re.sub(r'<[^>]+>', '', content)
@@ -383,17 +407,20 @@ class BatchProcessor:
             
             logger.debug(f"WP ID {wp_id} 的文章標題: {title}")
             logger.debug(f"WP ID {wp_id} 的影片描述長度: {len(video_description)} 字元")
+            return title, combined_content
             
-            # 使用 TagSuggester 生成標籤
+        except Exception as e:
+            error_msg = f"處理標籤時發生錯誤: {str(e)}"
+            logger.exception(error_msg)
             try:
-                tags = self.tag_suggester.suggest_tags(title, combined_content)
-                logger.debug(f"TagSuggester 返回結果: {tags}")
-            except Exception as tag_error:
-                error_msg = f"TagSuggester 發生錯誤: {str(tag_error)}"
-                logger.error(error_msg)
                 self._update_row_status(row_index, 'tags_from_description_status', 'failed')
-                return
-            
+            except:
+                pass
+            return None
+    
+    def _apply_tags(self, row_index: int, wp_id: int, tags: Dict):
+        """驗證標籤結果並更新 WordPress 文章標籤"""
+        try:
             if not tags:
                 error_msg = f"WP ID {wp_id} 無法生成標籤，TagSuggester 返回空結果"
                 logger.error(error_msg)
@@ -480,49 +507,66 @@ class BatchProcessor:
             except:
                 pass
                 
-    def process_batch(self, batch_size: int = 5, row_range: tuple = None):
-        """處理一批影片，可指定 row 範圍"""
-        pending_rows = self._get_pending_rows(batch_size, row_range=row_range)
+    def _process_row(self, row: Dict, process_tags: bool = True) -> bool:
+        """處理 process_batch 中的單一資料列
+        
+        Args:
+            row: _get_pending_rows 返回的資料列
+            process_tags: 是否在影片描述完成後立即處理標籤，批次標籤模式下由 process_batch 統一處理
+            
+        Returns:
+            bool: 影片描述是否在本次更新成功（需要接著處理標籤）
+        """
+        row_index = row['index']
+        wp_id = row['wp_id']
+        youtube_url = row['youtube_url']
         
-        for row in pending_rows:
-            row_index = row['index']
-            wp_id = row['wp_id']
-            youtube_url = row['youtube_url']
+        logger.info(f"處理第 {row_index} 列，WP ID: {wp_id}, YouTube URL: {youtube_url}")
+        
+        try:
+            # 更新狀態為處理中
+            self._update_row_status(row_index, 'video_description_status', 'processing')
             
-            logger.info(f"處理第 {row_index} 列，WP ID: {wp_id}, YouTube URL: {youtube_url}")
+            # 檢查 WP 文章是否存在 video_description 欄位
+            has_description = self._check_video_description(wp_id)
             
-            try:
-                # 更新狀態為處理中
-                self._update_row_status(row_index, 'video_description_status', 'processing')
-                
-                # 檢查 WP 文章是否存在 video_description 欄位
-                has_description = self._check_video_description(wp_id)
-                
-                if has_description:
-                    logger.info(f"WP ID {wp_id} 已有 video_description 欄位，跳過處理")
-                    self._update_row_status(row_index, 'video_description_status', 'completed')
-                    continue
-                    
-                # 尊重限流
-                self._respect_rate_limit()
+            if has_description:
+                logger.info(f"WP ID {wp_id} 已有 video_description 欄位，跳過處理")
+                self._update_row_status(row_index, 'video_description_status', 'completed')
+                return False
                 
-                # 使用 VideoDescriptionUpdater 處理
-                success = self.video_updater.process_post(wp_id)
-                self.gemini_call_count += 1
+            # 使用 VideoDescriptionUpdater 處理，Gemini 請求由配額排程器安排
+            success = self.video_updater.process_post(wp_id)
+            
+            if success:
+                logger.info(f"WP ID {wp_id} 的 video_description 欄位更新成功")
+                self._update_row_status(row_index, 'video_description_status', 'completed')
                 
-                if success:
-                    logger.info(f"WP ID {wp_id} 的 video_description 欄位更新成功")
-                    self._update_row_status(row_index, 'video_description_status', 'completed')
-                    
-                    # 處理標籤（如果需要）
+                # 處理標籤（如果需要）
+                if process_tags:
                     self._process_tags(row_index, wp_id)
-                else:
-                    logger.error(f"WP ID {wp_id} 的 video_description 欄位更新失敗")
-                    self._update_row_status(row_index, 'video_description_status', 'failed')
-                    
-            except Exception as e:
-                logger.exception(f"處理第 {row_index} 列時發生錯誤: {str(e)}")
+                return True
+            else:
+                logger.error(f"WP ID {wp_id} 的 video_description 欄位更新失敗")
                 self._update_row_status(row_index, 'video_description_status', 'failed')
+                return False
+                
+        except Exception as e:
+            logger.exception(f"處理第 {row_index} 列時發生錯誤: {str(e)}")
+            self._update_row_status(row_index, 'video_description_status', 'failed')
+            return False
+    
+    def process_batch(self, batch_size: int = 5, row_range: tuple = None):
+        """處理一批影片，可指定 row 範圍；各資料列並行處理"""
+        pending_rows = self._get_pending_rows(batch_size, row_range=row_range)
+        
+        batch_tags = self.tag_batch_size > 1
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # _process_row 自行處理例外，這裡只需等待全部完成
+            described = list(executor.map(lambda row: self._process_row(row, process_tags=not batch_tags), pending_rows))
+        
+        if batch_tags:
+            self._process_tags_batch([row for row, ok in zip(pending_rows, described) if ok])
                 
     def run(self, total_batches: int = 10, batch_size: int = 5, row_range: tuple = None):
         """執行批次處理，可指定 row 範圍"""
@@ -543,9 +587,12 @@ def main():
     parser.add_argument('--batch-size', type=int, default=5, help='每批次處理數量')
     parser.add_argument('--row', type=int, help='指定處理的 Google Sheets 行數')
     parser.add_argument('--row-range', type=str, help='指定處理的 Google Sheets 行數區間，例如 5000-5100')
+    parser.add_argument('--workers', type=int, default=GEMINI_MAX_CONCURRENT, help='同時處理的資料列數')
+    parser.add_argument('--tag-batch-size', type=int, default=1,
+                        help=f'每次標籤請求合併的影片數，大於 1 時啟用批次標籤（建議 {TAG_BATCH_SIZE}）')
     args = parser.parse_args()
     
-    processor = BatchProcessor()
+    processor = BatchProcessor(workers=args.workers, tag_batch_size=args.tag_batch_size)
     
     row_range = None
     if args.row_range:
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# concurrency.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'concurrency')
+
+
+class ServiceLimiter:
+    """依外部服務分別限制同時進行中的呼叫數量
+
+    例如 {'download': 2, 'gemini': 1, 'perplexity': 4}：
+    不同服務之間互不影響，同一服務超過上限的呼叫會等待。
+    未列在 limits 中的服務不受限制。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = dict(limits or {})
+        self._semaphores = {
+            name: threading.BoundedSemaphore(max(1, int(count)))
+            for name, count in self.limits.items()
+        }
+
+    @contextmanager
+    def limit(self, service: str):
+        """取得指定服務的執行名額，離開區塊時釋放
+
+        Args:
+            service: 服務名稱
+        """
+        semaphore = self._semaphores.get(service)
+        if semaphore is None:
+            yield
+            return
+
+        start_time = time.time()
+        semaphore.acquire()
+        waited = time.time() - start_time
+        if waited > 1:
+            logger.debug(f"等待 {service} 執行名額 {waited:.1f} 秒")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+class StageFailed(Exception):
+    """StageGraph 中某個節點執行失敗
+
+    Attributes:
+        stage: 失敗的節點名稱
+        error: 節點拋出的原始例外
+        results: 失敗前已完成節點的結果
+    """
+
+    def __init__(self, stage: str, error: Exception, results: Dict[str, Any]):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+        self.results = results
+
+
+class StageGraph:
+    """以相依關係描述的小型工作流程
+
+    每個節點在所有相依節點完成後才開始，互不相依的節點並行執行，
+    整體耗時趨近於關鍵路徑而不是所有步驟的總和。
+    節點函式依 deps 的順序接收相依節點的結果作為參數。
+    任一節點失敗後不再啟動新的節點，等候執行中的節點結束後拋出 StageFailed。
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: Callable, deps: Sequence[str] = ()) -> None:
+        """加入節點，相依節點必須先加入（因此不會形成循環）
+
+        Args:
+            name: 節點名稱
+            func: 節點函式
+            deps: 相依節點名稱
+        """
+        if name in self._stages:
+            raise ValueError(f"節點已存在: {name}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"節點 {name} 的相依節點尚未加入: {dep}")
+        self._stages[name] = (func, tuple(deps))
+
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """執行所有節點
+
+        Args:
+            max_workers: 同時執行的節點數上限，預設為節點總數
+
+        Returns:
+            Dict[str, Any]: 各節點名稱對應的結果
+        """
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+        failure: Optional[StageFailed] = None
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(pending))) as executor:
+            while pending or running:
+                if failure is None:
+                    ready = [name for name, (_, deps) in pending.items()
+                             if all(dep in results for dep in deps)]
+                    for name in ready:
+                        func, deps = pending.pop(name)
+                        future = executor.submit(func, *[results[dep] for dep in deps])
+                        running[future] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.debug(f"節點 {name} 執行失敗: {str(e)}")
+                        if failure is None:
+                            failure = StageFailed(name, e, results)
+
+        if failure is not None:
+            raise failure
+        return results
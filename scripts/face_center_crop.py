@@ -1,21 +1,132 @@
 #!/usr/bin/env python3
 import os
+import re
 import cv2
+import json
+import time
+import heapq
+import shutil
+import subprocess
+import datetime
 import numpy as np
-from typing import Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 import argparse
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 from logger import get_workflow_logger
 
 logger = get_workflow_logger('2', 'smart_processor')  # Stage 2 因為這是影片處理階段
 
+# 影片取樣模式
+SAMPLE_SEQUENTIAL = 'sequential'  # 依序解碼，以 grab() 略過未取樣的影格
+SAMPLE_KEYFRAMES = 'keyframes'    # 只讀取關鍵影格，最快但取樣較稀疏
+
+# 人臉偵測與清晰度計算使用的工作高度，較高的影格先縮小再偵測（0 表示使用原始解析度）
+# 縮小後的 Laplacian 變異數會改變，清晰度加分門檻（200）是以原始解析度訂定，
+# 尚未以實際影片驗證縮小後的結果前預設不縮小；可先用 scripts/tools/compare_face_detection.py 比較後再設定
+DETECT_HEIGHT = int(os.getenv("FACE_DETECT_HEIGHT", "0"))
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+# 批次模式掃描目錄時略過先前輸出的封面
+OUTPUT_NAME_PATTERN = re.compile(r'_(cover|top\d+|noface_top\d+)$')
+INDEX_FILENAME = 'cover_index.json'
+
+# 輸出的封面數與候選之間的最小間隔（秒）
+TOP_K = 3
+TIME_THRESHOLD = 2.0
+
+FFPROBE_PATH = '/usr/local/bin/ffprobe'
+
+
+def probe_keyframes(video_path: str) -> Optional[List[float]]:
+    """使用 ffprobe 列出影片關鍵影格的時間（秒），失敗或沒有關鍵影格時返回 None
+
+    以 -skip_frame nokey 只解碼關鍵影格，長片也只需數秒。
+    pts_time 扣掉串流的 start_time，讓第一格對應時間 0，與 OpenCV 的影格編號一致。
+    """
+    ffprobe = FFPROBE_PATH if os.path.exists(FFPROBE_PATH) else (shutil.which('ffprobe') or FFPROBE_PATH)
+    try:
+        result = subprocess.run(
+            [
+                ffprobe, '-v', 'error',
+                '-select_streams', 'v:0',
+                '-skip_frame', 'nokey',
+                '-show_entries', 'frame=pts_time:stream=start_time',
+                '-of', 'json',
+                video_path
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        data = json.loads(result.stdout)
+        streams = data.get('streams') or [{}]
+        start_time = float(streams[0].get('start_time', 0) or 0)
+        times = sorted(
+            max(0.0, float(frame['pts_time']) - start_time)
+            for frame in data.get('frames', [])
+            if frame.get('pts_time') not in (None, 'N/A')
+        )
+    except Exception as e:
+        logger.warning(f"無法取得影片關鍵影格 {video_path}: {str(e)}")
+        return None
+    if not times:
+        logger.warning(f"影片沒有可用的關鍵影格 {video_path}")
+        return None
+    return times
+
+
+def candidate_capacity(k: int, time_threshold: float, samples_per_sec: float) -> int:
+    """
+    pick_diverse_top_k 最多需要看多少個最高分候選。
+    每選中一張，最多排除前後 time_threshold 秒內的取樣，
+    所以保留前 k * (2 * time_threshold * 每秒取樣數 + 1) 名，結果與保留全部相同。
+    """
+    return k * (int(2 * time_threshold * samples_per_sec) + 1)
+
+
+class TopCandidates:
+    """
+    只保留分數最高的前 capacity 個候選，記憶體不隨影片長度增加。
+    候選只存影格編號與臉部框，不存影格本身；選定後再重新讀取。
+    同分時較早的影格優先，與依分數穩定排序的結果一致。
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._heap = []  # (score, -frame_pos, frame_index, faces)，堆頂為最差的候選
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, score, frame_index: int, frame_pos: float, faces=None):
+        item = (score, -frame_pos, frame_index, faces)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def ranked(self):
+        """依分數由高到低返回 pick_diverse_top_k 使用的 (score, frame_index, faces, frame_pos)"""
+        ordered = sorted(self._heap, key=lambda item: (-item[0], -item[1]))
+        return [(score, frame_index, faces, -neg_pos) for score, neg_pos, frame_index, faces in ordered]
+
+def merge_ranked(ranked_lists):
+    """合併多段已排序的候選，依分數由高到低、同分時較早的影格優先"""
+    merged = [candidate for ranked in ranked_lists for candidate in ranked]
+    merged.sort(key=lambda candidate: (-candidate[0], candidate[3]))
+    return merged
+
 class SmartImageProcessor:
-    def __init__(self, target_width: int = 1920, target_height: int = 3414, content_height: int = 2404):
+    def __init__(self, target_width: int = 1920, target_height: int = 3414, content_height: int = 2404,
+                 detect_height: int = DETECT_HEIGHT):
         self.target_width = target_width
         self.target_height = target_height
         self.content_height = content_height
+        self.detect_height = detect_height
         
         # Calculate black frame height
         self.black_frame_height = (target_height - content_height) // 2
@@ -25,73 +136,115 @@ class SmartImageProcessor:
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
 
-    def analyze_frame(self, frame, frame_pos: float = 0) -> dict:
+    def _working_frame(self, frame):
         """
-        針對「有人臉」的檢測與評分 (第一階段)。
-        若抓不到臉，或分數不合格 => 之後可能走 fallback。
+        縮小到偵測用的工作高度，返回 (縮小後影格, 縮放比例)。
+        來源不比工作高度高時不縮放，比例為 1。
         """
-        score = 0
-        reasons = []
+        orig_h, orig_w = frame.shape[:2]
+        if not self.detect_height or orig_h <= self.detect_height:
+            return frame, 1.0
+        scale = self.detect_height / orig_h
+        small = cv2.resize(
+            frame, (max(1, round(orig_w * scale)), self.detect_height), interpolation=cv2.INTER_AREA
+        )
+        return small, scale
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # 這裡可調整參數
+    def _detect_faces(self, gray, scale: float, min_neighbors: int, min_size: int):
+        """
+        在縮小後的灰階圖上偵測人臉，minSize 依比例縮小，臉部框換算回原始影格座標。
+        """
+        size = max(1, round(min_size * scale))
         faces = self.face_cascade.detectMultiScale(
             gray,
             scaleFactor=1.1,
-            minNeighbors=6,
-            minSize=(80, 80)
+            minNeighbors=min_neighbors,
+            minSize=(size, size)
         )
+        if len(faces) == 0 or scale == 1.0:
+            return faces
+        return np.round(np.asarray(faces, dtype=np.float32) / scale).astype(np.int32)
 
-        if len(faces) == 1:
-            # 只接收單臉
-            x, y, w, h = faces[0]
-            # 可以在這裡做臉部大小或邊緣檢查
-            score += 30  # 單臉基礎分
-        elif len(faces) > 1:
-            reasons.append("Multiple faces => not using this frame")
-            score = -999
-        else:
-            reasons.append("No face detected")
-            score = -999
+    def _sharpness(self, gray) -> float:
+        """清晰度: Laplacian 變異數（float32 即足夠，比 float64 快）"""
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+    def _score_frame(self, frame, with_quality: bool = True):
+        """
+        單次計算一格的人臉分數與 fallback 品質分數，共用灰階圖與清晰度。
+        返回 (face_score, faces, quality_score)，faces 為原始影格座標，
+        with_quality=False 時 quality_score 為 None。
+        人臉在縮小後的影格上偵測；清晰度一律以原始解析度計算，
+        縮小會讓 Laplacian 變異數變大，門檻 200 是以原始解析度訂定。
+        """
+        small, scale = self._working_frame(frame)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        # 這裡可調整參數（minSize 以原始解析度計）
+        faces = self._detect_faces(gray, scale, min_neighbors=6, min_size=80)
+
+        # 只接收單臉
+        face_score = 30 if len(faces) == 1 else -999
+
+        lap_val = None
+        if face_score > 0 or with_quality:
+            full_gray = gray if scale == 1.0 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            lap_val = self._sharpness(full_gray)
 
         # 簡單加點清晰度分數
-        if score > 0:
-            lap_val = cv2.Laplacian(gray, cv2.CV_64F).var()
-            if lap_val > 200:
-                score += 10
-                reasons.append("Sharpness bonus")
+        if face_score > 0 and lap_val > 200:
+            face_score += 10
+
+        quality_score = lap_val + self._brightness_score(small) if with_quality else None
+        return face_score, faces, quality_score
+
+    def analyze_frame(self, frame, frame_pos: float = 0) -> dict:
+        """
+        針對「有人臉」的檢測與評分 (第一階段)。
+        若抓不到臉，或分數不合格 => 之後可能走 fallback。
+        """
+        score, faces, _ = self._score_frame(frame, with_quality=False)
+
+        reasons = []
+        if len(faces) > 1:
+            reasons.append("Multiple faces => not using this frame")
+        elif len(faces) == 0:
+            reasons.append("No face detected")
+        elif score > 30:
+            reasons.append("Sharpness bonus")
 
         return {
             "score": score,
             "reasons": reasons,
-            "faces": faces if (score > 0 and len(faces) == 1) else None,
+            "faces": faces if score > 0 else None,
             "frame": frame.copy() if score > 0 else None
         }
 
-    def simple_quality_score(self, frame):
-        """
-        當「沒有人臉」時的 fallback 評分: 以清晰度 + 亮度評分，
-        也可自行擴充對比度、色彩豐富度等。
-        """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        # (1) 清晰度: Laplacian
-        lap_val = cv2.Laplacian(gray, cv2.CV_64F).var()
-
-        # (2) 亮度適中度: 檢查 v_channel 的直方圖分布
+    def _brightness_score(self, frame) -> int:
+        """亮度適中度: 檢查 v_channel 的直方圖分布"""
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         v_channel = hsv[:, :, 2]
         hist = cv2.calcHist([v_channel], [0], None, [256], [0, 256])
         low_light = np.sum(hist[:64]) / np.sum(hist)   # 過暗比例
         high_light = np.sum(hist[192:]) / np.sum(hist) # 過亮比例
 
-        # 亮度分
-        brightness_score = 0
         if 0.05 < low_light < 0.4 and 0.05 < high_light < 0.4:
-            brightness_score = 50
+            return 50
+        return 0
+
+    def simple_quality_score(self, frame):
+        """
+        當「沒有人臉」時的 fallback 評分: 以清晰度 + 亮度評分，
+        也可自行擴充對比度、色彩豐富度等。
+        """
+        small, _ = self._working_frame(frame)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
 
-        total_score = lap_val + brightness_score
+        # (1) 清晰度: Laplacian
+        lap_val = self._sharpness(gray)
+
+        # (2) 亮度分
+        total_score = lap_val + self._brightness_score(small)
         return total_score
 
     def _crop_and_resize(self, image, faces=None):
@@ -159,10 +312,10 @@ class SmartImageProcessor:
             return None
 
         # 這裡若要也用嚴苛參數，可直接呼叫 analyze_frame(image)
-        # 或用較鬆散的 detectMultiScale
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-        )
+        # 或用較鬆散的 detectMultiScale（在縮小後的影像上偵測）
+        small, scale = self._working_frame(image)
+        small_gray = gray if scale == 1.0 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        faces = self._detect_faces(small_gray, scale, min_neighbors=5, min_size=30)
 
         processed_image = self._crop_and_resize(image, faces)
         if processed_image is not None:
@@ -188,7 +341,109 @@ class SmartImageProcessor:
                     break
         return chosen
 
-    def process_video(self, video_path: str, output_path: str = None):
+    def _iter_frames(self, cap, fps: int, frame_interval: int, end_frame: int, keyframes=None,
+                     start_frame: int = 0):
+        """
+        依取樣間隔產生 (影格編號, 秒數, 影格)。
+        每次 cap.set(CAP_PROP_POS_FRAMES) 都會退回前一個關鍵影格重新解碼，
+        所以只在 start_frame 定位一次，之後依序讀取：未取樣的影格只 grab() 不做色彩轉換。
+        有 keyframes 時只定位到關鍵影格，定位本身不需要往前解碼；
+        秒數換算影格編號使用容器的實際影格率（29.97 等非整數影格率不能用取整後的 fps）。
+        """
+        if keyframes is not None:
+            exact_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+            for t in keyframes:
+                index = int(round(t * exact_fps))
+                if index >= end_frame:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield index, t, frame
+            return
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        index = start_frame
+        while index < end_frame:
+            if index % frame_interval:
+                if not cap.grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield index, index / fps, frame
+            index += 1
+
+    def _scan_candidates(self, cap, fps: int, frame_interval: int, end_frame: int, keyframes, capacity: int,
+                         start_frame: int = 0):
+        """
+        單次掃描同時計算人臉分數與品質分數，各自只保留前 capacity 名。
+        找到第一個人臉候選後就不會走 fallback，之後的影格不再計算品質分數。
+        返回 (face_ranked, quality_ranked)，皆為依分數排序的 (score, frame_index, faces, frame_pos)。
+        """
+        face_top = TopCandidates(capacity)
+        quality_top = TopCandidates(capacity)
+        frames = self._iter_frames(cap, fps, frame_interval, end_frame, keyframes, start_frame)
+        for frame_index, frame_pos, frame in frames:
+            need_quality = not face_top
+            face_score, faces, quality_score = self._score_frame(frame, with_quality=need_quality)
+            if face_score > 0:
+                face_top.push(face_score, frame_index, frame_pos, faces)
+            elif need_quality:
+                quality_top.push(quality_score, frame_index, frame_pos)
+        return face_top.ranked(), (quality_top.ranked() if not face_top else [])
+
+    def _scan_parallel(self, video_path: str, fps: int, frame_interval: int, end_frame: int, keyframes,
+                       capacity: int, workers: int):
+        """
+        將時間軸切成 workers 段，各段在子程序中以自己的 VideoCapture 與偵測器掃描，
+        再合併各段的候選。段落邊界對齊取樣間隔，取樣的影格與單一程序相同；
+        全部候選的前 capacity 名必定在所屬段落的前 capacity 名之中，
+        所以合併後經 pick_diverse_top_k 挑選的結果與單一程序相同。
+        """
+        if keyframes is not None:
+            per_segment = -(-len(keyframes) // workers)
+            segments = [
+                (0, end_frame, keyframes[i:i + per_segment])
+                for i in range(0, len(keyframes), per_segment)
+            ]
+        else:
+            samples = -(-end_frame // frame_interval)
+            step = -(-samples // workers) * frame_interval
+            segments = [
+                (start, min(start + step, end_frame), None)
+                for start in range(0, end_frame, step)
+            ]
+        if not segments:
+            return [], []
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+            futures = [
+                executor.submit(
+                    _scan_segment, video_path, self.detect_height, fps, frame_interval,
+                    start, end, segment_keyframes, capacity
+                )
+                for start, end, segment_keyframes in segments
+            ]
+            results = [future.result() for future in futures]
+
+        face_ranked = merge_ranked(face for face, _ in results)
+        quality_ranked = [] if face_ranked else merge_ranked(quality for _, quality in results)
+        return face_ranked, quality_ranked
+
+    def _read_frame(self, cap, frame_index: int):
+        """重新讀取指定影格"""
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        ret, frame = cap.read()
+        if not ret:
+            logger.warning(f"Cannot re-read frame {frame_index}")
+            return None
+        return frame
+
+    def process_video(self, video_path: str, output_path: str = None, sample_mode: str = SAMPLE_SEQUENTIAL,
+                      workers: int = 1):
         if not os.path.exists(video_path):
             logger.error("Video not found")
             return None
@@ -213,100 +468,225 @@ class SmartImageProcessor:
             skip_end_sec = 3
             end_frame = total_frames - (skip_end_sec * fps)
 
-            face_candidates = []
-            current_frame = 0
-
-            # --- (A) 第一輪：嘗試「有人臉」的候選 ---
-            while current_frame < end_frame:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            keyframes = None
+            if sample_mode == SAMPLE_KEYFRAMES:
+                keyframes = probe_keyframes(video_path)
+                if not keyframes:
+                    keyframes = None
+                    logger.warning("Keyframe probe failed, fallback to sequential sampling...")
+
+            samples_per_sec = fps if keyframes is not None else fps / frame_interval
+            capacity = candidate_capacity(TOP_K, TIME_THRESHOLD, samples_per_sec)
+            if workers > 1 and end_frame > frame_interval:
+                face_ranked, quality_ranked = self._scan_parallel(
+                    video_path, fps, frame_interval, end_frame, keyframes, capacity, workers
+                )
+            else:
+                face_ranked, quality_ranked = self._scan_candidates(
+                    cap, fps, frame_interval, end_frame, keyframes, capacity
+                )
 
-                if current_frame % frame_interval == 0:
-                    frame_pos = current_frame / fps
-                    analysis = self.analyze_frame(frame, frame_pos)
-                    if analysis["score"] > 0 and analysis["faces"] is not None:
-                        face_candidates.append((
-                            analysis["score"],
-                            frame.copy(),
-                            analysis["faces"],
-                            frame_pos
-                        ))
-                current_frame += frame_interval
-
-            # 對「臉候選」排序 & 選擇 top3
-            face_candidates.sort(key=lambda x: x[0], reverse=True)
-            top_faces = self.pick_diverse_top_k(face_candidates, k=3, time_threshold=2.0)
+            # 對「臉候選」選擇 top3
+            top_faces = self.pick_diverse_top_k(face_ranked, k=TOP_K, time_threshold=TIME_THRESHOLD)
 
             # --- (B) 若找不到臉 => fallback: 「畫面品質最高」 ---
             if not top_faces:
                 logger.warning("No face found, fallback to quality-based selection...")
 
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                current_frame = 0
-                quality_candidates = []
-                while current_frame < end_frame:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-
-                    if current_frame % frame_interval == 0:
-                        frame_pos = current_frame / fps
-                        q_score = self.simple_quality_score(frame)
-                        quality_candidates.append((q_score, frame.copy(), None, frame_pos))
-
-                    current_frame += frame_interval
-
-                quality_candidates.sort(key=lambda x: x[0], reverse=True)
-                top_quality = self.pick_diverse_top_k(quality_candidates, k=3, time_threshold=2.0)
+                top_quality = self.pick_diverse_top_k(quality_ranked, k=TOP_K, time_threshold=TIME_THRESHOLD)
 
                 if not top_quality:
                     logger.error("No suitable fallback frames found either.")
                     return None
 
-                # (C) 產生檔案
+                # (C) 重新讀取選中的影格並產生檔案
                 saved_paths = []
-                for i, (score, qframe, _, fpos) in enumerate(top_quality, start=1):
+                for i, (score, frame_index, _, fpos) in enumerate(top_quality, start=1):
+                    qframe = self._read_frame(cap, frame_index)
+                    if qframe is None:
+                        continue
                     processed = self._crop_and_resize(qframe, None)
-                    out_path = f"{base_path}_noface_top{i}.jpg"
+                    out_path = f"{base_path}_noface_top{len(saved_paths) + 1}.jpg"
                     cv2.imwrite(out_path, processed)
                     saved_paths.append(out_path)
 
-                return saved_paths[0]  # 回傳第一張
+                return saved_paths[0] if saved_paths else None  # 回傳第一張
 
             else:
-                # (C) 對「有人臉」的結果進行裁切 & 輸出
+                # (C) 重新讀取選中的影格，對「有人臉」的結果進行裁切 & 輸出
                 saved_paths = []
-                for i, (score, frame_with_face, faces, fpos) in enumerate(top_faces, start=1):
+                for i, (score, frame_index, faces, fpos) in enumerate(top_faces, start=1):
+                    frame_with_face = self._read_frame(cap, frame_index)
+                    if frame_with_face is None:
+                        continue
                     final_img = self._crop_and_resize(frame_with_face, faces)
-                    out_path = f"{base_path}_top{i}.jpg"
+                    out_path = f"{base_path}_top{len(saved_paths) + 1}.jpg"
                     cv2.imwrite(out_path, final_img)
                     saved_paths.append(out_path)
 
-                return saved_paths[0]
+                return saved_paths[0] if saved_paths else None
 
         finally:
             cap.release()
         return None
 
+def _scan_segment(video_path: str, detect_height: int, fps: int, frame_interval: int,
+                  start_frame: int, end_frame: int, keyframes, capacity: int):
+    """
+    子程序中掃描影片的一段，返回該段的 (face_ranked, quality_ranked)。
+    必須是模組層級函式才能傳給 ProcessPoolExecutor。
+    """
+    processor = SmartImageProcessor(detect_height=detect_height)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+    try:
+        return processor._scan_candidates(
+            cap, fps, frame_interval, end_frame, keyframes, capacity, start_frame
+        )
+    finally:
+        cap.release()
+
+# 批次模式中每個工作程序保留一個已載入偵測器的 SmartImageProcessor
+_worker_processor = None
+
+def _init_worker(detect_height: int):
+    global _worker_processor
+    _worker_processor = SmartImageProcessor(detect_height=detect_height)
+
+def _process_one(input_path: str, output_path: Optional[str], sample_mode: str) -> Dict:
+    """以工作程序的 SmartImageProcessor 處理一個檔案，返回結果索引的一筆紀錄"""
+    start_time = time.time()
+    result = {"input": input_path, "output": None, "status": "failed", "error": None}
+    try:
+        ext = os.path.splitext(input_path)[1].lower()
+        if ext in VIDEO_EXTENSIONS:
+            result["output"] = _worker_processor.process_video(input_path, output_path, sample_mode)
+        elif ext in IMAGE_EXTENSIONS:
+            result["output"] = _worker_processor.process_image(input_path, output_path)
+        else:
+            result["status"] = "unsupported"
+            result["error"] = f"Unsupported file type: {ext}"
+        if result["output"]:
+            result["status"] = "ok"
+        elif result["status"] == "failed":
+            result["error"] = "Processing failed"
+    except Exception as e:
+        logger.error(f"Processing error {input_path}: {e}")
+        result["error"] = str(e)
+    result["elapsed"] = round(time.time() - start_time, 2)
+    return result
+
+def collect_inputs(paths: List[str]) -> List[str]:
+    """展開輸入路徑：目錄取其中支援的圖片與影片（不含先前輸出的封面），檔案直接保留"""
+    inputs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            inputs.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS:
+                continue
+            if ext.lower() in IMAGE_EXTENSIONS and OUTPUT_NAME_PATTERN.search(stem):
+                continue
+            inputs.append(os.path.join(path, name))
+    return inputs
+
+def _batch_output_path(input_path: str, output_dir: Optional[str]) -> Optional[str]:
+    """批次模式的輸出路徑，命名與單檔模式的預設相同，只是改放在 output_dir"""
+    if output_dir is None:
+        return None
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    if ext.lower() in IMAGE_EXTENSIONS:
+        return os.path.join(output_dir, f"{stem}_cover.jpg")
+    # process_video 會再去掉一次副檔名，保留 .jpg 避免 ad.v1.mp4 與 ad.v2.mp4 都輸出成 ad_top1.jpg
+    return os.path.join(output_dir, f"{stem}.jpg")
+
+def process_batch(paths: List[str], output_dir: str = None, workers: int = None,
+                  sample_mode: str = SAMPLE_SEQUENTIAL, index_path: str = None,
+                  detect_height: int = DETECT_HEIGHT) -> List[Dict]:
+    """
+    批次處理多個檔案或目錄，並寫出 JSON 結果索引。
+    每個工作程序只建立一次 SmartImageProcessor，之後的檔案沿用已載入的偵測器。
+
+    Args:
+        paths: 圖片、影片或目錄路徑
+        output_dir: 輸出目錄，None 表示放在各輸入檔旁
+        workers: 工作程序數，預設為 CPU 核心數
+        sample_mode: 影片取樣模式
+        index_path: 結果索引路徑，預設為輸出目錄（或第一個輸入所在目錄）下的 cover_index.json
+        detect_height: 人臉偵測的工作高度
+
+    Returns:
+        List[Dict]: 依輸入順序的結果（input、output、status、error、elapsed）
+    """
+    inputs = collect_inputs(paths)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    outputs = [_batch_output_path(path, output_dir) for path in inputs]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(inputs) or 1))
+
+    logger.info(f"Batch processing {len(inputs)} files with {workers} workers")
+    if workers == 1:
+        _init_worker(detect_height)
+        results = [_process_one(path, out, sample_mode) for path, out in zip(inputs, outputs)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(detect_height,)) as executor:
+            results = list(executor.map(_process_one, inputs, outputs, [sample_mode] * len(inputs)))
+
+    if index_path is None:
+        first = paths[0] if paths else '.'
+        index_dir = output_dir or (first if os.path.isdir(first) else os.path.dirname(first) or '.')
+        index_path = os.path.join(index_dir, INDEX_FILENAME)
+    index = {
+        "created": datetime.datetime.now().isoformat(),
+        "count": len(results),
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "results": results,
+    }
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Batch finished: {index['succeeded']}/{index['count']} succeeded, index saved: {index_path}")
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description='Smart Image/Video Cover Processor')
-    parser.add_argument('input_path', help='Path to input image or video')
+    parser.add_argument('input_path', nargs='+',
+                        help='Path to input image or video; several paths or directories run in batch mode')
     parser.add_argument('-o', '--output', help='Path to save processed cover', default=None)
+    parser.add_argument('--keyframes-only', action='store_true',
+                        help='Sample keyframes only (fast mode, sparser candidates)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes: video segments for one file (default 1), files in batch mode (default CPU count)')
+    parser.add_argument('--output-dir', help='Batch mode: directory for covers', default=None)
+    parser.add_argument('--index', help=f'Batch mode: path of the JSON result index (default {INDEX_FILENAME})',
+                        default=None)
     args = parser.parse_args()
 
+    sample_mode = SAMPLE_KEYFRAMES if args.keyframes_only else SAMPLE_SEQUENTIAL
+    if len(args.input_path) > 1 or os.path.isdir(args.input_path[0]):
+        results = process_batch(args.input_path, args.output_dir, args.workers, sample_mode, args.index)
+        for r in results:
+            print(f"{r['status']:<12}{r['input']} -> {r['output'] or r['error']}")
+        failed = sum(r['status'] != 'ok' for r in results)
+        print(f"{len(results) - failed}/{len(results)} succeeded")
+        if failed:
+            sys.exit(1)
+        return
+
+    input_path = args.input_path[0]
     processor = SmartImageProcessor()
     try:
-        input_ext = os.path.splitext(args.input_path)[1].lower()
-        video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-
-        if input_ext in video_extensions:
-            result = processor.process_video(args.input_path, args.output)
-        elif input_ext in image_extensions:
-            result = processor.process_image(args.input_path, args.output)
+        input_ext = os.path.splitext(input_path)[1].lower()
+
+        if input_ext in VIDEO_EXTENSIONS:
+            result = processor.process_video(input_path, args.output, sample_mode, args.workers or 1)
+        elif input_ext in IMAGE_EXTENSIONS:
+            result = processor.process_image(input_path, args.output)
         else:
             logger.error(f"Unsupported file type: {input_ext}")
             return None
@@ -321,4 +701,4 @@ def main():
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
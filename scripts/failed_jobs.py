@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# failed_jobs.py
+
+import os
+import sys
+import json
+import uuid
+import fcntl
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'failed_jobs')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 失敗任務日誌，每行一筆 JSON 事件，只附加不改寫
+JOURNAL_PATH = os.getenv("FAILED_JOBS_PATH", os.path.join(PROJECT_ROOT, 'logs', 'failed_jobs.jsonl'))
+# 舊版整檔改寫的失敗任務清單，可用 --import-legacy 匯入
+LEGACY_PATH = os.path.join(PROJECT_ROOT, 'logs', 'failed_jobs.json')
+
+# 任務種類
+JOB_PERPLEXITY = 'perplexity_search'
+JOB_TAGS = 'tag_suggestion'
+
+EVENT_FAILED = 'failed'
+EVENT_RESOLVED = 'resolved'
+
+# 重新執行時各服務的每分鐘請求數與同時請求數
+REPLAY_LIMITS = {
+    JOB_PERPLEXITY: {'rpm': 20, 'max_concurrent': 4},
+    JOB_TAGS: {'rpm': 60, 'max_concurrent': 4},
+}
+
+_thread_lock = threading.Lock()
+
+
+@dataclass
+class FailedJob:
+    """日誌中尚未解決的失敗任務"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    error: str
+    timestamp: str
+    # 相同任務重複失敗時的其他紀錄 ID，解決時一併標記
+    duplicate_ids: List[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return json.dumps([self.kind, self.payload], ensure_ascii=False, sort_keys=True)
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def _append(event: Dict, path: str = None) -> None:
+    """以獨佔鎖附加一行事件，多個執行緒與程序同時寫入也不會交錯"""
+    path = path or JOURNAL_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(event, ensure_ascii=False) + "\n"
+    with _thread_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def record_failure(kind: str, payload: Dict[str, Any], error: Any = None, path: str = None) -> Optional[str]:
+    """記錄一筆失敗任務
+
+    Args:
+        kind: 任務種類（JOB_PERPLEXITY、JOB_TAGS）
+        payload: 重新執行所需的參數
+        error: 最後一次的錯誤
+        path: 日誌路徑，預設為 JOURNAL_PATH
+
+    Returns:
+        Optional[str]: 任務 ID，寫入失敗時為 None
+    """
+    job_id = uuid.uuid4().hex
+    try:
+        _append({
+            "event": EVENT_FAILED,
+            "id": job_id,
+            "kind": kind,
+            "payload": payload,
+            "error": str(error) if error else "Unknown error",
+            "timestamp": _now(),
+        }, path)
+        logger.info(f"已記錄失敗任務 {kind}: {payload.get('title', job_id)}")
+        return job_id
+    except Exception as e:
+        logger.error(f"寫入失敗任務時發生錯誤: {str(e)}")
+        return None
+
+
+def mark_resolved(job_ids: List[str], result: Any = None, path: str = None) -> None:
+    """標記任務已解決，result 為重新執行的結果，一併保存於日誌"""
+    _append({
+        "event": EVENT_RESOLVED,
+        "ids": list(job_ids),
+        "result": result,
+        "timestamp": _now(),
+    }, path)
+
+
+def load_pending(kinds: Optional[List[str]] = None, path: str = None) -> List[FailedJob]:
+    """讀取尚未解決的失敗任務，相同種類與參數的任務合併為一筆
+
+    Args:
+        kinds: 只列出指定種類，None 表示全部
+        path: 日誌路徑，預設為 JOURNAL_PATH
+
+    Returns:
+        List[FailedJob]: 依第一次失敗時間排序的任務
+    """
+    path = path or JOURNAL_PATH
+    if not os.path.exists(path):
+        return []
+
+    failed: Dict[str, Dict] = {}
+    resolved = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            lines = f.readlines()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if event.get('event') == EVENT_FAILED:
+            failed[event['id']] = event
+        elif event.get('event') == EVENT_RESOLVED:
+            resolved.update(event.get('ids', []))
+
+    jobs: Dict[str, FailedJob] = {}
+    for job_id, event in failed.items():
+        if job_id in resolved or (kinds and event['kind'] not in kinds):
+            continue
+        job = FailedJob(
+            id=job_id,
+            kind=event['kind'],
+            payload=event.get('payload', {}),
+            error=event.get('error', ''),
+            timestamp=event.get('timestamp', ''),
+        )
+        if job.key in jobs:
+            # 保留最新的錯誤訊息
+            existing = jobs[job.key]
+            existing.duplicate_ids.append(job_id)
+            existing.error = job.error
+        else:
+            jobs[job.key] = job
+    return list(jobs.values())
+
+
+def import_legacy(legacy_path: str = None, path: str = None) -> int:
+    """將舊版 failed_jobs.json 的項目匯入日誌
+
+    含 content 的項目為標籤任務，其餘為 Perplexity 搜尋任務。
+
+    Returns:
+        int: 匯入的筆數
+    """
+    legacy_path = legacy_path or LEGACY_PATH
+    if not os.path.exists(legacy_path):
+        return 0
+    with open(legacy_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    count = 0
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('title'):
+            continue
+        if 'content' in entry:
+            kind, payload = JOB_TAGS, {"title": entry['title'], "content": entry['content']}
+        else:
+            kind, payload = JOB_PERPLEXITY, {"title": entry['title']}
+        _append({
+            "event": EVENT_FAILED,
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "payload": payload,
+            "error": entry.get('error', ''),
+            "timestamp": entry.get('timestamp') or _now(),
+        }, path)
+        count += 1
+    os.replace(legacy_path, legacy_path + '.imported')
+    return count
+
+
+def _perplexity_handler() -> Callable[[Dict], Any]:
+    from perplexity_client import PerplexityClient
+    client = PerplexityClient()
+
+    def run(payload: Dict) -> Any:
+        result = client.search(payload['title'], journal_failures=False)
+        if not result:
+            raise RuntimeError("Perplexity 搜尋仍然失敗")
+        return result
+    return run
+
+
+def _tags_handler() -> Callable[[Dict], Any]:
+    from tag_suggestion import TagSuggester
+    suggester = TagSuggester()
+
+    def run(payload: Dict) -> Any:
+        # 重試用盡的預設標籤無法通過驗證，視為仍然失敗
+        return suggester.validate_result(suggester.suggest_tags(payload['title'], payload['content'], journal_failures=False))
+    return run
+
+
+# 任務種類對應的執行函式工廠，只在有該種類的任務時才建立客戶端
+HANDLERS: Dict[str, Callable[[], Callable[[Dict], Any]]] = {
+    JOB_PERPLEXITY: _perplexity_handler,
+    JOB_TAGS: _tags_handler,
+}
+
+
+def replay(kinds: Optional[List[str]] = None, workers: int = 4, path: str = None) -> Dict[str, int]:
+    """並行重新執行尚未解決的失敗任務，成功者標記為已解決
+
+    各種類依 REPLAY_LIMITS 限制每分鐘請求數與同時請求數。
+
+    Returns:
+        Dict[str, int]: resolved 與 failed 的數量
+    """
+    from gemini_scheduler import QuotaScheduler
+
+    jobs = load_pending(kinds, path)
+    counts = {'resolved': 0, 'failed': 0}
+    if not jobs:
+        return counts
+
+    handlers = {}
+    schedulers = {}
+    for kind in {job.kind for job in jobs}:
+        if kind not in HANDLERS:
+            logger.warning(f"未知的任務種類，跳過: {kind}")
+            continue
+        handlers[kind] = HANDLERS[kind]()
+        limits = REPLAY_LIMITS.get(kind, {'rpm': 10, 'max_concurrent': 1})
+        schedulers[kind] = QuotaScheduler(rpm=limits['rpm'], tpm=sys.maxsize, max_concurrent=limits['max_concurrent'])
+    counts_lock = threading.Lock()
+
+    def run(job: FailedJob) -> None:
+        if job.kind not in handlers:
+            return
+        try:
+            with schedulers[job.kind].slot(1):
+                result = handlers[job.kind](job.payload)
+            mark_resolved([job.id] + job.duplicate_ids, result, path)
+            outcome = 'resolved'
+            logger.info(f"已解決失敗任務 {job.kind}: {job.payload.get('title', job.id)}")
+        except Exception as e:
+            outcome = 'failed'
+            logger.error(f"重新執行失敗任務 {job.kind} 仍然失敗: {job.payload.get('title', job.id)}: {str(e)}")
+        with counts_lock:
+            counts[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(run, jobs))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列出或重新執行失敗的 Perplexity 與標籤任務')
+    parser.add_argument('action', choices=['list', 'replay'], help='list 列出未解決的任務，replay 重新執行')
+    parser.add_argument('--kind', choices=list(HANDLERS), action='append', help='只處理指定種類，可重複指定')
+    parser.add_argument('--workers', type=int, default=4, help='同時重新執行的任務數')
+    parser.add_argument('--path', default=JOURNAL_PATH, help='失敗任務日誌路徑')
+    parser.add_argument('--import-legacy', action='store_true', help=f'先匯入舊版 {LEGACY_PATH}')
+    args = parser.parse_args()
+
+    if args.import_legacy:
+        print(f"已匯入 {import_legacy(path=args.path)} 筆舊版失敗任務")
+
+    if args.action == 'list':
+        jobs = load_pending(args.kind, args.path)
+        if not jobs:
+            print("沒有未解決的失敗任務")
+            return
+        for job in jobs:
+            repeat = f" x{len(job.duplicate_ids) + 1}" if job.duplicate_ids else ""
+            print(f"{job.timestamp[:19]}  {job.kind:<18}{job.payload.get('title', '')}{repeat}  ({job.error[:60]})")
+        print(f"共 {len(jobs)} 筆")
+    else:
+        counts = replay(args.kind, args.workers, args.path)
+        print(f"已解決 {counts['resolved']} 筆，仍失敗 {counts['failed']} 筆")
+        if counts['failed']:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
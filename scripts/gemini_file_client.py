@@ -3,13 +3,12 @@
 import os
 import json
 import requests
-import re
 import pathlib
 from typing import Optional, Dict, Any, List
-from opencc import OpenCC
 from google.generativeai import GenerativeModel
 import google.generativeai as genai
 from logger import get_workflow_logger
+from text_normalizer import get_converter, add_cjk_spacing, normalize_llm_text, split_paragraphs
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -32,20 +31,12 @@ class GeminiFileClient:
         self.model = "gemini-2.0-flash"
         self.client = genai
         
-        # 建立繁簡轉換器，s2tw 表示從簡體轉換到繁體（台灣標準）
-        self.cc = OpenCC('s2tw')
-        
-        # 編譯正則表達式
-        self.chinese_pattern = re.compile(r'([\u4e00-\u9fff])([\da-zA-Z])')  # 中文後面接英文或數字
-        self.reverse_pattern = re.compile(r'([\da-zA-Z])([\u4e00-\u9fff])')  # 英文或數字後面接中文
+        # 共用的繁簡轉換器，s2tw 表示從簡體轉換到繁體（台灣標準）
+        self.cc = get_converter()
 
     def add_spaces(self, text: str) -> str:
         """在中文和英文/數字之間添加空格"""
-        # 在中文後面加空格
-        text = self.chinese_pattern.sub(r'\1 \2', text)
-        # 在中文前面加空格
-        text = self.reverse_pattern.sub(r'\1 \2', text)
-        return text
+        return add_cjk_spacing(text)
 
     def format_response(self, response: str) -> str:
         """格式化 Gemini API 的回應內容
@@ -60,18 +51,9 @@ class GeminiFileClient:
             3. 修正中英文空格
             4. 段落格式整理
         """
-        # 繁簡轉換
-        response = self.cc.convert(response)
-        
-        # 移除 markdown 粗體標記
-        response = response.replace('**', '')
-        
-        # 處理中英文和數字之間的空格
-        response = self.add_spaces(response)
-        
-        # 清理多餘的空白行並保持段落結構
-        paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
-        
+        # 繁簡轉換、清理 markdown 標記與中英文空格由共用的正規化函式一次處理
+        paragraphs = split_paragraphs(normalize_llm_text(response))
+
         # 使用空行分隔段落
         return '\n\n'.join(paragraphs)
 
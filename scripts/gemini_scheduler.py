@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# gemini_scheduler.py
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional, Tuple
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'gemini_scheduler')
+
+# 模型公布的配額（每分鐘請求數、每分鐘 token 數），可用環境變數覆寫
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+# 同時進行中的 Gemini 請求上限
+GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "4"))
+
+# 影片約每秒 258 個畫面 token 加 32 個音訊 token
+VIDEO_TOKENS_PER_SECOND = 290
+# 提示詞與回應的估計 token 數
+PROMPT_TOKENS = 2000
+OUTPUT_TOKENS = 2000
+# 無法得知時長時假設的影片秒數
+DEFAULT_VIDEO_DURATION = 180
+
+WINDOW = 60
+
+
+def estimate_tokens(duration: Optional[float]) -> int:
+    """由影片時長估計單次分析請求的 token 數
+
+    Args:
+        duration: 影片秒數，未知時為 None
+
+    Returns:
+        int: 估計的 token 數
+    """
+    seconds = duration if duration and duration > 0 else DEFAULT_VIDEO_DURATION
+    return int(seconds * VIDEO_TOKENS_PER_SECOND) + PROMPT_TOKENS + OUTPUT_TOKENS
+
+
+class QuotaScheduler:
+    """依每分鐘請求數與 token 數配額安排並行的 Gemini 請求
+
+    以 60 秒滑動視窗記錄已送出的請求與估計 token，新的請求在
+    不超過 RPM、TPM 與同時請求數上限時才放行，否則等待最早的紀錄離開視窗。
+    同一程序內的呼叫端應共用 get_gemini_scheduler() 返回的實例。
+
+    Args:
+        rpm: 每分鐘請求數上限
+        tpm: 每分鐘 token 數上限
+        max_concurrent: 同時進行中的請求上限
+    """
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM, max_concurrent: int = GEMINI_MAX_CONCURRENT):
+        self.rpm = max(1, rpm)
+        self.tpm = max(1, tpm)
+        self.max_concurrent = max(1, max_concurrent)
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def _prune(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= WINDOW:
+            self._window.popleft()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """目前還需要等待的秒數，0 表示可以立即送出"""
+        if self._active >= self.max_concurrent:
+            # 等待執行中的請求結束時喚醒
+            return WINDOW
+        used_tokens = sum(t for _, t in self._window)
+        if len(self._window) < self.rpm and (used_tokens + tokens <= self.tpm or not self._window):
+            return 0
+        return max(0.05, WINDOW - (now - self._window[0][0]))
+
+    def acquire(self, tokens: int) -> None:
+        """等待配額並登記一個請求"""
+        # 單一請求超過整分鐘的配額時，只能在視窗清空後單獨送出
+        tokens = min(tokens, self.tpm)
+        start_time = time.time()
+        with self._condition:
+            while True:
+                now = time.time()
+                self._prune(now)
+                wait_time = self._wait_time(tokens, now)
+                if wait_time <= 0:
+                    break
+                self._condition.wait(wait_time)
+            self._window.append((time.time(), tokens))
+            self._active += 1
+        waited = time.time() - start_time
+        if waited > 1:
+            logger.info(f"等待 Gemini 配額 {waited:.1f} 秒（估計 {tokens} tokens）")
+
+    def release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int):
+        """在配額內執行一個請求
+
+        Args:
+            tokens: 估計的 token 數
+        """
+        self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_scheduler: Optional[QuotaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_gemini_scheduler() -> QuotaScheduler:
+    """取得程序內共用的 Gemini 配額排程器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QuotaScheduler()
+        return _scheduler
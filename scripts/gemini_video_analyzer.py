@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import os
-import json
 import time
+import hashlib
+import mimetypes
+import threading
 import requests
 from typing import Dict, Optional, List, Union
 # 使用 google.genai 套件
@@ -10,6 +12,15 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 from logger import get_workflow_logger
+from result_cache import ResultCache
+from video_probe import youtube_id_from_url
+from retry_policy import RetryPolicy, RetryExhausted, is_video_unavailable
+from strategy_selector import StrategySelector
+from gemini_scheduler import get_gemini_scheduler, estimate_tokens
+from analysis_proxy import probe_duration
+from prompt_compiler import get_prompt
+from llm_metrics import track_call, CallRecord, OUTCOME_FAILED
+from text_normalizer import remove_phrases, clean_lines, VIDEO_BOUNDARY_PHRASES
 
 # 載入環境變數
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', '.env')
@@ -17,12 +28,44 @@ load_dotenv(dotenv_path)
 
 logger = get_workflow_logger('1', 'gemini_video_analyzer')
 
-# 提示詞路徑
-PROMPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prompts', 'gemini', 'video_analysis.json')
+# 提示詞名稱（prompts/gemini/video_analysis.json）
+PROMPT_NAME = 'gemini/video_analysis'
+
+# 分析結果快取設定
+ANALYSIS_CACHE_TTL = 30 * 24 * 60 * 60  # 30 天
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+
+# Files API 上傳的檔案保存 48 小時，提早一小時視為過期
+FILE_UPLOAD_TTL = 47 * 60 * 60
+# 等待上傳檔案進入 ACTIVE 狀態的上限秒數
+FILE_ACTIVE_TIMEOUT = 600
+
+# 單一分析方式重試時累計等待的上限秒數，超過後交由下一個備援方案
+RETRY_MAX_TOTAL_WAIT = 180
+
+# 分析策略：本地檔案、直接分析 YouTube 網址、下載後分析
+STRATEGY_FILE = 'file'
+STRATEGY_YOUTUBE = 'youtube'
+STRATEGY_DOWNLOAD = 'download'
+# 沒有統計資料前假設的耗時，決定初始順序（與原本固定的嘗試順序相同）
+STRATEGY_DEFAULT_LATENCY = {
+    STRATEGY_FILE: 60,
+    STRATEGY_YOUTUBE: 90,
+    STRATEGY_DOWNLOAD: 240,
+}
+
+# 同一檔案同時只上傳一次：依檔案雜湊分配到固定數量的鎖，數量不隨處理過的檔案增加
+UPLOAD_LOCK_STRIPES = 64
+_upload_locks: List[threading.Lock] = [threading.Lock() for _ in range(UPLOAD_LOCK_STRIPES)]
 
 class GeminiVideoAnalyzer:
-    def __init__(self):
-        """初始化 Gemini Video Analyzer"""
+    def __init__(self, bypass_cache: bool = False):
+        """初始化 Gemini Video Analyzer
+        
+        Args:
+            bypass_cache: 是否略過分析結果快取強制重新分析，
+                          也可用環境變數 GEMINI_CACHE_BYPASS=1 開啟
+        """
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("缺少 GEMINI_API_KEY 環境變數")
@@ -32,23 +75,180 @@ class GeminiVideoAnalyzer:
         self.model = "gemini-1.5-flash"  # 使用配額較高的模型
         logger.debug(f"初始化 Gemini Video Analyzer，使用模型: {self.model}")
         
-        # 載入提示詞模板
+        # 載入提示詞模板（編譯結果在程序內共用，設定檔修改後自動重新編譯）
         try:
-            with open(PROMPT_PATH, 'r', encoding='utf-8') as f:
-                self.prompt_config = json.load(f)
-                logger.debug(f"成功載入提示詞模板: {PROMPT_PATH}")
+            prompt = get_prompt(PROMPT_NAME)
+            logger.debug(f"成功載入提示詞模板: {PROMPT_NAME}（版本 {prompt.version}，{prompt.token_count} tokens）")
         except Exception as e:
             logger.error(f"載入提示詞模板失敗: {str(e)}")
             raise
+        
+        # 分析結果快取，鍵為 (模型, 提示詞雜湊, 影片)
+        bypass = bypass_cache or os.getenv("GEMINI_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+        self.cache = ResultCache(
+            'gemini_analysis',
+            ttl=ANALYSIS_CACHE_TTL,
+            max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+            bypass=bypass
+        )
+        # 已上傳至 Files API 的檔案，鍵為檔案內容雜湊，跨呼叫端與重試共用
+        self.uploaded_files = ResultCache('gemini_files', ttl=FILE_UPLOAD_TTL)
+        # 所有 GeminiVideoAnalyzer 實例共用同一個配額排程器
+        self.scheduler = get_gemini_scheduler()
+        # 各分析策略的成功率與耗時統計
+        self.strategy_selector = StrategySelector('gemini_strategy_stats', STRATEGY_DEFAULT_LATENCY)
+    
+    @property
+    def prompt_hash(self) -> str:
+        """編譯後提示詞的版本雜湊，提示詞內容改變時分析結果快取自動失效"""
+        return get_prompt(PROMPT_NAME).version
+    
+    def _build_prompt(self, video_type: str, video_info: str) -> str:
+        """以編譯後的模板產生提示詞"""
+        return get_prompt(PROMPT_NAME).render(video_type=video_type, video_info=video_info)
+    
+    def _generate(self, parts: List[types.Part], tokens: int, metrics: CallRecord) -> str:
+        """在配額內送出一次 generate_content 請求，並記錄嘗試次數與 token 用量
+        
+        Args:
+            parts: 請求內容
+            tokens: 估計的 token 數，用於配額排程
+            metrics: 本次分析的計量紀錄
+            
+        Returns:
+            str: 回應文字，沒有內容時拋出 RuntimeError 交由重試策略處理
+        """
+        metrics.attempts += 1
+        with self.scheduler.slot(tokens):
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=types.Content(parts=parts)
+            )
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            metrics.add_usage(
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None)
+            )
+        if response and hasattr(response, 'text') and response.text:
+            return response.text
+        raise RuntimeError("Gemini 未返回有效內容")
+    
+    @staticmethod
+    def _retry_policy(max_retries: int) -> RetryPolicy:
+        """依錯誤分類重試：permanent 立即停止，quota 依伺服器提示等待，累計等待有上限"""
+        return RetryPolicy(max_attempts=max_retries, max_total_wait=RETRY_MAX_TOTAL_WAIT)
+    
+    def _cache_key(self, video_key: str) -> str:
+        """產生分析結果的快取鍵"""
+        return ResultCache.make_key(self.model, self.prompt_hash, video_key)
+    
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        """以串流方式計算檔案內容的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _detect_mime_type(file_path: str) -> str:
+        """依副檔名判斷影片的 MIME 類型"""
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if mime_type and mime_type.startswith('video/'):
+            return mime_type
+        return 'video/mp4'
+    
+    @staticmethod
+    def _file_state(file) -> str:
+        state = getattr(file, 'state', None)
+        return getattr(state, 'name', str(state))
+    
+    def _wait_for_active(self, file):
+        """等待上傳的檔案處理完成（ACTIVE）"""
+        start_time = time.time()
+        while self._file_state(file) == 'PROCESSING':
+            if time.time() - start_time > FILE_ACTIVE_TIMEOUT:
+                raise TimeoutError(f"等待檔案 {file.name} 處理完成逾時")
+            time.sleep(5)
+            file = self.client.files.get(name=file.name)
+        
+        if self._file_state(file) != 'ACTIVE':
+            raise RuntimeError(f"檔案 {file.name} 處理失敗，狀態為 {self._file_state(file)}")
+        return file
+    
+    def upload_video_file(self, video_file_path: str, file_hash: Optional[str] = None):
+        """透過 Files API 上傳影片並等待可用，同一檔案在有效期內只上傳一次
+        
+        檔案由 SDK 從磁碟串流上傳，不需讀入記憶體。
+        
+        Args:
+            video_file_path: 本地影片檔案路徑
+            file_hash: 檔案內容雜湊，未提供時自動計算
+            
+        Returns:
+            Files API 的檔案物件（含 uri 與 mime_type）
+        """
+        file_hash = file_hash or self._file_hash(video_file_path)
+        
+        lock = _upload_locks[int(file_hash[:8], 16) % UPLOAD_LOCK_STRIPES]
+        with lock:
+            record = self.uploaded_files.get(file_hash)
+            if record:
+                try:
+                    file = self.client.files.get(name=record['name'])
+                    if self._file_state(file) in ('ACTIVE', 'PROCESSING'):
+                        logger.debug(f"重複使用已上傳的檔案: {record['name']}")
+                        return self._wait_for_active(file)
+                except Exception as e:
+                    logger.debug(f"已上傳的檔案無法使用，重新上傳: {str(e)}")
+            
+            mime_type = self._detect_mime_type(video_file_path)
+            size_mb = os.path.getsize(video_file_path) / 1024 / 1024
+            logger.info(f"上傳影片檔案至 Gemini Files API: {video_file_path} ({size_mb:.1f} MB, {mime_type})")
+            file = self.client.files.upload(
+                file=video_file_path,
+                config=types.UploadFileConfig(
+                    mime_type=mime_type,
+                    display_name=os.path.basename(video_file_path)
+                )
+            )
+            file = self._wait_for_active(file)
+            self.uploaded_files.set(file_hash, {
+                'name': file.name,
+                'uri': file.uri,
+                'mime_type': file.mime_type
+            })
+            return file
+    
+    def get_cached_analysis(self, youtube_id: str) -> Optional[str]:
+        """取得已快取的原始（未格式化）分析結果
+        
+        Args:
+            youtube_id: YouTube 影片 ID
+            
+        Returns:
+            有快取時返回原始分析文字，否則返回 None
+        """
+        return self.cache.get(self._cache_key(f"youtube:{youtube_id}"))
     
-    def analyze_youtube_video(self, youtube_url: str, title: str = "", max_retries: int = 10, use_wordpress_format: bool = True) -> Optional[str]:
+    def _output(self, result: str, use_wordpress_format: bool) -> str:
+        """根據參數決定是否套用 WordPress 格式"""
+        if not use_wordpress_format or self._is_command_line_execution():
+            return result
+        return self.format_response(result)
+    
+    def analyze_youtube_video(self, youtube_url: str, title: str = "", max_retries: int = 10, use_wordpress_format: bool = True, fallback_to_download: bool = True, duration: Optional[float] = None) -> Optional[str]:
         """直接分析 YouTube 影片
         
         Args:
             youtube_url: YouTube 影片網址
             title: 影片標題，可選
-            max_retries: 最大重試次數，預設為 10
+            max_retries: 最多嘗試次數，預設為 10（另受 RETRY_MAX_TOTAL_WAIT 限制）
             use_wordpress_format: 是否使用 WordPress 古騰堡格式，預設為 True
+            fallback_to_download: 直接分析失敗時是否改為下載後分析，預設為 True
+            duration: 影片秒數，用於估計配額用量，可選
             
         Returns:
             成功時返回分析結果文字，失敗時返回 None
@@ -68,115 +268,145 @@ class GeminiVideoAnalyzer:
         
         logger.info(f"開始分析 YouTube 影片: {youtube_url}")
         
-        for attempt in range(max_retries):
+        youtube_id = youtube_id_from_url(youtube_url)
+        cache_key = self._cache_key(f"youtube:{youtube_id}" if youtube_id else f"url:{youtube_url}")
+        cached = self.cache.get(cache_key)
+        if cached:
+            logger.info(f"使用快取的分析結果: {youtube_url}")
+            return self._output(cached, use_wordpress_format)
+        
+        # 嘗試取得影片標題作為額外資訊
+        video_info = f"YouTube 影片網址：{youtube_url}\n"
+        if title:
+            video_info += f"影片標題：{title}\n"
+        
+        # 使用提示詞模板
+        prompt = self._build_prompt("YouTube", video_info)
+        
+        tokens = estimate_tokens(duration)
+        # 使用與成功測試範例完全一致的格式處理 YouTube 網址
+        parts = [
+            types.Part(text=prompt),
+            types.Part(
+                file_data=types.FileData(file_uri=youtube_url)
+            )
+        ]
+        
+        with track_call('gemini', self.model, video=youtube_id or youtube_url) as metrics:
             try:
-                # 嘗試取得影片標題作為額外資訊
-                video_info = f"YouTube 影片網址：{youtube_url}\n"
-                if title:
-                    video_info += f"影片標題：{title}\n"
-                
-                # 使用提示詞模板
-                prompt = self.prompt_config["intro"]["content"].format(
-                    video_type="YouTube",
-                    video_info=video_info
+                result = self._retry_policy(max_retries).call(
+                    lambda: self._generate(parts, tokens, metrics), f"分析 YouTube 影片 {youtube_url}"
                 )
+            except RetryExhausted as e:
+                failure = e
+                metrics.outcome = OUTCOME_FAILED
+            else:
+                self.cache.set(cache_key, result)
                 
-                # 添加分析要素
-                prompt += "\n\n分析要素：\n"
-                for item in self.prompt_config["rules"]["analysis_elements"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                # 添加寫作風格要求
-                prompt += "\n寫作風格要求：\n"
-                for item in self.prompt_config["rules"]["writing_style"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                # 添加譯名標注規則
-                prompt += "\n譯名標注規則：\n"
-                name_format = self.prompt_config["rules"]["name_format"]
-                prompt += "1. " + name_format["japanese_name"]["title"] + "\n"
-                for item in name_format["japanese_name"]["items"]:
-                    prompt += f"   - {item['rule']}：「{item['example']}」\n"
-                
-                prompt += "\n2. " + name_format["foreign_name"]["title"] + "\n"
-                for rule in name_format["foreign_name"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
-                
-                prompt += "\n3. " + name_format["brand_name"]["title"] + "\n"
-                for rule in name_format["brand_name"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
-                
-                # 添加作品名稱規則
-                prompt += "\n4. " + self.prompt_config["rules"]["work_format"]["title"] + "\n"
-                for rule in self.prompt_config["rules"]["work_format"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"{ex}" for ex in rule["examples"]) + "\n"
-                
-                # 添加內容結構規則
-                prompt += "\n內容結構規則：\n"
-                for item in self.prompt_config["rules"]["content_structure"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                logger.info(f"開始分析 YouTube 影片: {youtube_url} (嘗試 {attempt + 1}/{max_retries})")
-                
-                # 嘗試使用影片分析功能
-                try:
-                    # 根據文件，使用正確的格式處理 YouTube 網址
-                    logger.info(f"使用 YouTube 網址分析影片: {youtube_url}")
-                    
-                    # 使用與成功測試範例完全一致的格式
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=types.Content(
-                            parts=[
-                                types.Part(text=prompt),
-                                types.Part(
-                                    file_data=types.FileData(file_uri=youtube_url)
-                                )
-                            ]
-                        )
-                    )
-                except Exception as e:
-                    logger.error(f"分析 YouTube 影片時發生錯誤: {str(e)}")
-                    # 不再嘗試替代方法，直接失敗
-                    raise
-                
-                if response and hasattr(response, 'text') and response.text:
-                    # 成功獲取回應
-                    result = response.text
-                    
-                    # 根據參數決定是否套用 WordPress 格式
-                    if not use_wordpress_format or self._is_command_line_execution():
-                        return result
-                    else:
-                        return self.format_response(result)
-                else:
-                    logger.error("Gemini 未返回有效內容")
-                    
-            except Exception as e:
-                logger.error(f"分析 YouTube 影片時發生錯誤: {str(e)}")
-                if attempt < max_retries - 1:
-                    wait_time = 30  # 等待 30 秒後重試
-                    logger.info(f"等待 {wait_time} 秒後重試...")
-                    time.sleep(wait_time)
+                # 根據參數決定是否套用 WordPress 格式
+                return self._output(result, use_wordpress_format)
         
-        # 直接分析失敗後，嘗試下載影片後分析
-        logger.info(f"直接分析 YouTube 影片失敗，嘗試下載後分析: {youtube_url}")
-        try:
-            return self.analyze_youtube_video_by_download(youtube_url, title, max_retries)
-        except Exception as e:
-            logger.error(f"下載後分析 YouTube 影片也失敗: {str(e)}")
-            error_message = f"""分析 YouTube 影片失敗，已重試 {max_retries} 次。
+        error_message = f"""分析 YouTube 影片失敗（{failure.error_class}，嘗試 {failure.attempts} 次）。
 
 **技術限制說明**：
 
 無法分析影片內容。請確保影片網址正確並可公開存取。
+
+錯誤：{failure.error}
 """
-            logger.error(f"分析 YouTube 影片失敗，已重試 {max_retries} 次")
+        if not fallback_to_download:
+            logger.error(f"分析 YouTube 影片失敗，嘗試 {failure.attempts} 次")
             return error_message
+
+        # 直接分析失敗後，嘗試下載影片後分析
+        logger.info(f"直接分析 YouTube 影片失敗，嘗試下載後分析: {youtube_url}")
+        try:
+            return self.analyze_youtube_video_by_download(youtube_url, title, max_retries, use_wordpress_format)
+        except Exception as e:
+            logger.error(f"下載後分析 YouTube 影片也失敗: {str(e)}")
+            logger.error(f"分析 YouTube 影片失敗，嘗試 {failure.attempts} 次")
+            return error_message
+    
+    def analyze_adaptive(self, youtube_url: str, title: str = "", video_file_path: Optional[str] = None,
+                         youtube_id: Optional[str] = None, use_wordpress_format: bool = True,
+                         duration: Optional[float] = None) -> Optional[str]:
+        """依歷史統計選擇分析策略，逐一嘗試直到成功
+        
+        可用策略為本地檔案（需提供 video_file_path 且檔案存在）、直接分析 YouTube 網址
+        與下載後分析。嘗試順序由 StrategySelector 依預期成功所需時間決定，
+        最近系統性失敗的策略（例如 YouTube 網址分析中斷）會暫時略過。
+        
+        Args:
+            youtube_url: YouTube 影片網址
+            title: 影片標題，可選
+            video_file_path: 已下載的本地影片路徑，可選
+            youtube_id: YouTube 影片 ID，未提供時由網址解析
+            use_wordpress_format: 是否使用 WordPress 古騰堡格式，預設為 True
+            duration: 影片秒數，用於估計配額用量，可選
+            
+        Returns:
+            成功時返回分析結果文字，全部失敗時返回最後一個策略的失敗訊息
+        """
+        youtube_id = youtube_id or youtube_id_from_url(youtube_url)
+        
+        # 快取命中不計入策略統計
+        if youtube_id:
+            cached = self.get_cached_analysis(youtube_id)
+            if cached:
+                logger.info(f"使用快取的分析結果: {youtube_url}")
+                return self._output(cached, use_wordpress_format)
+        
+        runners = {
+            STRATEGY_FILE: lambda: self.analyze_video_file(
+                video_file_path, title, use_wordpress_format=False, youtube_id=youtube_id
+            ),
+            STRATEGY_YOUTUBE: lambda: self.analyze_youtube_video(
+                youtube_url, title, use_wordpress_format=False, fallback_to_download=False, duration=duration
+            ),
+            STRATEGY_DOWNLOAD: lambda: self.analyze_youtube_video_by_download(
+                youtube_url, title, use_wordpress_format=False
+            ),
+        }
+        candidates = [STRATEGY_YOUTUBE, STRATEGY_DOWNLOAD]
+        if video_file_path and os.path.exists(video_file_path):
+            candidates.insert(0, STRATEGY_FILE)
+        
+        result = None
+        for strategy in self.strategy_selector.order(candidates):
+            logger.info(f"使用策略 {strategy} 分析影片: {youtube_url}")
+            start_time = time.time()
+            try:
+                result = runners[strategy]()
+            except Exception as e:
+                logger.error(f"策略 {strategy} 發生錯誤: {str(e)}")
+                result = None
+            success = not self.is_failed_result(result)
+            # 私人、已移除等只與這支影片有關的失敗不計入策略的連續失敗
+            video_specific = not success and bool(result) and is_video_unavailable(result)
+            self.strategy_selector.record(strategy, success, time.time() - start_time, video_specific)
+            if success:
+                return self._output(result, use_wordpress_format)
+        
+        return result
     
+    @staticmethod
+    def is_failed_result(result: Optional[str]) -> bool:
+        """判斷分析結果是否為失敗訊息（各 analyze_* 方法失敗時返回說明文字而非 None）
+        
+        Args:
+            result: analyze_* 方法的返回值
+            
+        Returns:
+            失敗或沒有內容時返回 True
+        """
+        if not result:
+            return True
+        return (
+            "技術限制說明" in result
+            or result.startswith("下載 YouTube 影片失敗")
+            or result.startswith("下載或分析 YouTube 影片時發生錯誤")
+        )
+
     def _clean_response(self, response: str) -> str:
         """清理回應文字，移除「影片開始」和「影片結束」等敘述
         
@@ -186,23 +416,11 @@ class GeminiVideoAnalyzer:
         Returns:
             清理後的回應文字
         """
-        # 移除「影片開始」、「影片結束」等敘述
-        phrases_to_remove = [
-            "影片開始", "影片結束", "影片開始時", "影片結束時",
-            "影片一開始", "影片最後", "影片結尾"
-        ]
-        
-        cleaned_response = response
-        for phrase in phrases_to_remove:
-            cleaned_response = cleaned_response.replace(phrase, "")
-            # 同時處理可能的大小寫差異
-            cleaned_response = cleaned_response.replace(phrase.upper(), "")
-            cleaned_response = cleaned_response.replace(phrase.capitalize(), "")
+        # 一次掃描移除「影片開始」、「影片結束」等敘述
+        cleaned_response = remove_phrases(response, VIDEO_BOUNDARY_PHRASES)
         
         # 移除可能的空行和多餘的空格
-        cleaned_response = "\n".join([line.strip() for line in cleaned_response.split("\n") if line.strip()])
-        
-        return cleaned_response
+        return clean_lines(cleaned_response)
         
     def format_response(self, response: str, use_wordpress_format: bool = True) -> str:
         """格式化回應，可選擇是否轉換為 WordPress 古騰堡格式
@@ -241,119 +459,86 @@ class GeminiVideoAnalyzer:
         # 如果是從 gemini_video_analyzer.py 或 test_single_video.py 執行，都視為命令列執行
         return sys.argv[0].endswith('gemini_video_analyzer.py') or sys.argv[0].endswith('test_single_video.py')
         
-    def analyze_video_file(self, video_file_path: str, title: str = "", max_retries: int = 10, use_wordpress_format: bool = True) -> Optional[str]:
+    def analyze_video_file(self, video_file_path: str, title: str = "", max_retries: int = 10, use_wordpress_format: bool = True, youtube_id: Optional[str] = None) -> Optional[str]:
         """分析本地影片檔案
         
         Args:
             video_file_path: 本地影片檔案路徑
             title: 影片標題，可選
-            max_retries: 最大重試次數，預設為 10
+            max_retries: 最多嘗試次數，預設為 10（另受 RETRY_MAX_TOTAL_WAIT 限制）
             use_wordpress_format: 是否使用 WordPress 古騰堡格式，預設為 True
+            youtube_id: 影片的 YouTube ID，提供時以此作為快取鍵，否則使用檔案內容雜湊
             
         Returns:
             成功時返回分析結果文字，失敗時返回 None
         """
         logger.info(f"開始分析本地影片檔案: {video_file_path}")
         
-        for attempt in range(max_retries):
-            try:
-                # 嘗試取得影片標題作為額外資訊
-                video_info = f"影片檔案路徑：{video_file_path}\n"
-                if title:
-                    video_info += f"影片標題：{title}\n"
-                
-                # 使用提示詞模板
-                prompt = self.prompt_config["intro"]["content"].format(
-                    video_type="本地",
-                    video_info=video_info
-                )
-                
-                # 添加分析要素
-                prompt += "\n\n分析要素：\n"
-                for item in self.prompt_config["rules"]["analysis_elements"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                # 添加寫作風格要求
-                prompt += "\n寫作風格要求：\n"
-                for item in self.prompt_config["rules"]["writing_style"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                # 添加譯名標注規則
-                prompt += "\n譯名標注規則：\n"
-                name_format = self.prompt_config["rules"]["name_format"]
-                prompt += "1. " + name_format["japanese_name"]["title"] + "\n"
-                for item in name_format["japanese_name"]["items"]:
-                    prompt += f"   - {item['rule']}：「{item['example']}」\n"
-                
-                prompt += "\n2. " + name_format["foreign_name"]["title"] + "\n"
-                for rule in name_format["foreign_name"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
-                
-                prompt += "\n3. " + name_format["brand_name"]["title"] + "\n"
-                for rule in name_format["brand_name"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
-                
-                # 添加作品名稱規則
-                prompt += "\n4. " + self.prompt_config["rules"]["work_format"]["title"] + "\n"
-                for rule in self.prompt_config["rules"]["work_format"]["rules"]:
-                    prompt += f"   - {rule['type']}：{rule['rule']}\n"
-                    prompt += "     例如：" + "、".join(f"{ex}" for ex in rule["examples"]) + "\n"
-                
-                # 添加內容結構規則
-                prompt += "\n內容結構規則：\n"
-                for item in self.prompt_config["rules"]["content_structure"]["items"]:
-                    prompt += f"- {item}\n"
-                
-                logger.info(f"開始分析本地影片檔案: {video_file_path} (嘗試 {attempt + 1}/{max_retries})")
-                
-                # 讀取影片檔案
-                with open(video_file_path, "rb") as f:
-                    video_data = f.read()
-                
-                # 使用 Gemini API 分析影片
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=types.Content(
-                        parts=[
-                            types.Part(text=prompt),
-                            types.Part(
-                                inline_data={
-                                    "mime_type": "video/mp4",  # 根據實際影片格式調整
-                                    "data": video_data
-                                }
-                            )
-                        ]
+        file_hash = self._file_hash(video_file_path) if os.path.exists(video_file_path) else None
+        cache_key = None
+        if youtube_id:
+            cache_key = self._cache_key(f"youtube:{youtube_id}")
+        elif file_hash:
+            cache_key = self._cache_key(f"sha256:{file_hash}")
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached:
+            logger.info(f"使用快取的分析結果: {video_file_path}")
+            return self._output(cached, use_wordpress_format)
+        
+        # 上傳後的檔案在各次重試間共用
+        uploaded_file = None
+        
+        # 嘗試取得影片標題作為額外資訊
+        video_info = f"影片檔案路徑：{video_file_path}\n"
+        if title:
+            video_info += f"影片標題：{title}\n"
+        
+        # 使用提示詞模板
+        prompt = self._build_prompt("本地", video_info)
+        
+        tokens = estimate_tokens(probe_duration(video_file_path) if file_hash else None)
+        
+        def generate(metrics: CallRecord) -> str:
+            nonlocal uploaded_file
+            # 透過 Files API 上傳影片（只在第一次或上次上傳失敗時上傳）
+            if uploaded_file is None:
+                uploaded_file = self.upload_video_file(video_file_path, file_hash)
+            
+            parts = [
+                types.Part(text=prompt),
+                types.Part(
+                    file_data=types.FileData(
+                        file_uri=uploaded_file.uri,
+                        mime_type=uploaded_file.mime_type
                     )
                 )
+            ]
+            return self._generate(parts, tokens, metrics)
+        
+        with track_call('gemini', self.model, video=youtube_id or file_hash or video_file_path) as metrics:
+            try:
+                result = self._retry_policy(max_retries).call(
+                    lambda: generate(metrics), f"分析本地影片檔案 {video_file_path}"
+                )
+            except RetryExhausted as e:
+                failure = e
+                metrics.outcome = OUTCOME_FAILED
+            else:
+                if cache_key:
+                    self.cache.set(cache_key, result)
                 
-                if response and hasattr(response, 'text') and response.text:
-                    # 成功獲取回應
-                    result = response.text
-                    
-                    # 根據參數決定是否套用 WordPress 格式
-                    if not use_wordpress_format or self._is_command_line_execution():
-                        return result
-                    else:
-                        return self.format_response(result)
-                else:
-                    logger.error("Gemini 未返回有效內容")
-                    
-            except Exception as e:
-                logger.error(f"分析本地影片檔案時發生錯誤: {str(e)}")
-                if attempt < max_retries - 1:
-                    wait_time = 30  # 等待 30 秒後重試
-                    logger.info(f"等待 {wait_time} 秒後重試...")
-                    time.sleep(wait_time)
+                # 根據參數決定是否套用 WordPress 格式
+                return self._output(result, use_wordpress_format)
         
-        error_message = f"""分析本地影片檔案失敗，已重試 {max_retries} 次。
+        error_message = f"""分析本地影片檔案失敗（{failure.error_class}，嘗試 {failure.attempts} 次）。
 
 **技術限制說明**：
 
 無法分析影片內容。請確保影片檔案格式正確且可存取。
+
+錯誤：{failure.error}
 """
-        logger.error(f"分析本地影片檔案失敗，已重試 {max_retries} 次")
+        logger.error(f"分析本地影片檔案失敗，嘗試 {failure.attempts} 次")
         return error_message
         
     def analyze_youtube_video_by_download(self, youtube_url: str, title: str = "", max_retries: int = 3, use_wordpress_format: bool = True) -> Optional[str]:
@@ -374,6 +559,14 @@ class GeminiVideoAnalyzer:
         
         logger.info(f"開始下載並分析 YouTube 影片: {youtube_url}")
         
+        # 已有分析結果時不需要下載
+        youtube_id = youtube_id_from_url(youtube_url)
+        if youtube_id:
+            cached = self.get_cached_analysis(youtube_id)
+            if cached:
+                logger.info(f"使用快取的分析結果: {youtube_url}")
+                return self._output(cached, use_wordpress_format)
+        
         # 創建臨時目錄存放下載的影片
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_video_path = os.path.join(temp_dir, "video.mp4")
@@ -393,7 +586,7 @@ class GeminiVideoAnalyzer:
                 if os.path.exists(temp_video_path):
                     # 使用 analyze_video_file 方法分析下載的影片
                     logger.info(f"下載成功，開始分析影片檔案: {temp_video_path}")
-                    return self.analyze_video_file(temp_video_path, title, max_retries, use_wordpress_format)
+                    return self.analyze_video_file(temp_video_path, title, max_retries, use_wordpress_format, youtube_id=youtube_id)
                 else:
                     logger.error(f"下載 YouTube 影片失敗: {youtube_url}")
                     return f"下載 YouTube 影片失敗: {youtube_url}"
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# llm_metrics.py
+
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Optional
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'llm_metrics')
+
+# 呼叫紀錄檔，每行一筆 JSON
+METRICS_PATH = os.getenv(
+    "LLM_METRICS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'llm_metrics.jsonl')
+)
+
+OUTCOME_SUCCESS = 'success'
+OUTCOME_FAILED = 'failed'   # 呼叫端判定失敗（例如重試用盡後返回失敗訊息）
+OUTCOME_ERROR = 'error'     # 區塊內拋出例外
+
+_write_lock = threading.Lock()
+
+
+@dataclass
+class CallRecord:
+    """單次 LLM 呼叫的計量資料，由呼叫端在 track_call 區塊內填寫"""
+    service: str
+    model: str
+    video: Optional[str] = None
+    attempts: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    outcome: Optional[str] = None
+    latency: float = 0.0
+    timestamp: float = 0.0
+    hedged: int = 0     # 送出的對沖請求數
+    hedge_abandoned: int = 0    # 已採用其他回應、仍在背景執行而被捨棄的請求數
+
+    def add_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        """累加一次請求回報的 token 用量（重試時逐次累加）"""
+        if isinstance(prompt_tokens, int):
+            self.prompt_tokens += prompt_tokens
+        if isinstance(completion_tokens, int):
+            self.completion_tokens += completion_tokens
+
+
+def _append(record: CallRecord) -> None:
+    try:
+        os.makedirs(os.path.dirname(METRICS_PATH), exist_ok=True)
+        line = json.dumps(asdict(record), ensure_ascii=False) + "\n"
+        with _write_lock:
+            with open(METRICS_PATH, 'a', encoding='utf-8') as f:
+                f.write(line)
+    except Exception as e:
+        logger.warning(f"寫入 LLM 呼叫紀錄失敗: {str(e)}")
+
+
+@contextmanager
+def track_call(service: str, model: str, video: Optional[str] = None) -> Iterator[CallRecord]:
+    """記錄區塊內一次 LLM 呼叫的耗時、token、嘗試次數與結果
+
+    區塊正常結束且未設定 outcome 時記為 success，拋出例外時記為 error。
+
+    Args:
+        service: 服務名稱，例如 'gemini'、'perplexity'、'openai'
+        model: 模型名稱
+        video: 影片識別（YouTube ID、標題等），用於統計每支影片的用量
+    """
+    record = CallRecord(service=service, model=model, video=video, timestamp=time.time())
+    start_time = time.time()
+    try:
+        yield record
+    except BaseException:
+        record.outcome = OUTCOME_ERROR
+        raise
+    finally:
+        record.latency = round(time.time() - start_time, 3)
+        if record.outcome is None:
+            record.outcome = OUTCOME_SUCCESS
+        _append(record)
+
+
+def load_records(path: str = None, since: Optional[float] = None) -> List[Dict]:
+    """讀取呼叫紀錄，略過無法解析的行"""
+    path = path or METRICS_PATH
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is None or record.get('timestamp', 0) >= since:
+                records.append(record)
+    return records
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近排名法百分位數"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_percentile(service: str, model: str, pct: float, min_samples: int = 10,
+                       recent: int = 200, path: str = None) -> Optional[float]:
+    """最近成功且一次就完成的呼叫的延遲百分位數
+
+    重試過的呼叫包含退避等待，不計入。
+
+    Args:
+        service: 服務名稱
+        model: 模型名稱
+        pct: 百分位數，例如 90
+        min_samples: 紀錄少於此數時返回 None
+        recent: 只取最近幾筆紀錄
+        path: 呼叫紀錄檔路徑
+
+    Returns:
+        Optional[float]: 延遲秒數，紀錄不足時為 None
+    """
+    latencies = [
+        r['latency'] for r in load_records(path)
+        if r.get('service') == service and r.get('model') == model
+        and r.get('outcome') == OUTCOME_SUCCESS and r.get('attempts') == 1
+    ][-recent:]
+    if len(latencies) < min_samples:
+        return None
+    return percentile(latencies, pct)
+
+
+def summarize(records: List[Dict]) -> Dict[str, Dict]:
+    """依服務與模型彙整延遲、token 與每支影片的用量"""
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for record in records:
+        groups[f"{record['service']}/{record['model']}"].append(record)
+
+    summary = {}
+    for key, items in sorted(groups.items()):
+        latencies = [r['latency'] for r in items]
+        per_video: Dict[str, int] = defaultdict(int)
+        for r in items:
+            if r.get('video'):
+                per_video[r['video']] += r.get('prompt_tokens', 0) + r.get('completion_tokens', 0)
+        video_tokens = list(per_video.values())
+        summary[key] = {
+            'calls': len(items),
+            'success_rate': sum(r['outcome'] == OUTCOME_SUCCESS for r in items) / len(items),
+            'p50_latency': percentile(latencies, 50),
+            'p95_latency': percentile(latencies, 95),
+            'mean_attempts': sum(r.get('attempts', 0) for r in items) / len(items),
+            'prompt_tokens': sum(r.get('prompt_tokens', 0) for r in items),
+            'completion_tokens': sum(r.get('completion_tokens', 0) for r in items),
+            'hedged': sum(r.get('hedged', 0) for r in items),
+            'hedge_abandoned': sum(r.get('hedge_abandoned', 0) for r in items),
+            'videos': len(video_tokens),
+            'p50_tokens_per_video': percentile(video_tokens, 50),
+            'p95_tokens_per_video': percentile(video_tokens, 95),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='彙整 LLM 呼叫的延遲與 token 用量')
+    parser.add_argument('--path', default=METRICS_PATH, help='呼叫紀錄檔路徑')
+    parser.add_argument('--days', type=float, help='只統計最近幾天的紀錄')
+    parser.add_argument('--json', action='store_true', help='以 JSON 輸出')
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if args.days else None
+    summary = summarize(load_records(args.path, since))
+    if not summary:
+        print(f"沒有呼叫紀錄: {args.path}")
+        sys.exit(0)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    header = f"{'服務/模型':<32}{'次數':>6}{'成功率':>8}{'p50秒':>8}{'p95秒':>8}{'嘗試':>6}{'影片':>6}{'p50 tok/片':>12}{'p95 tok/片':>12}"
+    print(header)
+    for key, s in summary.items():
+        print(
+            f"{key:<32}{s['calls']:>6}{s['success_rate']:>8.0%}{s['p50_latency']:>8.1f}{s['p95_latency']:>8.1f}"
+            f"{s['mean_attempts']:>6.1f}{s['videos']:>6}{s['p50_tokens_per_video']:>12}{s['p95_tokens_per_video']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,73 @@
 #!/usr/bin/env python3
 
 import os
-import json
 import requests
-import re
-from opencc import OpenCC
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from logger import get_workflow_logger
+from prompt_compiler import get_prompt
+from llm_metrics import track_call, latency_percentile, OUTCOME_FAILED
+from failed_jobs import record_failure, JOB_PERPLEXITY
+from result_cache import ResultCache
+from text_normalizer import get_converter, add_cjk_spacing, normalize_llm_text, split_paragraphs, to_gutenberg
 
 logger = get_workflow_logger('1', 'perplexity_client')
 
+# 提示詞名稱（prompts/perplexity/content_generation.json）
+PROMPT_NAME = 'perplexity/content_generation'
+MODEL = "sonar"
+
+# 搜尋結果快取設定
+SEARCH_CACHE_TTL = 30 * 24 * 60 * 60  # 30 天
+SEARCH_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+REQUEST_TIMEOUT = 30
+
+# 對沖請求：第一個請求超過近期 p90 延遲仍未返回時，送出第二個相同請求，採用先返回的結果
+HEDGE_ENABLED = os.getenv("PERPLEXITY_HEDGE", "").lower() in ("1", "true", "yes")
+# 每次執行（程序）最多送出的對沖請求數
+HEDGE_BUDGET = int(os.getenv("PERPLEXITY_HEDGE_BUDGET", "10"))
+HEDGE_PERCENTILE = 90
+# 呼叫紀錄不足時的等待秒數，以及等待秒數下限
+HEDGE_DEFAULT_DELAY = 15
+HEDGE_MIN_DELAY = 2
+
+
+def normalize_title(title: str) -> str:
+    """正規化標題作為快取鍵：全形轉半形、合併空白、忽略大小寫"""
+    return ' '.join(unicodedata.normalize('NFKC', title).split()).casefold()
+
+
+class HedgeBudget:
+    """程序內共用的對沖請求額度，避免服務整體變慢時每個請求都加倍送出"""
+
+    def __init__(self, limit: int):
+        self.limit = max(0, limit)
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        """取得一次對沖額度，已用完時返回 False"""
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+_hedge_budget = HedgeBudget(HEDGE_BUDGET)
+
+
 class PerplexityClient:
-    def __init__(self):
-        """初始化 Perplexity API 客戶端"""
+    def __init__(self, bypass_cache: bool = False, hedge: bool = None):
+        """初始化 Perplexity API 客戶端
+
+        Args:
+            bypass_cache: 是否略過搜尋結果快取強制重新搜尋，
+                          也可用環境變數 PERPLEXITY_CACHE_BYPASS=1 開啟
+            hedge: 是否啟用對沖請求，None 時依環境變數 PERPLEXITY_HEDGE
+        """
         self.api_key = os.getenv("PERPLEXITY_API_KEY")
         if not self.api_key:
             raise ValueError("Missing PERPLEXITY_API_KEY in environment variables")
@@ -21,19 +77,37 @@ class PerplexityClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        self.cc = OpenCC('s2tw')  # 建立繁簡轉換器，s2tw 表示從簡體轉換到繁體（台灣標準）
+        self.cc = get_converter()  # 共用的繁簡轉換器，s2tw 表示從簡體轉換到繁體（台灣標準）
         
         # 載入 prompt 模板
         self.load_prompt_template()
 
+        # 搜尋結果快取，鍵為 (模型, 提示詞版本, 正規化標題)，同時保存原始回應與古騰堡格式
+        bypass = bypass_cache or os.getenv("PERPLEXITY_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+        self.cache = ResultCache(
+            'perplexity_search',
+            ttl=SEARCH_CACHE_TTL,
+            max_bytes=SEARCH_CACHE_MAX_BYTES,
+            bypass=bypass
+        )
+
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
+        self.hedge_delay = self._hedge_delay() if self.hedge else None
+
+    def _hedge_delay(self) -> float:
+        """由呼叫紀錄中近期的 p90 延遲決定送出對沖請求前的等待秒數"""
+        delay = latency_percentile('perplexity', MODEL, HEDGE_PERCENTILE)
+        if delay is None:
+            delay = HEDGE_DEFAULT_DELAY
+        delay = max(HEDGE_MIN_DELAY, delay)
+        logger.debug(f"啟用對沖請求，等待 {delay:.1f} 秒後送出第二個請求（剩餘額度 {_hedge_budget.limit - _hedge_budget.used}）")
+        return delay
+
     def load_prompt_template(self):
-        """載入並組合 prompt 模板"""
-        prompt_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../prompts/perplexity/content_generation.json')
+        """載入編譯後的 prompt 模板（程序內共用，設定檔修改後自動重新編譯）"""
         try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                self.prompt_config = json.load(f)
-                logger.debug("成功載入 prompt 設定")
-                
+            self.prompt = get_prompt(PROMPT_NAME)
+            logger.debug(f"成功載入 prompt 設定（版本 {self.prompt.version}，{self.prompt.token_count} tokens）")
         except Exception as e:
             logger.error(f"載入 prompt 模板時發生錯誤: {str(e)}")
             raise
@@ -47,220 +121,138 @@ class PerplexityClient:
         Returns:
             str: 完整的 prompt 字串
         """
-        data = self.prompt_config
-        prompt = []
-        
-        # 1. 添加開場白
-        prompt.append(data['intro']['content'].format(title=title))
-        prompt.append("")  # 空行
-        
-        rules = data['rules']
-        
-        # 2. 添加規則
-        # 連結和來源規則
-        source = rules['source']
-        prompt.append(f"{source['title']}：")
-        for item in source['items']:
-            prompt.append(f"- {item}")
-        prompt.append(f"例如：{source['example']}")
-        prompt.append("")
-        
-        # 寫作風格規則
-        style = rules['writing_style']
-        prompt.append(f"{style['title']}：")
-        for i, item in enumerate(style['items'], 1):
-            prompt.append(f"{i}. {item}")
-        prompt.append("")
-        
-        # 譯名標注規則
-        name_format = rules['name_format']
-        prompt.append(f"{name_format['title']}（重要！）：")
-        
-        # 日文人名
-        jp = name_format['japanese_name']
-        prompt.append(f"A. {jp['title']}：")
-        for item in jp['items']:
-            rule_line = "   - {}：「{}」".format(item['rule'], item['example'])
-            prompt.append(rule_line)
-        prompt.append("")
-        
-        # 外國人名
-        foreign = name_format['foreign_name']
-        prompt.append(f"B. {foreign['title']}：")
-        for rule_set in foreign['rules']:
-            prompt.append(f"   - {rule_set['type']}：{rule_set['rule']}")
-            examples = ["「{}」".format(ex) for ex in rule_set['examples']]
-            prompt.append("     例如：" + "、".join(examples))
-            prompt.append("")
-        
-        # 品牌名稱
-        brand = name_format['brand_name']
-        prompt.append(f"C. {brand['title']}：")
-        for rule_set in brand['rules']:
-            prompt.append(f"   - {rule_set['type']}：{rule_set['rule']}")
-            examples = ["「{}」".format(ex) for ex in rule_set['examples']]
-            prompt.append("     例如：" + "、".join(examples))
-            prompt.append("")
-        
-        # 影視作品規則
-        work = rules['work_format']
-        prompt.append(f"D. {work['title']}：")
-        for rule in work['rules']:
-            prompt.append(f"   - {rule['type']}：{rule['rule']}")
-            examples = ["「{}」".format(ex) for ex in rule['examples']]
-            prompt.append("     例如：" + "、".join(examples))
-            prompt.append("")
-        
-        # 內容結構規則
-        structure = rules['content_structure']
-        prompt.append(f"{structure['title']}：")
-        for item in structure['items']:
-            prompt.append(f"- {item}")
-        prompt.append("")
-        
-        # 嚴格檢查
-        final = rules['final_check']
-        prompt.append(f"{final['title']}：")
-        prompt.append(final['content'])
-        
-        # 3. 添加範例
-        if data.get('examples'):
-            prompt.append("")  # 添加空行
-            prompt.append("實際範例參考：")
-            for example in data['examples']:
-                title_line = "輸入標題：" + example['input']
-                content_line = "輸出內容：\n" + example['output']
-                prompt.append(title_line)
-                prompt.append(content_line)
-        
-        return "\n".join(prompt)
+        return get_prompt(PROMPT_NAME).render(title=title)
+
+    def _cache_key(self, title: str) -> str:
+        """產生搜尋結果的快取鍵，提示詞內容改變時失效"""
+        return ResultCache.make_key(MODEL, get_prompt(PROMPT_NAME).version, normalize_title(title))
 
     def add_spaces(self, text: str) -> str:
         """在中文和英文/數字之間添加空格"""
-        # 在中文後面加空格
-        text = re.sub(r'([\u4e00-\u9fff])([a-zA-Z0-9])', r'\1 \2', text)
-        # 在中文前面加空格
-        text = re.sub(r'([a-zA-Z0-9])([\u4e00-\u9fff])', r'\1 \2', text)
-        return text
+        return add_cjk_spacing(text)
 
     def format_response(self, response: str) -> str:
-        """格式化回應"""
-        # 先進行繁簡轉換
-        response = self.cc.convert(response)
-        
-        # 移除 markdown 粗體標記
-        response = response.replace('**', '')
-        
-        # 處理中英文和數字之間的空格
-        response = self.add_spaces(response)
-        
-        # 將內容轉換為古騰堡格式
-        paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
-        formatted_content = []
-        
-        for p in paragraphs:
-            formatted_content.append("<!-- wp:paragraph -->\n<p>{}</p>\n<!-- /wp:paragraph -->".format(p))
-        
-        return '\n\n'.join(formatted_content)
+        """格式化回應：繁簡轉換、移除 markdown 粗體標記、中英文空格，再轉換為古騰堡格式"""
+        return to_gutenberg(split_paragraphs(normalize_llm_text(response)))
+
+    def _post(self, payload: dict, session: requests.Session = None) -> requests.Response:
+        return (session or requests).post(
+            self.base_url,
+            headers=self.headers,
+            json=payload,
+            timeout=REQUEST_TIMEOUT
+        )
+
+    def _send(self, payload: dict, metrics=None) -> requests.Response:
+        """送出請求，啟用對沖時第一個請求超過 hedge_delay 仍未返回則再送一個相同請求
+
+        每個請求使用各自的 Session，採用先成功返回的回應後關閉所有 Session，
+        較慢的請求無法中途取消，結束時連線直接丟棄、不回到連線池，並計入 hedge_abandoned。
+        兩個請求都失敗時返回最後的錯誤回應或拋出最後的例外。
+        """
+        if not self.hedge:
+            return self._post(payload)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        sessions = []
+
+        def submit():
+            session = requests.Session()
+            sessions.append(session)
+            return executor.submit(self._post, payload, session)
 
-    def search(self, title: str) -> str:
-        """使用影片標題進行搜索並返回格式化的內容（含指數退避重試）"""
+        try:
+            pending = {submit()}
+            done, _ = wait(pending, timeout=self.hedge_delay)
+            if not done and _hedge_budget.take():
+                logger.info(f"Perplexity 請求超過 {self.hedge_delay:.1f} 秒未返回，送出對沖請求")
+                if metrics is not None:
+                    metrics.hedged += 1
+                pending.add(submit())
+
+            last_response, last_error = None, None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if response.status_code == 200:
+                        if pending:
+                            logger.debug(f"採用先返回的回應，捨棄 {len(pending)} 個仍在執行的請求")
+                            if metrics is not None:
+                                metrics.hedge_abandoned += len(pending)
+                        return response
+                    last_response = response
+            if last_response is not None:
+                return last_response
+            raise last_error
+        finally:
+            # 回應內容已讀取完畢，關閉 Session 不影響採用的回應
+            for session in sessions:
+                session.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def search(self, title: str, journal_failures: bool = True) -> str:
+        """使用影片標題進行搜索並返回格式化的內容（含指數退避重試）
+
+        Args:
+            title: 影片標題
+            journal_failures: 重試用盡時是否寫入失敗任務日誌（重新執行失敗任務時為 False）
+        """
         import time
         
+        cache_key = self._cache_key(title)
+        cached = self.cache.get(cache_key)
+        if cached:
+            logger.debug(f"使用快取的搜尋結果: {title}")
+            return cached['formatted']
+
         # 使用新的方法生成 prompt
         prompt = self._build_prompt(title)
 
         retry_intervals = [5, 10, 20, 40, 80]  # 秒，指數退避
         last_exception = None
-        for attempt, wait_time in enumerate(retry_intervals, 1):
-            try:
-                payload = {
-                    "model": "sonar",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.7,
-                    "max_tokens": 1024
-                }
-                response = requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30
-                )
-                if response.status_code == 200:
-                    response_data = response.json()
-                    formatted_content = self.format_response(response_data['choices'][0]['message']['content'])
-                    logger.debug(f"成功獲取並格式化「{title}」的相關資訊")
-                    return formatted_content
-                else:
-                    logger.error(f"[重試 {attempt}/5] Perplexity API 請求失敗: {response.status_code}")
-                    logger.error(f"[重試 {attempt}/5] 錯誤訊息: {response.text}")
-            except Exception as e:
-                logger.error(f"[重試 {attempt}/5] 搜索過程發生錯誤: {str(e)}")
-                last_exception = e
-            if attempt < len(retry_intervals):
-                logger.info(f"{wait_time} 秒後重試...")
-                time.sleep(wait_time)
-        # 全部重試失敗，寫入 failed_jobs.json
-        self._record_failed_job(title, last_exception)
+        with track_call('perplexity', MODEL, video=title) as metrics:
+            for attempt, wait_time in enumerate(retry_intervals, 1):
+                metrics.attempts = attempt
+                try:
+                    payload = {
+                        "model": MODEL,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": 0.7,
+                        "max_tokens": 1024
+                    }
+                    response = self._send(payload, metrics)
+                    if response.status_code == 200:
+                        response_data = response.json()
+                        usage = response_data.get('usage') or {}
+                        metrics.add_usage(usage.get('prompt_tokens'), usage.get('completion_tokens'))
+                        raw_content = response_data['choices'][0]['message']['content']
+                        formatted_content = self.format_response(raw_content)
+                        self.cache.set(cache_key, {"raw": raw_content, "formatted": formatted_content})
+                        logger.debug(f"成功獲取並格式化「{title}」的相關資訊")
+                        return formatted_content
+                    else:
+                        logger.error(f"[重試 {attempt}/5] Perplexity API 請求失敗: {response.status_code}")
+                        logger.error(f"[重試 {attempt}/5] 錯誤訊息: {response.text}")
+                except Exception as e:
+                    logger.error(f"[重試 {attempt}/5] 搜索過程發生錯誤: {str(e)}")
+                    last_exception = e
+                if attempt < len(retry_intervals):
+                    logger.info(f"{wait_time} 秒後重試...")
+                    time.sleep(wait_time)
+            metrics.outcome = OUTCOME_FAILED
+        # 全部重試失敗，寫入失敗任務日誌
+        if journal_failures:
+            self._record_failed_job(title, last_exception)
         return None
 
     def _record_failed_job(self, title, exception):
-        """將失敗的搜尋任務記錄到 failed_jobs.json"""
-        import datetime
-        failed_job = {
-            "title": title,
-            "error": str(exception) if exception else "Unknown error",
-            "timestamp": datetime.datetime.now().isoformat()
-        }
-        failed_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../logs/failed_jobs.json')
-        try:
-            if os.path.exists(failed_path):
-                with open(failed_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                data = []
-            data.append(failed_job)
-            with open(failed_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.error(f"已寫入失敗任務至 failed_jobs.json: {title}")
-        except Exception as e:
-            logger.error(f"寫入 failed_jobs.json 時發生錯誤: {str(e)}")
-
-    def generate_content(self, title: str, gemini_content: str = None) -> str:
-        """生成廣告影片描述內容
-        
-        Args:
-            title: 影片標題
-            gemini_content: Gemini 分析的內容（可選）
-            
-        Returns:
-            str: 生成的內容
-        """
-        try:
-            # 生成內容
-            content = self._generate_raw_content(title)
-            
-            # 驗證內容
-            is_valid, corrected_content, errors = self.validator.validate_content(
-                content, 
-                gemini_content
-            )
-            
-            if not is_valid:
-                error_message = "內容驗證發現問題：\n{}".format('\n'.join(errors))
-                self.logger.warning(error_message)
-                # TODO: 實作自動修正或人工審核流程
-                return content
-            
-            return corrected_content
-            
-        except Exception as e:
-            self.logger.error(f"生成內容時發生錯誤: {str(e)}")
-            raise
-
-    def _generate_raw_content(self, title: str) -> str:
-        """使用 Perplexity 生成原始內容"""
-        # ... existing generate_content code ...
+        """將失敗的搜尋任務記錄到失敗任務日誌（failed_jobs.py replay 可重新執行）"""
+        record_failure(JOB_PERPLEXITY, {"title": title}, exception)
 
 def main():
     """測試用主函數"""
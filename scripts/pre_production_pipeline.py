@@ -1,13 +1,19 @@
 import os
+import copy
 import yt_dlp
 from dotenv import load_dotenv
 from typing import Optional, Dict
 import time
 import glob
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logger import get_workflow_logger
 from google_sheets import setup_google_sheets, get_next_id, batch_update
 from wordpress_api import WordPressAPI
 from dependency_manager import check_and_update_ytdlp
+from video_probe import probe_video, VideoInfo
+from concurrency import ServiceLimiter, StageGraph, StageFailed
+from analysis_proxy import make_analysis_proxy
 
 logger = get_workflow_logger('1', 'content_automation')  
 
@@ -15,6 +21,19 @@ logger = get_workflow_logger('1', 'content_automation')
 ENABLE_OPENAI = False     
 ENABLE_WORDPRESS = True  
 ENABLE_GEMINI = True  # 啟用 Gemini File API 分析
+ENABLE_ANALYSIS_PROXY = True  # 以 360p / 1fps 的代理檔送交 Gemini 分析
+# =================================
+
+# ========== 並行處理設定 ==========
+ROW_WORKERS = 4  # 同時處理的資料列數，設為 1 即為逐筆處理
+# 各外部服務的同時呼叫上限
+# Gemini 由 gemini_scheduler 依 RPM/TPM 配額控管，不在此限制
+SERVICE_LIMITS = {
+    'download': 2,
+    'perplexity': 4,
+    'openai': 4,
+    'wordpress': 4
+}
 # =================================
 
 # 影片下載策略配置
@@ -37,39 +56,16 @@ format_strategies = [
 ]
 
 def get_video_metadata(youtube_url, max_retries=3):
-    """使用 yt_dlp 擷取影片標題和時長"""
-    for attempt in range(max_retries):
-        try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'skip_download': True,
-                'forcejson': True,
-                'noplaylist': True,
-                'no_cookies': True
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=False)
-                
-                title = info.get('title', '無標題')
-                duration = info.get('duration', 0)
-                
-                # 時長轉換為 MM:SS 格式
-                minutes, seconds = divmod(duration, 60)
-                formatted_duration = f"{int(minutes)}:{int(seconds):02}"
-                
-                return title, formatted_duration
-                
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.error(f"擷取資訊失敗 (嘗試 {attempt + 1}/{max_retries}): {str(e)}")
-                time.sleep(5)
-                continue
-            raise
+    """取得影片標題和時長（使用共用的探測結果）"""
+    info = probe_video(youtube_url, max_retries=max_retries)
+    return info.title, info.formatted_duration
+
+def download_video(youtube_url, video_id, download_dir, max_retries=3, video_info: Optional[VideoInfo] = None):
+    """下載 YouTube 影片的主要函數
 
-def download_video(youtube_url, video_id, download_dir, max_retries=3):
-    """下載 YouTube 影片的主要函數"""
+    若提供仍在有效期內的探測結果，第一次嘗試直接沿用其 formats，
+    不再重新擷取影片資訊；之後的重試仍會重新擷取以取得新的串流網址。
+    """
     logger.info(f"開始下載影片 ID {video_id}")
     
     # 清理可能存在的部分下載文件
@@ -106,7 +102,10 @@ def download_video(youtube_url, video_id, download_dir, max_retries=3):
             start_time = time.time()
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 try:
-                    info = ydl.extract_info(youtube_url)
+                    if attempt == 0 and video_info and video_info.formats_fresh():
+                        ydl.process_ie_result(copy.deepcopy(video_info.raw), download=True)
+                    else:
+                        ydl.extract_info(youtube_url)
                     end_time = time.time()
                     duration = end_time - start_time
                     logger.info(f"影片 ID {video_id} 下載完成，耗時 {duration:.1f} 秒")
@@ -140,10 +139,10 @@ def find_downloaded_file(download_dir, video_id):
             return os.path.join(download_dir, fname)
     return None
 
-def download_and_convert(youtube_url, video_id, download_dir):
+def download_and_convert(youtube_url, video_id, download_dir, video_info: Optional[VideoInfo] = None):
     """下載並確保輸出為 MP4 格式"""
     try:
-        success = download_video(youtube_url, video_id, download_dir)
+        success = download_video(youtube_url, video_id, download_dir, video_info=video_info)
         if not success:
             raise Exception("下載失敗")
         
@@ -161,172 +160,219 @@ def download_and_convert(youtube_url, video_id, download_dir):
 def extract_youtube_id(url: str) -> Optional[str]:
     """從 YouTube URL 提取影片 ID"""
     try:
-        # 使用 yt_dlp 提取影片 ID
-        ydl = yt_dlp.YoutubeDL({'quiet': True})
-        info = ydl.extract_info(url, download=False)
-        return info.get('id')
+        return probe_video(url).id
     except Exception as e:
         logger.error(f"提取 YouTube ID 失敗：{str(e)}")
         return None
 
-def process_one_row(row_index, youtube_url, assigned_id, sheet, updates, download_dir, wp):
-    """處理單筆資料"""
-    try:
-        # 1) 下載 & re-encode
-        output_file = download_and_convert(youtube_url, assigned_id, download_dir)
+def process_one_row(row_index, youtube_url, assigned_id, sheet, updates, download_dir, wp, limiter: Optional[ServiceLimiter] = None):
+    """處理單筆資料
+
+    每筆資料以 StageGraph 描述各步驟的相依關係，互不相依的步驟並行執行：
+
+        probe → {download, perplexity, thumbnail}
+        download → gemini
+        {perplexity, gemini} → tags → draft
+        thumbnail → draft（沒有建立草稿時刪除已上傳的縮圖）
 
-        # 2) 取得標題 / 時長
-        title, length = get_video_metadata(youtube_url)
+    limiter 用於限制各外部服務的同時呼叫數，並行處理多筆資料時由呼叫端共用同一個實例。
+    """
+    limiter = limiter or ServiceLimiter()
+
+    def probe():
+        # 探測影片資訊（下載、標題、時長、縮圖共用同一份結果）
+        with limiter.limit('download'):
+            video_info = probe_video(youtube_url)
         logger.info(f"取得影片 {assigned_id} 資訊成功")
-        logger.debug(f"標題: {title}")
-        logger.debug(f"時長: {length}")
+        logger.debug(f"標題: {video_info.title}")
+        logger.debug(f"時長: {video_info.formatted_duration}")
+        return video_info
+
+    def download(video_info):
+        # 下載 & re-encode
+        with limiter.limit('download'):
+            return download_and_convert(youtube_url, assigned_id, download_dir, video_info=video_info)
+
+    def perplexity(video_info):
+        # 使用 Perplexity API 生成內容
+        from perplexity_client import PerplexityClient
+        client = PerplexityClient()
+        with limiter.limit('perplexity'):
+            draft_content = client.search(video_info.title)
+
+        # 如果沒有成功獲取內容，使用預設內容
+        if not draft_content:
+            logger.warning(f"Perplexity API 未返回內容，使用預設內容")
+            draft_content = f"這是 {video_info.title} 的介紹影片。"
+        return draft_content
+
+    def thumbnail(video_info):
+        # 先上傳縮圖，建立草稿時直接設為特色圖片；失敗時草稿不設特色圖片（create_draft 不再重新上傳）
+        # 之後的步驟失敗而沒有建立草稿時，由 process_one_row 刪除這次上傳的縮圖
+        try:
+            with limiter.limit('wordpress'):
+                return wp.upload_thumbnail(video_info.id, video_info.thumbnail)
+        except Exception as e:
+            logger.error(f"上傳縮圖失敗: {str(e)}")
+            return None
+
+    def gemini(video_info, output_file):
+        # 使用 Gemini Video Analyzer 分析影片內容
+        # 返回 (格式化的影片描述, 原始（未格式化）的影片描述)
+        if not ENABLE_GEMINI:
+            return None, None
+
+        title = video_info.title
+        raw_video_description = None
+        try:
+            from gemini_video_analyzer import GeminiVideoAnalyzer
+            gemini = GeminiVideoAnalyzer()
+
+            # 上傳低位元率代理檔即可，Gemini 本身只以約每秒 1 格取樣
+            # 轉檔在送出請求前完成，不佔用 Gemini 的同時請求名額
+            analysis_file = output_file
+            if ENABLE_ANALYSIS_PROXY and output_file and os.path.exists(output_file):
+                proxy_report = make_analysis_proxy(output_file)
+                if proxy_report:
+                    analysis_file = proxy_report['path']
+                else:
+                    logger.warning("產生分析代理檔失敗，改用原始影片分析")
+
+            # 依各分析方式（本地檔案、YouTube 網址、下載後分析）的歷史成功率與耗時決定嘗試順序
+            # 每種分析方式只呼叫一次 Gemini，格式化版本由原始結果在本地產生
+            # 請求送出的時機由共用的配額排程器決定，多支影片可同時分析
+            raw_video_description = gemini.analyze_adaptive(
+                youtube_url, title,
+                video_file_path=analysis_file,
+                youtube_id=video_info.id,
+                use_wordpress_format=False,
+                duration=video_info.duration
+            )
+
+            if not gemini.is_failed_result(raw_video_description):
+                logger.info(f"Gemini API 成功分析影片 {assigned_id}")
+                # 格式化的影片描述用於標籤生成
+                video_analysis = gemini.format_response(raw_video_description)
+                return video_analysis, raw_video_description
+
+            logger.warning(f"Gemini API 未返回有效內容，僅使用 Perplexity 內容")
+        except Exception as gemini_error:
+            logger.error(f"Gemini API 錯誤: {gemini_error}")
+            logger.warning("繼續使用僅有的 Perplexity 內容")
+        return None, None
+
+    def tags(video_info, draft_content, gemini_result):
+        video_analysis, _ = gemini_result
+
+        # 準備用於標籤生成的合併內容（僅用於標籤生成，不用於文章內容）
+        combined_content = draft_content
+        if video_analysis:
+            # 僅用於標籤生成的合併內容
+            combined_content = f"{draft_content}\n\n{video_analysis}"
+            logger.debug("已準備用於標籤生成的合併內容")
+
+        # 使用 TagSuggester 生成標籤
+        from tag_suggestion import TagSuggester
+        tag_suggester = TagSuggester()
+        # 日誌已經在 TagSuggester 中記錄，這裡不需要重複記錄
+        with limiter.limit('openai'):
+            suggested_tags = tag_suggester.suggest_tags(title=video_info.title, content=combined_content)
 
-        # 3) 更新試算表 B/E 欄
+        # 初始化標籤列表，始終包含 featured 標籤
+        tag_ids = [136]  # "featured" 標籤的 ID
+
+        # 記錄標籤建議狀態
+        if suggested_tags:
+            # 將 Assistant 返回的標籤轉換為 WordPress 標籤 ID
+            logger.debug("開始轉換標籤為 WordPress 標籤 ID...")
+            with limiter.limit('wordpress'):
+                additional_tags = wp.convert_tags_to_ids(suggested_tags)
+
+            if additional_tags:
+                tag_ids.extend(additional_tags)
+                logger.debug(f"成功轉換 {len(additional_tags)} 個標籤")
+            else:
+                logger.warning("無法建立標籤，僅使用 featured 標籤")
+        else:
+            logger.warning("無法生成標籤建議，僅使用 featured 標籤")
+
+        # 移除重複的標籤 ID 並設置
+        return list(set(tag_ids))
+
+    def draft(video_info, draft_content, gemini_result, tag_ids, featured_media):
+        _, raw_video_description = gemini_result
+
+        # 準備 meta 資料，包含影片描述
+        meta_data = {
+            'video_url': youtube_url,
+            'length': video_info.formatted_duration
+        }
+
+        # 如果有原始影片描述，將其添加到 meta 資料中
+        if raw_video_description:
+            meta_data['video_description'] = raw_video_description
+            logger.info(f"將原始影片描述保存到 video_description 欄位")
+
+        # 注意：文章內容只使用 Perplexity 的結果，不包含 Gemini 的影片描述
+        with limiter.limit('wordpress'):
+            result = wp.create_draft(
+                title=video_info.title,
+                content=draft_content,  # 只使用 Perplexity 的結果作為文章內容
+                video_url=youtube_url,
+                video_length=video_info.formatted_duration,
+                video_tag=tag_ids,
+                video_id=video_info.id,
+                meta_data=meta_data,
+                thumbnail_url=video_info.thumbnail,
+                featured_media=featured_media,
+                upload_thumbnail=False
+            )
+        if not result:
+            raise Exception("建立草稿失敗")
+        return result
+
+    graph = StageGraph()
+    graph.add('probe', probe)
+    graph.add('download', download, deps=['probe'])
+    if ENABLE_WORDPRESS:
+        graph.add('perplexity', perplexity, deps=['probe'])
+        graph.add('thumbnail', thumbnail, deps=['probe'])
+        graph.add('gemini', gemini, deps=['probe', 'download'])
+        graph.add('tags', tags, deps=['probe', 'perplexity', 'gemini'])
+        graph.add('draft', draft, deps=['probe', 'perplexity', 'gemini', 'tags', 'thumbnail'])
+
+    try:
+        failure = None
+        try:
+            results = graph.run()
+        except StageFailed as e:
+            failure = e
+            results = e.results
+            # 沒有建立草稿時刪除已上傳的縮圖，避免每次重試都在媒體庫留下孤立的附件
+            if results.get('thumbnail') and 'draft' not in results:
+                logger.info(f"未建立草稿，刪除已上傳的縮圖 {results['thumbnail']}")
+                with limiter.limit('wordpress'):
+                    wp.delete_media(results['thumbnail'])
+
+        # 下載或探測失敗時整筆資料失敗，不寫入標題 / 時長
+        if failure and ('probe' not in results or 'download' not in results):
+            raise failure.error
+
+        # 更新試算表 B/E 欄
+        video_info = results['probe']
         updates.append({
             'range': f'B{row_index}',
-            'values': [[title]]
+            'values': [[video_info.title]]
         })
         updates.append({
             'range': f'E{row_index}',
-            'values': [[length]]
+            'values': [[video_info.formatted_duration]]
         })
 
-        # 4) 如果啟用 WordPress，建立草稿
+        # 如果啟用 WordPress，寫入草稿建立結果
         if ENABLE_WORDPRESS:
-            try:
-                # 使用 Perplexity API 生成內容
-                from perplexity_client import PerplexityClient
-                perplexity = PerplexityClient()
-                draft_content = perplexity.search(title)
-
-                # 如果沒有成功獲取內容，使用預設內容
-                if not draft_content:
-                    logger.warning(f"Perplexity API 未返回內容，使用預設內容")
-                    draft_content = f"這是 {title} 的介紹影片。"
-                
-                # 使用 Gemini Video Analyzer 分析影片內容
-                video_analysis = None
-                raw_video_description = None  # 用於保存原始（未格式化）的影片描述
-                if ENABLE_GEMINI:
-                    try:
-                        from gemini_video_analyzer import GeminiVideoAnalyzer
-                        gemini = GeminiVideoAnalyzer()
-                        
-                        # 第一優先：分析本地影片檔案（如果存在）
-                        if output_file and os.path.exists(output_file):
-                            logger.info(f"嘗試分析本地影片檔案: {output_file}")
-                            # 獲取原始（未格式化）的影片描述
-                            raw_video_description = gemini.analyze_video_file(output_file, title, use_wordpress_format=False)
-                            # 獲取格式化的影片描述用於文章內容
-                            video_analysis = gemini.analyze_video_file(output_file, title)
-                        
-                        # 如果本地影片不存在或分析失敗，嘗試直接分析 YouTube 影片
-                        if not video_analysis or "技術限制說明" in video_analysis:
-                            logger.info(f"本地影片分析失敗或不存在，嘗試直接分析 YouTube 影片: {youtube_url}")
-                            # 獲取原始（未格式化）的影片描述
-                            raw_video_description = gemini.analyze_youtube_video(youtube_url, title, use_wordpress_format=False)
-                            # 獲取格式化的影片描述用於文章內容
-                            video_analysis = gemini.analyze_youtube_video(youtube_url, title)
-                            
-                            # 如果直接分析也失敗，嘗試下載後分析
-                            if not video_analysis or "技術限制說明" in video_analysis:
-                                logger.info(f"直接分析 YouTube 影片失敗，嘗試下載後分析: {youtube_url}")
-                                # 獲取原始（未格式化）的影片描述
-                                raw_video_description = gemini.analyze_youtube_video_by_download(youtube_url, title, use_wordpress_format=False)
-                                # 獲取格式化的影片描述用於文章內容
-                                video_analysis = gemini.analyze_youtube_video_by_download(youtube_url, title)
-                        
-                        if video_analysis and "技術限制說明" not in video_analysis:
-                            logger.info(f"Gemini API 成功分析影片 {assigned_id}")
-                        else:
-                            logger.warning(f"Gemini API 未返回有效內容，僅使用 Perplexity 內容")
-                            video_analysis = None
-                            raw_video_description = None
-                    except Exception as gemini_error:
-                        logger.error(f"Gemini API 錯誤: {gemini_error}")
-                        logger.warning("繼續使用僅有的 Perplexity 內容")
-                        raw_video_description = None
-                
-                # 準備用於標籤生成的合併內容（僅用於標籤生成，不用於文章內容）
-                combined_content = draft_content
-                if video_analysis:
-                    # 僅用於標籤生成的合併內容
-                    combined_content = f"{draft_content}\n\n{video_analysis}"
-                    logger.debug("已準備用於標籤生成的合併內容")
-
-                # 使用 TagSuggester 生成標籤
-                from tag_suggestion import TagSuggester
-                tag_suggester = TagSuggester()
-                # 日誌已經在 TagSuggester 中記錄，這裡不需要重複記錄
-                tags = tag_suggester.suggest_tags(title=title, content=combined_content)
-                
-                # 初始化標籤列表，始終包含 featured 標籤
-                tag_ids = [136]  # "featured" 標籤的 ID
-                
-                # 記錄標籤建議狀態
-                if tags:
-                    # 將 Assistant 返回的標籤轉換為 WordPress 標籤 ID
-                    logger.debug("開始轉換標籤為 WordPress 標籤 ID...")
-                    additional_tags = wp.convert_tags_to_ids(tags)
-                    
-                    if additional_tags:
-                        tag_ids.extend(additional_tags)
-                        logger.debug(f"成功轉換 {len(additional_tags)} 個標籤")
-                    else:
-                        logger.warning("無法建立標籤，僅使用 featured 標籤")
-                else:
-                    logger.warning("無法生成標籤建議，僅使用 featured 標籤")
-                
-                # 移除重複的標籤 ID 並設置
-                tag_ids = list(set(tag_ids))
-                
-                # 提取 YouTube 影片 ID
-                youtube_id = extract_youtube_id(youtube_url)
-                
-                # 準備 meta 資料，包含影片描述
-                meta_data = {
-                    'video_url': youtube_url,
-                    'length': length
-                }
-                
-                # 如果有原始影片描述，將其添加到 meta 資料中
-                if raw_video_description:
-                    meta_data['video_description'] = raw_video_description
-                    logger.info(f"將原始影片描述保存到 video_description 欄位")
-                
-                # 注意：文章內容只使用 Perplexity 的結果，不包含 Gemini 的影片描述
-                result = wp.create_draft(
-                    title=title,
-                    content=draft_content,  # 只使用 Perplexity 的結果作為文章內容
-                    video_url=youtube_url,
-                    video_length=length,
-                    video_tag=tag_ids,
-                    video_id=youtube_id,
-                    meta_data=meta_data
-                )
-                
-                # 取得草稿連結並更新到 H 欄
-                # 轉換為標準 Gutenberg 編輯器 URL
-                post_id = result.get('id')
-                if post_id:
-                    draft_link = f"{wp.site_url}/wp-admin/post.php?post={post_id}&action=edit"
-                    
-                    # 將 WordPress 文章 ID 填入 I 欄位
-                    updates.append({
-                        'range': f'I{row_index}',
-                        'values': [[str(post_id)]]
-                    })
-                    logger.info(f"將文章 ID {post_id} 填入 I{row_index} 欄位")
-                else:
-                    draft_link = result.get('link', '建立草稿失敗')
-                    
-                updates.append({
-                    'range': f'H{row_index}',
-                    'values': [[draft_link]]
-                })
-                
-            except Exception as wp_error:
-                logger.error(f"WordPress 錯誤: {wp_error}")
+            if failure:
+                logger.error(f"WordPress 錯誤: {failure.error}")
                 updates.append({
                     'range': f'H{row_index}',
                     'values': [['WordPress 錯誤']]
@@ -335,9 +381,31 @@ def process_one_row(row_index, youtube_url, assigned_id, sheet, updates, downloa
                     'range': f'K{row_index}',
                     'values': [['error']]
                 })
-                raise wp_error
+                raise failure.error
+
+            result = results['draft']
 
-        # 5) 更新狀態為完成
+            # 取得草稿連結並更新到 H 欄
+            # 轉換為標準 Gutenberg 編輯器 URL
+            post_id = result.get('id')
+            if post_id:
+                draft_link = f"{wp.site_url}/wp-admin/post.php?post={post_id}&action=edit"
+
+                # 將 WordPress 文章 ID 填入 I 欄位
+                updates.append({
+                    'range': f'I{row_index}',
+                    'values': [[str(post_id)]]
+                })
+                logger.info(f"將文章 ID {post_id} 填入 I{row_index} 欄位")
+            else:
+                draft_link = result.get('link', '建立草稿失敗')
+
+            updates.append({
+                'range': f'H{row_index}',
+                'values': [[draft_link]]
+            })
+
+        # 更新狀態為完成
         updates.append({
             'range': f'K{row_index}',
             'values': [['done']]
@@ -353,8 +421,14 @@ def process_one_row(row_index, youtube_url, assigned_id, sheet, updates, downloa
         })
         raise e
 
-def check_pending_and_process(sheet):
-    """主要處理邏輯"""
+def check_pending_and_process(sheet, workers: int = ROW_WORKERS):
+    """主要處理邏輯
+
+    先逐筆分配 ID 並標記為 pending，再以 worker pool 並行處理各列；
+    各外部服務的同時呼叫數由 SERVICE_LIMITS 限制。
+    每列的試算表更新各自收集，最後依列號順序合併後一次寫回，
+    因此結果與逐筆處理時相同。
+    """
     download_dir = "/Users/Mac/Movies"  
     os.makedirs(download_dir, exist_ok=True)
 
@@ -366,6 +440,11 @@ def check_pending_and_process(sheet):
     
     # 初始化 WordPress API
     wp = WordPressAPI(logger) if ENABLE_WORDPRESS else None
+    limiter = ServiceLimiter(SERVICE_LIMITS)
+
+    # 每列各自的更新列表，key 為列號
+    row_updates = {}
+    jobs = []
 
     for i, row in enumerate(all_values, start=1):
         if i <= 2:  # 跳過前兩列
@@ -387,21 +466,44 @@ def check_pending_and_process(sheet):
             sheet.update(f'K{i}', [['pending']])  # 注意：狀態欄位從 J 欄變成 K 欄
 
             # 仍然加入更新列表，以便記錄
-            updates.append({'range': f'A{i}', 'values': [[assigned_id]]})
-            updates.append({'range': f'K{i}', 'values': [['pending']]})
+            row_updates[i] = [
+                {'range': f'A{i}', 'values': [[assigned_id]]},
+                {'range': f'K{i}', 'values': [['pending']]}
+            ]
+            jobs.append((i, youtube_url, assigned_id))
+
+    if jobs:
+        logger.info(f"共 {len(jobs)} 筆待處理，使用 {max(1, workers)} 個 worker")
 
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(
+                process_one_row, i, youtube_url, assigned_id, sheet,
+                row_updates[i], download_dir, wp, limiter
+            ): i
+            for i, youtube_url, assigned_id in jobs
+        }
+        for future in as_completed(futures):
             try:
-                process_one_row(i, youtube_url, assigned_id, sheet, updates, download_dir, wp)
+                future.result()
                 success_count += 1
-            except:
+            except Exception:
                 fail_count += 1
 
+    # 依列號順序合併更新，確保寫回順序固定
+    for i in sorted(row_updates):
+        updates.extend(row_updates[i])
+
     if updates:
         batch_update(sheet, updates)
     
     logger.info(f"處理完成，成功 {success_count} 筆，失敗 {fail_count} 筆")
 
 def main():
+    parser = argparse.ArgumentParser(description='前製作業：下載影片並建立 WordPress 草稿')
+    parser.add_argument('--workers', type=int, default=ROW_WORKERS, help='同時處理的資料列數，1 為逐筆處理')
+    args = parser.parse_args()
+
     # 確保在程式開始時就載入環境變數
     dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', '.env')
     load_dotenv(dotenv_path)
@@ -414,7 +516,7 @@ def main():
     logger.info(message)
     
     sheet = setup_google_sheets()
-    check_pending_and_process(sheet)
+    check_pending_and_process(sheet, workers=args.workers)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# prompt_compiler.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'prompt_compiler')
+
+# 提示詞目錄
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prompts')
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except Exception:
+    _encoding = None
+
+# 中日韓文字與全形標點，估計時每字算一個 token
+CJK_PATTERN = re.compile(r'[　-ヿ㐀-鿿가-힯＀-￯]')
+
+
+def count_tokens(text: str) -> int:
+    """計算文字的 token 數
+
+    安裝 tiktoken 時使用 o200k_base 編碼精確計算，
+    否則以中日韓文字每字一個、其餘每 4 個字元一個估計。
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """由 JSON 提示詞設定編譯出的模板
+
+    Attributes:
+        name: 提示詞名稱，例如 'gemini/video_analysis'
+        template: 完整的提示詞文字，參數以 {參數名稱} 保留
+        parameters: 模板中的參數名稱
+        version: 模板內容的雜湊，模板文字改變時才會改變，可作為快取鍵
+        token_count: 模板本身（不含參數值）的 token 數
+        mtime: 編譯時的設定檔修改時間
+        intro_length: 模板開頭開場白的長度，參數只在這段文字中替換
+    """
+    name: str
+    template: str
+    parameters: Tuple[str, ...]
+    version: str
+    token_count: int
+    mtime: float
+    intro_length: int = 0
+
+    def render(self, **params: str) -> str:
+        """代入參數產生最終的提示詞
+
+        與原本只對開場白執行 .format 相同，只替換開場白中的已知參數，
+        規則與範例中的 {title} 等文字保持原樣；每個參數只替換一次，參數值中的大括號不會被再次解析。
+        """
+        missing = [name for name in self.parameters if name not in params]
+        if missing:
+            raise KeyError(f"提示詞 {self.name} 缺少參數: {', '.join(missing)}")
+        if not self.parameters:
+            return self.template
+        pattern = re.compile(r'\{(' + '|'.join(map(re.escape, self.parameters)) + r')\}')
+        intro = pattern.sub(lambda m: str(params[m.group(1)]), self.template[:self.intro_length])
+        return intro + self.template[self.intro_length:]
+
+
+def _render_gemini_video_analysis(config: Dict) -> str:
+    rules = config["rules"]
+    prompt = config["intro"]["content"]
+
+    # 添加分析要素
+    prompt += "\n\n分析要素：\n"
+    for item in rules["analysis_elements"]["items"]:
+        prompt += f"- {item}\n"
+
+    # 添加寫作風格要求
+    prompt += "\n寫作風格要求：\n"
+    for item in rules["writing_style"]["items"]:
+        prompt += f"- {item}\n"
+
+    # 添加譯名標注規則
+    prompt += "\n譯名標注規則：\n"
+    name_format = rules["name_format"]
+    prompt += "1. " + name_format["japanese_name"]["title"] + "\n"
+    for item in name_format["japanese_name"]["items"]:
+        prompt += f"   - {item['rule']}：「{item['example']}」\n"
+
+    prompt += "\n2. " + name_format["foreign_name"]["title"] + "\n"
+    for rule in name_format["foreign_name"]["rules"]:
+        prompt += f"   - {rule['type']}：{rule['rule']}\n"
+        prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
+
+    prompt += "\n3. " + name_format["brand_name"]["title"] + "\n"
+    for rule in name_format["brand_name"]["rules"]:
+        prompt += f"   - {rule['type']}：{rule['rule']}\n"
+        prompt += "     例如：" + "、".join(f"「{ex}」" for ex in rule["examples"]) + "\n"
+
+    # 添加作品名稱規則
+    prompt += "\n4. " + rules["work_format"]["title"] + "\n"
+    for rule in rules["work_format"]["rules"]:
+        prompt += f"   - {rule['type']}：{rule['rule']}\n"
+        prompt += "     例如：" + "、".join(f"{ex}" for ex in rule["examples"]) + "\n"
+
+    # 添加內容結構規則
+    prompt += "\n內容結構規則：\n"
+    for item in rules["content_structure"]["items"]:
+        prompt += f"- {item}\n"
+
+    return prompt
+
+
+def _render_perplexity_content_generation(config: Dict) -> str:
+    prompt = []
+
+    # 1. 添加開場白
+    prompt.append(config['intro']['content'])
+    prompt.append("")
+
+    rules = config['rules']
+
+    # 2. 添加規則
+    # 連結和來源規則
+    source = rules['source']
+    prompt.append(f"{source['title']}：")
+    for item in source['items']:
+        prompt.append(f"- {item}")
+    prompt.append(f"例如：{source['example']}")
+    prompt.append("")
+
+    # 寫作風格規則
+    style = rules['writing_style']
+    prompt.append(f"{style['title']}：")
+    for i, item in enumerate(style['items'], 1):
+        prompt.append(f"{i}. {item}")
+    prompt.append("")
+
+    # 譯名標注規則
+    name_format = rules['name_format']
+    prompt.append(f"{name_format['title']}（重要！）：")
+
+    # 日文人名
+    jp = name_format['japanese_name']
+    prompt.append(f"A. {jp['title']}：")
+    for item in jp['items']:
+        prompt.append("   - {}：「{}」".format(item['rule'], item['example']))
+    prompt.append("")
+
+    # 外國人名、品牌名稱
+    for label, section in (('B', name_format['foreign_name']), ('C', name_format['brand_name'])):
+        prompt.append(f"{label}. {section['title']}：")
+        for rule_set in section['rules']:
+            prompt.append(f"   - {rule_set['type']}：{rule_set['rule']}")
+            prompt.append("     例如：" + "、".join("「{}」".format(ex) for ex in rule_set['examples']))
+            prompt.append("")
+
+    # 影視作品規則
+    work = rules['work_format']
+    prompt.append(f"D. {work['title']}：")
+    for rule in work['rules']:
+        prompt.append(f"   - {rule['type']}：{rule['rule']}")
+        prompt.append("     例如：" + "、".join("「{}」".format(ex) for ex in rule['examples']))
+        prompt.append("")
+
+    # 內容結構規則
+    structure = rules['content_structure']
+    prompt.append(f"{structure['title']}：")
+    for item in structure['items']:
+        prompt.append(f"- {item}")
+    prompt.append("")
+
+    # 嚴格檢查
+    final = rules['final_check']
+    prompt.append(f"{final['title']}：")
+    prompt.append(final['content'])
+
+    # 3. 添加範例
+    if config.get('examples'):
+        prompt.append("")
+        prompt.append("實際範例參考：")
+        for example in config['examples']:
+            prompt.append("輸入標題：" + example['input'])
+            prompt.append("輸出內容：\n" + example['output'])
+
+    return "\n".join(prompt)
+
+
+def _render_openai_system_prompt(config: Dict) -> str:
+    """產生與 prompts/openai/formatted_prompt.txt 相同格式的系統提示詞"""
+    rules = config['rules']
+    lines: List[str] = [config['intro']['content'], ""]
+
+    def numbered(items: List, indent: str = "") -> None:
+        for i, item in enumerate(items, 1):
+            if isinstance(item, dict):
+                lines.append(f"{indent}{i}. {item['title']}")
+                for sub in item['items']:
+                    lines.append(f"{indent}   - {sub}")
+            else:
+                lines.append(f"{indent}{i}. {item}")
+
+    # 處理階段規則
+    stages = rules['process_stages']
+    for stage in (stages['first_stage'], stages['second_stage']):
+        lines.append(f"{stage['title']}：")
+        numbered(stage['items'])
+        lines.append("")
+
+    # 特殊處理規則
+    lines.append("特殊處理規則：")
+    name_format = rules['name_format']
+    lines.append(f"1. {name_format['title']}：")
+    sections = [name_format[key] for key in ('japanese_name', 'english_name', 'media_works', 'brand_name')]
+    for label, section in zip("ABCD", sections):
+        lines.append(f"   {label}. {section['title']}：")
+        for item in section['items']:
+            examples = item['examples'] if 'examples' in item else [item['example']]
+            lines.append(f"      - {item['rule']}：" + "".join(f"「{ex}」" for ex in examples))
+    lines.append("")
+
+    hierarchy = rules['hierarchy_rules']
+    lines.append(f"2. {hierarchy['title']}：")
+    for item in hierarchy['items']:
+        lines.append(f"   - {item['type']}：{item['rule']}")
+    lines.append("")
+
+    matching = rules['tag_matching']
+    lines.append(f"3. {matching['title']}：")
+    for item in matching['items']:
+        if isinstance(item, dict):
+            for sub in item['items']:
+                lines.append(f"   - {item['title']}：{sub}")
+        else:
+            lines.append(f"   - {item}")
+    lines.append("")
+
+    output = rules['output_rules']
+    lines.append(f"{output['title']}：")
+    numbered(output['items'])
+
+    return "\n".join(lines)
+
+
+# 提示詞名稱（prompts/ 下的相對路徑，不含副檔名）對應的編譯函式
+RENDERERS: Dict[str, Callable[[Dict], str]] = {
+    'gemini/video_analysis': _render_gemini_video_analysis,
+    'perplexity/content_generation': _render_perplexity_content_generation,
+    'openai/system_prompt': _render_openai_system_prompt,
+}
+
+_compiled: Dict[str, CompiledPrompt] = {}
+_compiled_lock = threading.Lock()
+
+
+def prompt_path(name: str) -> str:
+    return os.path.join(PROMPTS_DIR, f"{name}.json")
+
+
+def _compile(name: str, path: str, mtime: float) -> CompiledPrompt:
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    template = RENDERERS[name](config)
+    # 各編譯函式都以開場白開頭，參數只出現在開場白中
+    intro = config.get('intro', {}).get('content', '')
+    if not template.startswith(intro):
+        raise ValueError(f"提示詞 {name} 的模板沒有以開場白開頭")
+    parameters = tuple(p for p in config.get('parameters', {}) if f"{{{p}}}" in intro)
+    # 開場白中以 {參數} 標示、但未列在 parameters 的參數（例如 perplexity 的 title）
+    intro_params = re.findall(r'\{(\w+)\}', intro)
+    parameters += tuple(p for p in intro_params if p not in parameters)
+    compiled = CompiledPrompt(
+        name=name,
+        template=template,
+        parameters=parameters,
+        version=hashlib.sha256(template.encode('utf-8')).hexdigest()[:16],
+        token_count=count_tokens(template),
+        mtime=mtime,
+        intro_length=len(intro),
+    )
+    logger.debug(f"編譯提示詞 {name}: 版本 {compiled.version}，{compiled.token_count} tokens")
+    return compiled
+
+
+def get_prompt(name: str) -> CompiledPrompt:
+    """取得編譯後的提示詞，設定檔修改時間改變時重新編譯
+
+    Args:
+        name: 提示詞名稱，例如 'gemini/video_analysis'
+
+    Returns:
+        CompiledPrompt: 編譯後的提示詞
+    """
+    if name not in RENDERERS:
+        raise KeyError(f"未知的提示詞: {name}")
+    path = prompt_path(name)
+    mtime = os.path.getmtime(path)
+    with _compiled_lock:
+        compiled = _compiled.get(name)
+        if compiled is None or compiled.mtime != mtime:
+            compiled = _compile(name, path, mtime)
+            _compiled[name] = compiled
+        return compiled
+
+
+def main():
+    """列出所有提示詞的版本與大小，用於檢視提示詞長度"""
+    print(f"{'提示詞':<32}{'版本':<18}{'tokens':>8}{'字元':>8}")
+    for name in RENDERERS:
+        compiled = get_prompt(name)
+        print(f"{name:<32}{compiled.version:<18}{compiled.token_count:>8}{len(compiled.template):>8}")
+    if _encoding is None:
+        print("（未安裝 tiktoken，token 數為估計值）")
+
+
+if __name__ == "__main__":
+    main()
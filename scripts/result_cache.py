@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# result_cache.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+from typing import Any, Optional
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'result_cache')
+
+# 快取資料庫存放目錄
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+
+
+class ResultCache:
+    """以 SQLite 保存的持久化結果快取
+
+    每個 name 對應 cache/<name>.sqlite3 一個檔案，值以 JSON 保存。
+    每次操作都開新的連線，可在多執行緒與多個程序間共用。
+
+    Args:
+        name: 快取名稱
+        ttl: 有效秒數，None 表示不過期
+        max_entries: 最多保存筆數，超過時淘汰最久未使用的項目
+        max_bytes: 值的總大小上限（位元組），超過時淘汰最久未使用的項目
+        bypass: 為 True 時不讀取快取（仍會寫入新結果），用於強制重新計算
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 bypass: bool = False, max_bytes: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """由多個組成部分產生固定長度的快取鍵"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """讀取快取，不存在、已過期或 bypass 時返回 None"""
+        if self.bypass:
+            return None
+        try:
+            now = time.time()
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created_at = row
+                if self.ttl is not None and now - created_at > self.ttl:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(value)
+        except Exception as e:
+            logger.warning(f"讀取快取 {self.name} 失敗: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """寫入快取並依設定淘汰舊項目"""
+        try:
+            now = time.time()
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._evict(conn, now)
+        except Exception as e:
+            logger.warning(f"寫入快取 {self.name} 失敗: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        """刪除單一項目"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """清空整個快取"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM entries")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl is not None:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries is not None:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            # 由最近使用的項目往回累加大小，超過上限之後的項目全部淘汰
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key, SUM(LENGTH(CAST(value AS BLOB)))"
+                "   OVER (ORDER BY accessed_at DESC, rowid DESC) AS running"
+                "  FROM entries)"
+                " WHERE running > ?)",
+                (self.max_bytes,)
+            )
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# retry_policy.py
+
+import re
+import time
+import random
+from typing import Any, Callable, Optional, Union
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'retry_policy')
+
+# 錯誤分類
+ERROR_QUOTA = 'quota'          # 429 / RESOURCE_EXHAUSTED，等待配額恢復後重試
+ERROR_TRANSIENT = 'transient'  # 5xx、逾時、連線中斷，短暫等待後重試
+ERROR_PERMANENT = 'permanent'  # 參數錯誤、私人或不存在的影片，重試也不會成功
+
+PERMANENT_STATUS_CODES = {400, 401, 403, 404, 409, 413, 422}
+TRANSIENT_STATUS_CODES = {408, 500, 502, 503, 504}
+
+PERMANENT_STATUSES = {'INVALID_ARGUMENT', 'FAILED_PRECONDITION', 'PERMISSION_DENIED', 'NOT_FOUND', 'UNAUTHENTICATED'}
+QUOTA_STATUSES = {'RESOURCE_EXHAUSTED'}
+TRANSIENT_STATUSES = {'UNAVAILABLE', 'INTERNAL', 'DEADLINE_EXCEEDED', 'ABORTED'}
+
+# 只與單一影片有關的錯誤（私人、已移除、地區或年齡限制），換策略或稍後重試都不會成功
+VIDEO_UNAVAILABLE_PATTERN = re.compile(
+    r'private video|video unavailable|video is private|has been removed|'
+    r'not available in your country|sign in to confirm your age',
+    re.IGNORECASE
+)
+PERMANENT_MESSAGE_PATTERN = re.compile(
+    VIDEO_UNAVAILABLE_PATTERN.pattern + r'|unsupported (?:mime|file)|invalid argument|api key not valid',
+    re.IGNORECASE
+)
+QUOTA_MESSAGE_PATTERN = re.compile(r'quota|rate limit|too many requests|resource.?exhausted', re.IGNORECASE)
+
+# 伺服器提供的重試等待時間，例如 RetryInfo 的 retryDelay: '37s' 或訊息中的 "retry in 12.5s"
+RETRY_DELAY_PATTERN = re.compile(r"""retry[_ ]?delay['"]?\s*[:=]\s*['"]?(\d+(?:\.\d+)?)s""", re.IGNORECASE)
+RETRY_IN_PATTERN = re.compile(r'retry (?:in|after) (\d+(?:\.\d+)?)\s*s', re.IGNORECASE)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """取得例外對應的 HTTP 狀態碼（google.genai APIError 的 code 或 requests 的 response）"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, 'response', None)
+    code = getattr(response, 'status_code', None)
+    if isinstance(code, int):
+        return code
+    return None
+
+
+def classify_error(error: BaseException) -> str:
+    """將例外分類為 quota、transient 或 permanent
+
+    無法判斷的錯誤視為 transient，交由重試次數與總等待時間限制。
+
+    Args:
+        error: 呼叫時拋出的例外
+
+    Returns:
+        str: ERROR_QUOTA、ERROR_TRANSIENT 或 ERROR_PERMANENT
+    """
+    code = _status_code(error)
+    status = str(getattr(error, 'status', '') or '').upper()
+    message = str(error)
+
+    if code == 429 or status in QUOTA_STATUSES:
+        return ERROR_QUOTA
+    if code in TRANSIENT_STATUS_CODES or status in TRANSIENT_STATUSES:
+        return ERROR_TRANSIENT
+    if code in PERMANENT_STATUS_CODES or status in PERMANENT_STATUSES:
+        return ERROR_PERMANENT
+    if isinstance(error, FileNotFoundError):
+        return ERROR_PERMANENT
+    if isinstance(error, (TimeoutError, ConnectionError)) or 'timeout' in type(error).__name__.lower():
+        return ERROR_TRANSIENT
+    if PERMANENT_MESSAGE_PATTERN.search(message):
+        return ERROR_PERMANENT
+    if QUOTA_MESSAGE_PATTERN.search(message):
+        return ERROR_QUOTA
+    return ERROR_TRANSIENT
+
+
+def is_video_unavailable(error: Union[BaseException, str]) -> bool:
+    """錯誤（或失敗訊息）是否表示影片本身無法存取，而非服務或策略的問題"""
+    return bool(VIDEO_UNAVAILABLE_PATTERN.search(str(error)))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """取得伺服器建議的重試等待秒數，沒有提示時返回 None
+
+    依序檢查 Retry-After 標頭、RetryInfo 的 retryDelay 與錯誤訊息。
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        if value:
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                pass
+
+    text = f"{getattr(error, 'details', '')} {error}"
+    for pattern in (RETRY_DELAY_PATTERN, RETRY_IN_PATTERN):
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class RetryExhausted(Exception):
+    """重試結束仍未成功
+
+    Attributes:
+        error: 最後一次的原始例外
+        error_class: 最後一次錯誤的分類
+        attempts: 實際嘗試次數
+        waited: 累計等待秒數
+    """
+
+    def __init__(self, error: BaseException, error_class: str, attempts: int, waited: float):
+        super().__init__(f"{error_class} 錯誤，嘗試 {attempts} 次、等待 {waited:.0f} 秒後放棄: {error}")
+        self.error = error
+        self.error_class = error_class
+        self.attempts = attempts
+        self.waited = waited
+
+
+class RetryPolicy:
+    """依錯誤分類決定是否重試與等待時間
+
+    - permanent：立即停止
+    - quota：優先採用伺服器提示的等待時間，否則以較長的基準做指數退避
+    - transient：以較短的基準做指數退避
+    退避時間加入隨機抖動（full jitter），避免多個工作同時重試；
+    累計等待超過 max_total_wait 時不再重試，讓無望的影片盡快交給下一個備援方案。
+
+    Args:
+        max_attempts: 最多嘗試次數（含第一次）
+        base_delay: transient 錯誤的退避基準秒數
+        quota_delay: quota 錯誤的退避基準秒數
+        max_delay: 單次退避等待上限（伺服器提示的等待時間不受此限）
+        max_total_wait: 累計等待上限
+    """
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 2, quota_delay: float = 15,
+                 max_delay: float = 90, max_total_wait: float = 180):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.quota_delay = quota_delay
+        self.max_delay = max_delay
+        self.max_total_wait = max_total_wait
+
+    def next_delay(self, attempt: int, error_class: str, hint: Optional[float] = None) -> float:
+        """第 attempt 次（從 1 起算）失敗後的等待秒數"""
+        if hint is not None:
+            # 伺服器提示的時間是下限，只往上加少量抖動，不受 max_delay 限制；
+            # 超過剩餘的累計等待額度時由 call 放棄，不提早重試
+            return hint + random.uniform(0, 1)
+        base = self.quota_delay if error_class == ERROR_QUOTA else self.base_delay
+        ceiling = min(self.max_delay, base * (2 ** (attempt - 1)))
+        # 至少等待一半，避免抖動後幾乎不等待
+        return random.uniform(ceiling / 2, ceiling)
+
+    def call(self, func: Callable[[], Any], description: str = '') -> Any:
+        """執行 func，失敗時依錯誤分類重試
+
+        Args:
+            func: 不帶參數的呼叫
+            description: 記錄用的說明
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            RetryExhausted: permanent 錯誤、達到嘗試次數或累計等待上限
+        """
+        waited = 0.0
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func()
+            except Exception as e:
+                error_class = classify_error(e)
+                logger.error(f"{description} 失敗 ({error_class}, 嘗試 {attempt}/{self.max_attempts}): {str(e)}")
+
+                if error_class == ERROR_PERMANENT or attempt >= self.max_attempts:
+                    raise RetryExhausted(e, error_class, attempt, waited) from e
+
+                delay = self.next_delay(attempt, error_class, retry_after(e))
+                if waited + delay > self.max_total_wait:
+                    logger.warning(f"{description} 累計等待將超過 {self.max_total_wait:.0f} 秒，停止重試")
+                    raise RetryExhausted(e, error_class, attempt, waited) from e
+
+                logger.info(f"等待 {delay:.1f} 秒後重試...")
+                time.sleep(delay)
+                waited += delay
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# strategy_selector.py
+
+import os
+import time
+import sqlite3
+from contextlib import closing
+from typing import Dict, List, Optional, Sequence
+
+from logger import get_workflow_logger
+import result_cache
+
+logger = get_workflow_logger('1', 'strategy_selector')
+
+# 每個策略保留最近的結果筆數，成功率與平均耗時只看這段期間，能反映近期的服務狀況
+STATS_WINDOW = 20
+# 最近連續失敗達此次數時視為系統性失敗
+FAILURE_STREAK = 4
+# 系統性失敗的策略暫停使用的秒數，期滿後重新試探
+COOLDOWN = 30 * 60
+# 沒有任何紀錄時假設的耗時秒數
+DEFAULT_LATENCY = 60.0
+
+
+class StrategySelector:
+    """依歷史成功率與耗時排序可互相替代的執行策略
+
+    每個策略保存最近 STATS_WINDOW 筆 (是否成功, 耗時, 時間, 是否為單一影片的失敗)，
+    存放於 cache/<name>.sqlite3。每次記錄是一次 INSERT，多個實例、執行緒與程序
+    同時記錄也不會互相覆蓋。排序依「預期成功所需時間」：
+    平均耗時 ÷ 成功率（以 Laplace 平滑避免樣本過少時的極端值）。
+    最近連續失敗 FAILURE_STREAK 次且仍在 COOLDOWN 內的策略會被略過，
+    但不會略過全部策略；單一影片的失敗（私人、已移除等）不計入連續失敗。
+
+    Args:
+        name: 統計資料的名稱
+        default_latency: 各策略沒有紀錄時假設的耗時，未列出者使用 DEFAULT_LATENCY
+    """
+
+    def __init__(self, name: str, default_latency: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.default_latency = dict(default_latency or {})
+        self.path = os.path.join(result_cache.CACHE_DIR, f"{name}.sqlite3")
+        os.makedirs(result_cache.CACHE_DIR, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outcomes ("
+                " strategy TEXT NOT NULL,"
+                " success INTEGER NOT NULL,"
+                " latency REAL NOT NULL,"
+                " recorded_at REAL NOT NULL,"
+                " video_specific INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outcomes_strategy ON outcomes (strategy, recorded_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _history(self, strategy: str) -> List[tuple]:
+        """最近 STATS_WINDOW 筆 (success, latency, recorded_at, video_specific)，由舊到新"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT success, latency, recorded_at, video_specific FROM outcomes"
+                " WHERE strategy = ? ORDER BY recorded_at DESC, rowid DESC LIMIT ?",
+                (strategy, STATS_WINDOW)
+            ).fetchall()
+        return rows[::-1]
+
+    def record(self, strategy: str, success: bool, latency: float, video_specific: bool = False) -> None:
+        """記錄一次策略執行結果
+
+        Args:
+            strategy: 策略名稱
+            success: 是否成功
+            latency: 耗時秒數
+            video_specific: 失敗原因只與這支影片有關（私人、已移除等），不計入連續失敗
+        """
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO outcomes (strategy, success, latency, recorded_at, video_specific)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (strategy, int(success), round(latency, 2), time.time(), int(video_specific and not success))
+                )
+                # 只保留統計期間內的紀錄
+                conn.execute(
+                    "DELETE FROM outcomes WHERE strategy = ? AND rowid NOT IN ("
+                    " SELECT rowid FROM outcomes WHERE strategy = ?"
+                    " ORDER BY recorded_at DESC, rowid DESC LIMIT ?)",
+                    (strategy, strategy, STATS_WINDOW)
+                )
+        except Exception as e:
+            logger.warning(f"記錄策略 {strategy} 的結果失敗: {str(e)}")
+
+    def stats(self, strategy: str) -> Dict:
+        """策略的統計摘要：次數、成功率、平均耗時、預期成功所需時間、是否暫停"""
+        history = self._history(strategy)
+        attempts = len(history)
+        successes = sum(entry[0] for entry in history)
+        if attempts:
+            mean_latency = sum(entry[1] for entry in history) / attempts
+        else:
+            mean_latency = self.default_latency.get(strategy, DEFAULT_LATENCY)
+        success_rate = (successes + 1) / (attempts + 2)
+
+        # 單一影片的失敗不代表策略本身有問題
+        recent = [entry for entry in history if not entry[3]][-FAILURE_STREAK:]
+        suspended = (
+            len(recent) == FAILURE_STREAK
+            and not any(entry[0] for entry in recent)
+            and time.time() - recent[-1][2] < COOLDOWN
+        )
+        return {
+            'attempts': attempts,
+            'success_rate': round(success_rate, 3),
+            'mean_latency': round(mean_latency, 2),
+            'expected_time': round(mean_latency / success_rate, 2),
+            'suspended': suspended
+        }
+
+    def order(self, strategies: Sequence[str]) -> List[str]:
+        """依預期成功所需時間排序策略，略過暫停中的策略
+
+        預期時間相同時維持傳入的順序。
+
+        Args:
+            strategies: 可用的策略名稱
+
+        Returns:
+            List[str]: 建議的嘗試順序
+        """
+        stats = {strategy: self.stats(strategy) for strategy in strategies}
+        ordered = sorted(strategies, key=lambda s: stats[s]['expected_time'])
+        active = [s for s in ordered if not stats[s]['suspended']]
+        for strategy in ordered:
+            if stats[strategy]['suspended']:
+                logger.info(f"策略 {strategy} 最近連續失敗，暫時略過")
+        # 全部暫停時仍保留預期時間最短的策略
+        return active or ordered[:1]
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# tag_matcher.py
+
+import os
+import re
+import sys
+import glob
+import html
+import json
+import argparse
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from logger import get_workflow_logger
+
+logger = get_workflow_logger('1', 'tag_matcher')
+
+# 標籤與分類詞彙檔目錄（wordpress_taxonomy_manager.py 維護的 JSON 檔）
+TAXONOMY_DIR = os.getenv(
+    "TAG_TAXONOMY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'taxonomy')
+)
+
+KIND_TAGS = 'tags'
+KIND_CATEGORIES = 'categories'
+
+# 比對時去除的括號與書名號
+BRACKET_CONTENT = re.compile(r'（[^）]*）|\([^)]*\)')
+BRACKET_INNER = re.compile(r'（([^）]*)）|\(([^)]*)\)')
+TITLE_MARKS = re.compile(r'[《》〈〉「」『』]')
+# 拉丁字母與數字組成的詞，比對時需要完整單字
+WORD_CHAR = re.compile(r'[0-9a-z]')
+# 單一字母的拉丁別名容易誤判，不加入比對
+MIN_ASCII_LENGTH = 2
+
+
+@dataclass(frozen=True)
+class Term:
+    """WordPress 分類法中的一個詞彙"""
+    id: Optional[int]
+    name: str
+    kind: str
+
+
+def _normalize(text: str) -> str:
+    return text.lower()
+
+
+def surface_forms(name: str) -> List[str]:
+    """產生詞彙在文章中可能出現的形式
+
+    完整名稱之外，加入去除括號標注的基本名稱，以及括號內以 / 分隔的原文、英文名稱，
+    例如「名偵探柯南（名探偵コナン / Detective Conan）」會產生
+    「名偵探柯南」、「名探偵コナン」、「Detective Conan」。
+    """
+    forms = [name, TITLE_MARKS.sub('', name)]
+    base = TITLE_MARKS.sub('', BRACKET_CONTENT.sub('', name)).strip()
+    forms.append(base)
+    for match in BRACKET_INNER.finditer(name):
+        inner = match.group(1) or match.group(2) or ''
+        forms.extend(part.strip() for part in inner.split('/'))
+
+    result = []
+    for form in forms:
+        form = _normalize(form.strip())
+        if not form or form in result:
+            continue
+        if form.isascii() and len(form) < MIN_ASCII_LENGTH:
+            continue
+        result.append(form)
+    return result
+
+
+class AhoCorasick:
+    """多模式字串比對自動機，一次掃描文字找出所有出現的模式"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._patterns: List[str] = []
+        self._built = True
+
+    def add(self, pattern: str) -> int:
+        """加入模式並返回模式編號"""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._patterns.append(pattern)
+        self._output[node].append(len(self._patterns) - 1)
+        self._built = False
+        return len(self._patterns) - 1
+
+    def build(self) -> None:
+        """以廣度優先計算失敗連結"""
+        queue = deque()
+        for next_node in self._goto[0].values():
+            self._fail[next_node] = 0
+            queue.append(next_node)
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+        self._built = True
+
+    def search(self, text: str) -> Iterable[Tuple[int, int]]:
+        """找出文字中所有模式
+
+        Yields:
+            (結束位置（不含）, 模式編號)
+        """
+        if not self._built:
+            self.build()
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern_id in self._output[node]:
+                yield i + 1, pattern_id
+
+    def pattern(self, pattern_id: int) -> str:
+        return self._patterns[pattern_id]
+
+
+class TagMatcher:
+    """以現有標籤與分類建立的詞彙比對器，在呼叫 LLM 前找出文章中出現的候選詞彙"""
+
+    def __init__(self, terms: Iterable[Term]):
+        self.terms: List[Term] = []
+        self._automaton = AhoCorasick()
+        self._pattern_terms: List[List[int]] = []
+        pattern_ids: Dict[str, int] = {}
+
+        seen = set()
+        for term in terms:
+            if (term.kind, term.name) in seen:
+                continue
+            seen.add((term.kind, term.name))
+            term_index = len(self.terms)
+            self.terms.append(term)
+            for form in surface_forms(term.name):
+                pattern_id = pattern_ids.get(form)
+                if pattern_id is None:
+                    pattern_id = self._automaton.add(form)
+                    pattern_ids[form] = pattern_id
+                    self._pattern_terms.append([])
+                self._pattern_terms[pattern_id].append(term_index)
+        self._automaton.build()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def match(self, *texts: str) -> List[Term]:
+        """找出文字中出現的詞彙，依第一次出現的位置排序
+
+        拉丁字母開頭或結尾的模式必須落在單字邊界上，避免 "art" 比對到 "start"。
+        """
+        first_seen: Dict[int, Tuple[int, int]] = {}
+        for text_index, text in enumerate(texts):
+            if not text:
+                continue
+            normalized = _normalize(text)
+            for end, pattern_id in self._automaton.search(normalized):
+                pattern = self._automaton.pattern(pattern_id)
+                start = end - len(pattern)
+                if WORD_CHAR.match(pattern[0]) and start > 0 and WORD_CHAR.match(normalized[start - 1]):
+                    continue
+                if WORD_CHAR.match(pattern[-1]) and end < len(normalized) and WORD_CHAR.match(normalized[end]):
+                    continue
+                for term_index in self._pattern_terms[pattern_id]:
+                    position = (text_index, start)
+                    if term_index not in first_seen or position < first_seen[term_index]:
+                        first_seen[term_index] = position
+        ordered = sorted(first_seen, key=lambda index: first_seen[index])
+        return [self.terms[index] for index in ordered]
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str]) -> 'TagMatcher':
+        """從 WordPress 詞彙 JSON 檔建立比對器
+
+        檔案格式與 wordpress_taxonomy_manager.py 的 list --output-json 及
+        add_and_update 相同：詞彙物件的列表，至少包含 name，可包含 id 與 taxonomy。
+        未標示 taxonomy 的詞彙依檔名判斷，檔名含 categor 的視為分類。
+        """
+        terms = []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"讀取詞彙檔失敗 {path}: {str(e)}")
+                continue
+            if not isinstance(data, list):
+                logger.warning(f"詞彙檔 {path} 的頂層不是列表，跳過。")
+                continue
+            default_kind = KIND_CATEGORIES if 'categor' in os.path.basename(path).lower() else KIND_TAGS
+            for item in data:
+                if not isinstance(item, dict) or not item.get('name'):
+                    continue
+                taxonomy = item.get('taxonomy')
+                if taxonomy in ('video_category', 'categories'):
+                    kind = KIND_CATEGORIES
+                elif taxonomy in ('video_tag', 'tags'):
+                    kind = KIND_TAGS
+                else:
+                    kind = default_kind
+                terms.append(Term(id=item.get('id'), name=html.unescape(str(item['name'])).strip(), kind=kind))
+        return cls(terms)
+
+    @classmethod
+    def from_directory(cls, directory: str = None) -> 'TagMatcher':
+        """載入目錄下所有詞彙 JSON 檔"""
+        directory = directory or TAXONOMY_DIR
+        paths = sorted(glob.glob(os.path.join(directory, '*.json')))
+        matcher = cls.from_files(paths)
+        if not len(matcher):
+            logger.warning(f"{directory} 中沒有任何詞彙，請先執行 python scripts/tag_matcher.py --refresh 匯出 WordPress 標籤與分類")
+        else:
+            logger.debug(f"從 {directory} 載入 {len(matcher)} 個詞彙（{len(paths)} 個檔案）")
+        return matcher
+
+
+def refresh_taxonomy(directory: str = None) -> Dict[str, int]:
+    """從 WordPress 匯出所有標籤與分類到詞彙檔目錄（tags.json、categories.json）
+
+    格式與 wordpress_taxonomy_manager.py list --output-json 相同，先寫入暫存檔再取代，
+    匯出失敗或結果為空時保留原本的檔案。
+
+    Returns:
+        Dict[str, int]: 各分類法匯出的詞彙數
+    """
+    from wordpress_taxonomy_manager import WordPressTaxonomyManager
+
+    directory = directory or TAXONOMY_DIR
+    os.makedirs(directory, exist_ok=True)
+    manager = WordPressTaxonomyManager()
+    counts = {}
+    for kind in (KIND_TAGS, KIND_CATEGORIES):
+        terms = manager.get_all_terms(kind)
+        if not terms:
+            logger.warning(f"WordPress 沒有回傳任何 {kind}，保留原本的詞彙檔")
+            counts[kind] = 0
+            continue
+        path = os.path.join(directory, f"{kind}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+        counts[kind] = len(terms)
+        logger.info(f"已匯出 {len(terms)} 個 {kind} 到 {path}")
+    return counts
+
+
+def main():
+    """列出文字中比對到的現有標籤與分類，用於檢查詞彙檔與候選結果；--refresh 更新詞彙檔"""
+    parser = argparse.ArgumentParser(description='找出文字中出現的現有標籤與分類')
+    parser.add_argument('text', nargs='?', help='要比對的文字，未提供時從標準輸入讀取')
+    parser.add_argument('--dir', default=TAXONOMY_DIR, help='詞彙 JSON 檔目錄')
+    parser.add_argument('--refresh', action='store_true', help='先從 WordPress 匯出最新的標籤與分類到詞彙檔目錄')
+    args = parser.parse_args()
+
+    if args.refresh:
+        counts = refresh_taxonomy(args.dir)
+        print(f"已匯出 {counts[KIND_TAGS]} 個標籤、{counts[KIND_CATEGORIES]} 個分類到 {args.dir}")
+        if args.text is None:
+            return
+
+    matcher = TagMatcher.from_directory(args.dir)
+    if not len(matcher):
+        print(f"找不到任何詞彙: {args.dir}")
+        sys.exit(1)
+    text = args.text if args.text is not None else sys.stdin.read()
+    for term in matcher.match(text):
+        print(f"{term.kind:<12}{str(term.id):>8}  {term.name}")
+
+
+if __name__ == "__main__":
+    main()
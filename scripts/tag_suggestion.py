@@ -1,15 +1,42 @@
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 import os
-import re
+import hashlib
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
 import time
 from logger import get_workflow_logger
+from llm_metrics import track_call, OUTCOME_FAILED
+from prompt_compiler import get_prompt, PROMPTS_DIR
+from tag_matcher import TagMatcher, KIND_TAGS, KIND_CATEGORIES
+from result_cache import ResultCache
+from failed_jobs import record_failure, JOB_TAGS
+
+# 標籤生成使用的模型
+MODEL = "gpt-4.1-nano"
+SYSTEM_PROMPT_NAME = "openai/system_prompt"
+FUNCTION_SCHEMA_PATH = os.path.join(PROMPTS_DIR, 'openai', 'function_schema.json')
+FUNCTION_NAME = "suggest_tags"
+BATCH_FUNCTION_NAME = "suggest_tags_batch"
+REQUEST_TIMEOUT = 60
+# 提示詞中最多列出的候選詞彙數，以及保留給新標籤的名額
+MAX_CANDIDATES = 80
+NEW_TAG_SLOTS = 5
+# 批次請求中每次最多合併的影片數
+TAG_BATCH_SIZE = 5
+
+# 標籤結果快取設定
+TAG_CACHE_TTL = 30 * 24 * 60 * 60  # 30 天
+TAG_CACHE_MAX_ENTRIES = 20000
 
 class TagSuggester:
-    def __init__(self):
-        """初始化 TagSuggester"""
+    def __init__(self, bypass_cache: bool = False):
+        """初始化 TagSuggester
+
+        Args:
+            bypass_cache: 是否略過標籤結果快取強制重新生成，
+                          也可用環境變數 TAG_CACHE_BYPASS=1 開啟
+        """
         self.logger = get_workflow_logger('1', 'tag_suggester')
         self.logger.debug("初始化 TagSuggester...")
         
@@ -17,247 +44,319 @@ class TagSuggester:
         self.project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.env_path = os.path.join(self.project_root, 'config', '.env')
         
-        # 載入 .env 檔案
+        # 載入 .env 檔案並建立客戶端（只在初始化時執行一次）
         self._load_env_variables()
+        self.tool = self._load_tool()
+        self.batch_tool = self._make_batch_tool(self.tool)
+        # 現有標籤與分類的比對器，提示詞中的「標籤列表」由此提供（原本由 Assistant 的設定提供）
+        # 沒有詞彙檔時不送出請求（系統提示詞要求 existing_tags 只能使用列表中的標籤），由呼叫端改用預設標籤
+        self.tag_matcher = TagMatcher.from_directory()
+        if not self.has_taxonomy:
+            self.logger.warning(
+                "找不到標籤列表（config/taxonomy 或 TAG_TAXONOMY_DIR 中沒有詞彙檔），將略過標籤生成；"
+                "請先執行 python scripts/tag_matcher.py --refresh 從 WordPress 匯出標籤與分類"
+            )
+        # 標籤結果快取，鍵為 (模型, 函式定義與提示詞版本, 標題, 內容, 候選詞彙)
+        bypass = bypass_cache or os.getenv("TAG_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+        self.cache = ResultCache(
+            'tag_suggestions',
+            ttl=TAG_CACHE_TTL,
+            max_entries=TAG_CACHE_MAX_ENTRIES,
+            bypass=bypass
+        )
         
+    @property
+    def has_taxonomy(self) -> bool:
+        """是否有可列入提示詞的現有標籤與分類"""
+        return len(self.tag_matcher) > 0
+
     def _load_env_variables(self):
-        """重新載入環境變數"""
-        # 強制重新載入 .env 檔案
-        load_dotenv(self.env_path, override=True)
-        self.logger.debug(f"已重新載入環境變數檔案: {self.env_path}")
+        """載入環境變數並建立 OpenAI 客戶端"""
+        load_dotenv(self.env_path)
+        self.logger.debug(f"已載入環境變數檔案: {self.env_path}")
         
-        # 檢查環境變數
         api_key = os.getenv("OPENAI_API_KEY")
-        assistant_id = os.getenv("ASSISTANT_ID")
-        
         if not api_key:
             raise ValueError("請設置 OPENAI_API_KEY 環境變數")
-        if not assistant_id:
-            raise ValueError("請設置 ASSISTANT_ID 環境變數")
-            
-        self.logger.debug(f"使用 Assistant ID: {assistant_id}")
-        
-        # 建立 OpenAI 客戶端
-        self.client = OpenAI(api_key=api_key)
-        self.assistant_id = assistant_id
         
-    def handle_required_action(self, thread_id: str, run_id: str) -> Dict:
-        """處理 requires_action 狀態"""
-        # 獲取需要執行的功能
-        run = self.client.beta.threads.runs.retrieve(
-            thread_id=thread_id,
-            run_id=run_id
+        self.client = OpenAI(api_key=api_key, timeout=REQUEST_TIMEOUT)
+
+    def _load_tool(self) -> Dict:
+        """從 prompts/openai/function_schema.json 載入 suggest_tags 函式定義"""
+        with open(FUNCTION_SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        for function in schema["functions"]:
+            if function["name"] == FUNCTION_NAME:
+                return {"type": "function", "function": function}
+        raise ValueError(f"function_schema.json 中找不到 {FUNCTION_NAME}")
+
+    @staticmethod
+    def _make_batch_tool(tool: Dict) -> Dict:
+        """由 suggest_tags 的定義產生一次回傳多支影片結果的陣列版本"""
+        function = tool["function"]
+        item = json.loads(json.dumps(function["parameters"]))
+        item["properties"] = {
+            "index": {"type": "integer", "description": "影片編號，對應輸入中的「影片 N」"},
+            **item["properties"],
+        }
+        item["required"] = ["index"] + list(item.get("required", []))
+        return {
+            "type": "function",
+            "function": {
+                "name": BATCH_FUNCTION_NAME,
+                "description": f"{function['description']}，一次回傳多支影片的結果",
+                "strict": False,
+                "parameters": {
+                    "type": "object",
+                    "properties": {"results": {"type": "array", "items": item}},
+                    "required": ["results"],
+                },
+            },
+        }
+
+    @property
+    def schema_version(self) -> str:
+        """函式定義與系統提示詞的版本，任一改變時快取失效"""
+        tool = json.dumps(self.tool, ensure_ascii=False, sort_keys=True)
+        raw = f"{hashlib.sha256(tool.encode('utf-8')).hexdigest()}:{get_prompt(SYSTEM_PROMPT_NAME).version}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _cache_key(self, title: str, content: str, candidates: str) -> str:
+        """產生標籤結果的快取鍵，詞彙檔更新使候選詞彙改變時也會重新生成"""
+        return ResultCache.make_key(MODEL, self.schema_version, title, content, candidates)
+
+    def _candidate_section(self, title: str, content: str) -> str:
+        """列出標題與內容中出現的現有標籤與分類，作為系統提示詞所指的「標籤列表」"""
+        candidates = self.tag_matcher.match(title, content)[:MAX_CANDIDATES]
+        self.logger.debug(f"比對到 {len(candidates)} 個候選詞彙")
+
+        lines = []
+        for kind, label in ((KIND_TAGS, "標籤列表"), (KIND_CATEGORIES, "分類列表")):
+            names = [term.name for term in candidates if term.kind == kind]
+            lines.append(f"{label}（內容中出現的現有詞彙）：")
+            if names:
+                lines.extend(f"- {name}" for name in names)
+            else:
+                lines.append("（無）")
+        lines.append(
+            f"existing_tags 只能使用上述列表中的詞彙；列表以外的重要概念放在 new_tag_suggestions，"
+            f"最多 {NEW_TAG_SLOTS} 個。"
         )
-        
-        if not hasattr(run, 'required_action') or not run.required_action:
-            self.logger.warning("沒有找到需要執行的動作")
-            return {}
-            
-        tool_calls = run.required_action.submit_tool_outputs.tool_calls
-        outputs = []
-        
+        return "\n".join(lines)
+
+    def _build_messages(self, title: str, content: str, candidates: Optional[str] = None) -> list:
+        """組合系統提示詞、影片內容與候選詞彙"""
+        user_content = f"標題：{title}\n內容：{content}"
+        if candidates is None:
+            candidates = self._candidate_section(title, content)
+        if candidates:
+            user_content += f"\n\n{candidates}"
+        return [
+            {"role": "system", "content": get_prompt(SYSTEM_PROMPT_NAME).template},
+            {"role": "user", "content": user_content},
+        ]
+
+    def _tool_arguments(self, response, function_name: str) -> Dict:
+        """取出回應中指定函式呼叫的參數"""
+        message = response.choices[0].message
+        tool_calls = getattr(message, 'tool_calls', None) or []
         for tool_call in tool_calls:
-            # 根據功能名稱執行對應的操作
-            if tool_call.function.name == "suggest_tags":
-                outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": tool_call.function.arguments
-                })
-            else:
-                self.logger.warning(f"未知的功能: {tool_call.function.name}")
-                outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": "{}"
-                })
-        
-        # 提交功能執行結果
-        run = self.client.beta.threads.runs.submit_tool_outputs(
-            thread_id=thread_id,
-            run_id=run_id,
-            tool_outputs=outputs
+            if tool_call.function.name == function_name:
+                self.logger.debug(f"原始回應內容: {tool_call.function.arguments}")
+                return json.loads(tool_call.function.arguments)
+        raise ValueError(f"回應中沒有 {function_name} 的函式呼叫")
+
+    @staticmethod
+    def validate_result(result: Dict) -> Dict:
+        """驗證標籤結果，結果為空或僅有 ['video'] 時拋出例外進入重試"""
+        if (not result or
+            ("existing_tags" in result and
+             "tags" in result["existing_tags"] and
+             "general" in result["existing_tags"]["tags"] and
+             result["existing_tags"]["tags"]["general"] == ["video"])):
+            raise ValueError("標籤結果為空或僅有 ['video']")
+        return result
+
+    def _parse_response(self, response) -> Dict:
+        """解析 suggest_tags 的函式參數並驗證結果"""
+        return self.validate_result(self._tool_arguments(response, FUNCTION_NAME))
+
+    def _request(self, title: str, content: str, candidates: Optional[str] = None, metrics=None) -> Dict:
+        """送出一次帶有 suggest_tags 函式定義的 Chat Completions 請求"""
+        response = self.client.chat.completions.create(
+            model=MODEL,
+            messages=self._build_messages(title, content, candidates),
+            tools=[self.tool],
+            tool_choice={"type": "function", "function": {"name": FUNCTION_NAME}},
         )
+        usage = getattr(response, 'usage', None)
+        if metrics is not None and usage is not None:
+            metrics.add_usage(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+        return self._parse_response(response)
         
-        return self.wait_for_completion(thread_id, run.id)
-        
-    def wait_for_completion(self, thread_id: str, run_id: str, timeout: int = 60) -> Dict:
-        """
-        等待處理完成並返回結果，若遇到 expired/failed/cancelled 或結果為空/['video']/格式錯誤則 raise Exception 進入重試
-        """
-        """等待處理完成並返回結果
-        
+    def suggest_tags(self, title: str, content: str, journal_failures: bool = True) -> Optional[Dict]:
+        """根據影片標題和內容生成標籤建議，含指數退避重試機制
+
         Args:
-            thread_id: 對話的 thread ID
-            run_id: 處理的 run ID
-            timeout: 超時時間，預設 60 秒
-            
+            title: 影片標題
+            content: 文章內容與影片描述
+            journal_failures: 重試用盡時是否寫入失敗任務日誌（重新執行失敗任務時為 False）
+
         Returns:
-            處理結果字典
+            Optional[Dict]: 標籤結果，沒有標籤列表時返回 None
         """
-        start_time = time.time()
-        
-        while True:
-            # 檢查是否超時
-            if time.time() - start_time > timeout:
-                self.logger.error(f"標籤生成超時，已等待 {timeout} 秒")
-                raise TimeoutError(f"Tag suggestion timeout after {timeout} seconds")
-                
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run_id
-            )
-            
-            self.logger.debug(f"目前狀態: {run.status}")
-            
-            if run.status == "completed":
-                messages = self.client.beta.threads.messages.list(
-                    thread_id=thread_id
-                )
-                
-                last_message = messages.data[0]
-                if last_message.role == "assistant":
-                    try:
-                        # 記錄原始回應內容以便調試
-                        raw_content = last_message.content[0].text.value
-                        self.logger.debug(f"原始回應內容: {raw_content}")
-                        
-                        # 嘗試解析 JSON
-                        try:
-                            result = json.loads(raw_content)
-                            self.logger.debug(f"成功解析 JSON 回應")
-                        except json.JSONDecodeError as e:
-                            # 如果不是有效的 JSON，嘗試尋找和提取 JSON 部分
-                            self.logger.warning("回應不是有效的 JSON，嘗試尋找 JSON 部分")
-                            json_pattern = r'```json\s*(.+?)\s*```|\{(.+?)\}'
-                            matches = re.findall(json_pattern, raw_content, re.DOTALL)
-                            result = None
-                            if matches:
-                                for match in matches:
-                                    json_str = match[0] if match[0] else '{' + match[1] + '}'
-                                    try:
-                                        result = json.loads(json_str)
-                                        self.logger.debug(f"成功從文本中提取和解析 JSON")
-                                        break
-                                    except json.JSONDecodeError:
-                                        continue
-                            if not result:
-                                # 嘗試從文本中提取標籤
-                                tags = re.findall(r'["\']([^"\',]+)["\']', raw_content)
-                                if tags:
-                                    self.logger.debug(f"從文本中提取到標籤")
-                                    result = {"existing_tags": {"tags": {"general": tags}}}
-                                else:
-                                    raise ValueError("無法解析任何 JSON 或標籤")
-                        # 驗證結果內容
-                        if (not result or
-                            ("existing_tags" in result and
-                             "tags" in result["existing_tags"] and
-                             "general" in result["existing_tags"]["tags"] and
-                             result["existing_tags"]["tags"]["general"] == ["video"])):
-                            raise ValueError("標籤結果為空或僅有 ['video']")
-                        return result
-                    except (IndexError, AttributeError, ValueError, json.JSONDecodeError) as e:
-                        self.logger.error(f"解析回應時發生錯誤: {str(e)}")
-                        raise e
-                        
-            elif run.status == "requires_action":
-                return self.handle_required_action(thread_id, run_id)
-            elif run.status in ["failed", "expired", "cancelled"]:
-                self.logger.error(f"處理失敗，狀態為 {run.status}")
-                raise RuntimeError(f"Tag suggestion failed with status: {run.status}")
-            time.sleep(1)
-        
-    def suggest_tags(self, title: str, content: str) -> Dict:
-        """根據影片標題和內容生成標籤建議，含指數退避重試機制"""
+        if not self.has_taxonomy:
+            self.logger.warning(f"沒有標籤列表，略過標籤生成: {title}")
+            return None
+
         retry_intervals = [5, 10, 20, 40, 80]  # 指數退避，最多 5 次
         last_exception = None
-        for attempt, wait_time in enumerate(retry_intervals, 1):
-            try:
-                self._load_env_variables()
-                self.logger.debug(f"[嘗試第 {attempt} 次] 開始生成標籤建議...")
+        candidates = self._candidate_section(title, content)
+        cache_key = self._cache_key(title, content, candidates)
+        cached = self.cache.get(cache_key)
+        if cached:
+            self.logger.debug(f"使用快取的標籤結果: {title}")
+            return cached
 
-                # 建立新的 thread
+        with track_call('openai', MODEL, video=title) as metrics:
+            for attempt, wait_time in enumerate(retry_intervals, 1):
+                metrics.attempts = attempt
                 try:
-                    thread = self.client.beta.threads.create()
-                    self.logger.debug(f"Thread ID: {thread.id}")
-                except Exception as e:
-                    self.logger.error(f"建立 Thread 失敗: {str(e)}")
-                    raise
+                    self.logger.debug(f"[嘗試第 {attempt} 次] 開始生成標籤建議...")
+                    result = self._request(title, content, candidates, metrics=metrics)
+                    if result and "existing_tags" in result:
+                        tag_count = 0
+                        # 計算所有標籤數量
+                        if "tags" in result["existing_tags"]:
+                            for category in result["existing_tags"]["tags"].values():
+                                if isinstance(category, dict):
+                                    for subcategory in category.values():
+                                        if isinstance(subcategory, list):
+                                            tag_count += len(subcategory)
+                                elif isinstance(category, list):
+                                    tag_count += len(category)
+                        self.logger.debug(f"標籤生成完成，共產生 {tag_count} 個標籤")
+                    else:
+                        self.logger.debug("標籤生成完成，但沒有產生標籤")
+                    # _parse_response 已排除空結果與 ['video']，只有通過驗證的結果會寫入快取
+                    self.cache.set(cache_key, result)
+                    return result
 
-                # 添加訊息
-                try:
-                    message = self.client.beta.threads.messages.create(
-                        thread_id=thread.id,
-                        role="user",
-                        content=f"標題：{title}\n內容：{content}"
-                    )
-                    self.logger.debug("已添加訊息")
                 except Exception as e:
-                    self.logger.error(f"添加訊息失敗: {str(e)}")
-                    raise
+                    last_exception = e
+                    self.logger.error(f"[嘗試第 {attempt} 次] 生成標籤時發生錯誤: {str(e)}")
+                    if attempt < len(retry_intervals):
+                        self.logger.info(f"等待 {wait_time} 秒後重試...")
+                        time.sleep(wait_time)
+                    else:
+                        self.logger.error("已達到最大重試次數，將記錄失敗任務。")
+                        metrics.outcome = OUTCOME_FAILED
+                        if journal_failures:
+                            self._record_failed_job(title, content, e)
+                        # fallback: 回傳預設標籤結構，避免流程卡住（不寫入快取）
+                        return {"existing_tags": {"tags": {"general": ["video"]}}}
 
-                # 開始運行 assistant
-                self.logger.debug("開始運行 assistant")
-                try:
-                    run = self.client.beta.threads.runs.create(
-                        thread_id=thread.id,
-                        assistant_id=self.assistant_id
-                    )
-                except Exception as e:
-                    self.logger.error(f"運行 Assistant 失敗: {str(e)}")
-                    raise
-
-                result = self.wait_for_completion(thread.id, run.id)
-                # 檢查是否有標籤結果（這裡的空值或只有 ['video'] 已在 wait_for_completion 處理）
-                if result and "existing_tags" in result:
-                    tag_count = 0
-                    # 計算所有標籤數量
-                    if "tags" in result["existing_tags"]:
-                        for category in result["existing_tags"]["tags"].values():
-                            if isinstance(category, dict):
-                                for subcategory in category.values():
-                                    if isinstance(subcategory, list):
-                                        tag_count += len(subcategory)
-                            elif isinstance(category, list):
-                                tag_count += len(category)
-                    self.logger.debug(f"標籤生成完成，共產生 {tag_count} 個標籤")
-                else:
-                    self.logger.debug("標籤生成完成，但沒有產生標籤")
-                return result
+    def _build_batch_messages(self, items: List[Tuple[str, str, str]]) -> list:
+        """組合多支影片的批次請求，items 為 (標題, 內容, 候選詞彙)"""
+        sections = [
+            f"以下共 {len(items)} 支影片，請對每支影片分別依規則處理標籤，"
+            f"並以 {BATCH_FUNCTION_NAME} 一次回傳，results 中的 index 對應影片編號。"
+        ]
+        for index, (title, content, candidates) in enumerate(items, 1):
+            section = f"### 影片 {index}\n標題：{title}\n內容：{content}"
+            if candidates:
+                section += f"\n\n{candidates}"
+            sections.append(section)
+        return [
+            {"role": "system", "content": get_prompt(SYSTEM_PROMPT_NAME).template},
+            {"role": "user", "content": "\n\n".join(sections)},
+        ]
+
+    def _request_batch(self, items: List[Tuple[str, str, str]]) -> Dict[int, Dict]:
+        """送出一次批次請求，返回 {影片索引（從 0 開始）: 通過驗證的結果}
+
+        未回傳或未通過驗證的影片不會出現在結果中，由呼叫端個別重試。
+        """
+        with track_call('openai', MODEL) as metrics:
+            metrics.attempts = 1
+            response = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self._build_batch_messages(items),
+                tools=[self.batch_tool],
+                tool_choice={"type": "function", "function": {"name": BATCH_FUNCTION_NAME}},
+            )
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                metrics.add_usage(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+            arguments = self._tool_arguments(response, BATCH_FUNCTION_NAME)
 
+        results = {}
+        for entry in arguments.get("results") or []:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.pop("index", None)
+            if not isinstance(index, int) or not 1 <= index <= len(items) or index - 1 in results:
+                continue
+            try:
+                results[index - 1] = self.validate_result(entry)
+            except ValueError as e:
+                self.logger.warning(f"批次結果中影片 {index} 未通過驗證: {str(e)}")
+        return results
+
+    def suggest_tags_batch(self, items: List[Tuple[str, str]], batch_size: int = TAG_BATCH_SIZE) -> List[Dict]:
+        """一次請求為多支影片生成標籤建議，分攤系統提示詞與函式定義的 token
+
+        已快取的影片直接使用快取；批次請求失敗、缺少或未通過驗證的影片
+        改以 suggest_tags 個別處理（含重試與預設標籤）。
+
+        Args:
+            items: (標題, 內容) 的列表
+            batch_size: 每次請求最多合併的影片數
+
+        Returns:
+            List[Dict]: 與 items 順序相同的標籤結果，沒有標籤列表時皆為 None
+        """
+        if not self.has_taxonomy:
+            self.logger.warning(f"沒有標籤列表，略過 {len(items)} 支影片的標籤生成")
+            return [None] * len(items)
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        pending = []
+        for i, (title, content) in enumerate(items):
+            candidates = self._candidate_section(title, content)
+            cache_key = self._cache_key(title, content, candidates)
+            cached = self.cache.get(cache_key)
+            if cached:
+                self.logger.debug(f"使用快取的標籤結果: {title}")
+                results[i] = cached
+            else:
+                pending.append((i, title, content, candidates, cache_key))
+
+        batch_size = max(1, batch_size)
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            if len(chunk) == 1:
+                continue
+            try:
+                batch_results = self._request_batch([(title, content, candidates) for _, title, content, candidates, _ in chunk])
             except Exception as e:
-                last_exception = e
-                self.logger.error(f"[嘗試第 {attempt} 次] 生成標籤時發生錯誤: {str(e)}")
-                if attempt < len(retry_intervals):
-                    self.logger.info(f"等待 {wait_time} 秒後重試...")
-                    time.sleep(wait_time)
-                else:
-                    self.logger.error("已達到最大重試次數，將記錄失敗任務。")
-                    self._record_failed_job(title, content, e)
-                    # fallback: 回傳預設標籤結構，避免流程卡住
-                    return {"existing_tags": {"tags": {"general": ["video"]}}}
+                self.logger.error(f"批次生成 {len(chunk)} 支影片的標籤時發生錯誤: {str(e)}")
+                continue
+            self.logger.debug(f"批次請求完成 {len(batch_results)}/{len(chunk)} 支影片")
+            for position, result in batch_results.items():
+                i, _, _, _, cache_key = chunk[position]
+                self.cache.set(cache_key, result)
+                results[i] = result
+
+        for i, (title, content) in enumerate(items):
+            if results[i] is None:
+                self.logger.debug(f"個別生成標籤: {title}")
+                results[i] = self.suggest_tags(title, content)
+        return results
 
     def _record_failed_job(self, title, content, exception):
-        """記錄失敗的標籤生成任務到 failed_jobs.json"""
-        import datetime
-        failed_job = {
-            "title": title,
-            "content": content,
-            "error": str(exception),
-            "timestamp": datetime.datetime.now().isoformat()
-        }
-        failed_jobs_path = os.path.join(self.project_root, "logs", "failed_jobs.json")
-        try:
-            if os.path.exists(failed_jobs_path):
-                with open(failed_jobs_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            else:
-                data = []
-            data.append(failed_job)
-            with open(failed_jobs_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"已將失敗任務寫入 {failed_jobs_path}")
-        except Exception as e:
-            self.logger.error(f"寫入失敗任務時發生錯誤: {str(e)}")
+        """記錄失敗的標籤生成任務到失敗任務日誌（failed_jobs.py replay 可重新執行）"""
+        record_failure(JOB_TAGS, {"title": title, "content": content}, exception)
 
 
 if __name__ == "__main__":
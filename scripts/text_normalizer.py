@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# text_normalizer.py
+
+import re
+import threading
+from functools import lru_cache
+from typing import Iterable, List
+
+from opencc import OpenCC
+
+# 中日韓統一表意文字
+CJK = r'\u4e00-\u9fff'
+
+# 中文與英文/數字之間的位置（零寬度），一次掃描同時處理兩個方向
+CJK_LATIN_BOUNDARY = re.compile(
+    rf'(?<=[{CJK}])(?=[0-9A-Za-z])|(?<=[0-9A-Za-z])(?=[{CJK}])'
+)
+
+# 字幕行：\N 換行標記保持原樣，半形運算符號前後加空格，中英文/數字之間加空格
+# \N 的 N 後面接中文時不加空格（(?<!\\N)）
+SUBTITLE_TOKEN = re.compile(
+    rf'(\\N)|([-=+*/\\])|(?<=[{CJK}])(?=[0-9A-Za-z])|(?<=[0-9A-Za-z])(?<!\\N)(?=[{CJK}])'
+)
+
+# Gemini 回應中要移除的影片開場、結尾敘述
+VIDEO_BOUNDARY_PHRASES = (
+    "影片開始", "影片結束", "影片開始時", "影片結束時",
+    "影片一開始", "影片最後", "影片結尾"
+)
+
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter() -> OpenCC:
+    """取得程序內共用的 OpenCC s2tw 轉換器（簡體轉台灣繁體），避免每個客戶端重複載入字典"""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = OpenCC('s2tw')
+        return _converter
+
+
+def to_traditional(text: str) -> str:
+    """簡體轉台灣繁體"""
+    return get_converter().convert(text)
+
+
+def add_cjk_spacing(text: str) -> str:
+    """在中文和英文/數字之間添加空格"""
+    return CJK_LATIN_BOUNDARY.sub(' ', text)
+
+
+def normalize_llm_text(text: str) -> str:
+    """LLM 回應的共用處理：繁簡轉換、移除 markdown 粗體標記、中英文之間加空格"""
+    return add_cjk_spacing(to_traditional(text).replace('**', ''))
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """以空行分段，去除每段前後空白並略過空段落"""
+    return [p.strip() for p in text.split('\n\n') if p.strip()]
+
+
+def to_gutenberg(paragraphs: Iterable[str]) -> str:
+    """將段落包裝為 WordPress 古騰堡段落區塊"""
+    return '\n\n'.join(
+        f"<!-- wp:paragraph -->\n<p>{p}</p>\n<!-- /wp:paragraph -->" for p in paragraphs
+    )
+
+
+@lru_cache(maxsize=32)
+def _phrase_pattern(phrases: tuple) -> re.Pattern:
+    # 依原本逐一取代的順序排列，在同一位置優先比對前面的詞
+    return re.compile('|'.join(map(re.escape, phrases)))
+
+
+def remove_phrases(text: str, phrases: Iterable[str] = VIDEO_BOUNDARY_PHRASES) -> str:
+    """一次掃描移除所有指定詞語"""
+    return _phrase_pattern(tuple(phrases)).sub('', text)
+
+
+def clean_lines(text: str) -> str:
+    """去除每行前後空白並移除空行"""
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+def _subtitle_replacement(match: re.Match) -> str:
+    if match.group(1):
+        return match.group(1)
+    if match.group(2):
+        return f' {match.group(2)} '
+    return ' '
+
+
+def format_subtitle_line(line: str) -> str:
+    """處理一行字幕文字的空格格式
+
+    刪節號改為置中的 ⋯⋯，半形運算符號前後加空格，中英文/數字之間加空格，
+    最後合併連續空白並去除前後空白；ASS 的 \\N 換行標記保持不變。
+    """
+    line = line.replace('……', '⋯⋯')
+    line = SUBTITLE_TOKEN.sub(_subtitle_replacement, line)
+    return ' '.join(line.split())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""比較 text_normalizer 與原本逐次取代的文字處理速度
+
+以原本 perplexity_client、add_spaces、gemini_video_analyzer 的處理方式作為基準，
+確認輸出相同後分別計時。
+
+使用方式: python scripts/tools/benchmark_text_normalizer.py [--repeat 200]
+"""
+
+import os
+import re
+import sys
+import timeit
+import argparse
+
+# 將 scripts 目錄加入路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from opencc import OpenCC
+from text_normalizer import (
+    to_gutenberg, split_paragraphs, normalize_llm_text, format_subtitle_line,
+    remove_phrases, clean_lines
+)
+
+SAMPLE_RESPONSE = (
+    "**简介**：这部MV由导演Kevin执导，于2023年10月发布，共3分45秒。\n\n"
+    "影片开始时，主唱在Tokyo街头漫步，随后出现100名舞者。\n\n"
+    "歌曲收录于第2张专辑《Blue》，在YouTube上累计播放超过500万次。"
+) * 20
+
+SAMPLE_SUBTITLE = [
+    "1\n", "00:00:01,000 --> 00:00:03,000\n",
+    "我今天要去Tokyo看3場演唱會\\N然後再回台北……\n",
+    "價格是100-20=80元，折扣*2/3\n",
+] * 200
+
+SAMPLE_ANALYSIS = (
+    "影片開始時，畫面出現城市夜景。\n\n  影片一開始主角登場  \n"
+    "中段是舞蹈段落。\n影片結尾以合照收場。\n"
+) * 50
+
+
+def legacy_format_response(cc, response):
+    response = cc.convert(response)
+    response = response.replace('**', '')
+    response = re.sub(r'([一-鿿])([a-zA-Z0-9])', r'\1 \2', response)
+    response = re.sub(r'([a-zA-Z0-9])([一-鿿])', r'\1 \2', response)
+    paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
+    return '\n\n'.join(
+        "<!-- wp:paragraph -->\n<p>{}</p>\n<!-- /wp:paragraph -->".format(p) for p in paragraphs
+    )
+
+
+def legacy_subtitle_line(line):
+    line = line.replace(r'\N', '__NEWLINE__')
+    line = line.replace('……', '⋯⋯')
+    for punct in ['-', '=', '+', '*', '/', '\\']:
+        line = re.sub(re.escape(punct), f' {punct} ', line)
+    for pattern, repl in [
+        (r'([一-鿿])([a-zA-Z])', r'\1 \2'),
+        (r'([a-zA-Z])([一-鿿])', r'\1 \2'),
+        (r'([一-鿿])([0-9])', r'\1 \2'),
+        (r'([0-9])([一-鿿])', r'\1 \2')
+    ]:
+        line = re.sub(pattern, repl, line)
+    line = line.replace('__NEWLINE__', r'\N')
+    line = re.sub(r'\s+', ' ', line)
+    return line.strip()
+
+
+def legacy_clean_response(response):
+    for phrase in ["影片開始", "影片結束", "影片開始時", "影片結束時", "影片一開始", "影片最後", "影片結尾"]:
+        response = response.replace(phrase, "")
+        response = response.replace(phrase.upper(), "")
+        response = response.replace(phrase.capitalize(), "")
+    return "\n".join([line.strip() for line in response.split("\n") if line.strip()])
+
+
+def subtitle_lines(format_line):
+    return [
+        line if ' --> ' in line or line.strip().isdigit() else format_line(line) + '\n'
+        for line in SAMPLE_SUBTITLE
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較文字正規化的新舊實作速度')
+    parser.add_argument('--repeat', type=int, default=200, help='每個案例的執行次數')
+    args = parser.parse_args()
+
+    def legacy_perplexity():
+        # 原本每個客戶端各自建立轉換器，這裡只計算轉換本身
+        return legacy_format_response(legacy_cc, SAMPLE_RESPONSE)
+
+    legacy_cc = OpenCC('s2tw')
+    cases = [
+        ('Perplexity 回應格式化',
+         legacy_perplexity,
+         lambda: to_gutenberg(split_paragraphs(normalize_llm_text(SAMPLE_RESPONSE)))),
+        ('字幕空格',
+         lambda: subtitle_lines(legacy_subtitle_line),
+         lambda: subtitle_lines(format_subtitle_line)),
+        ('Gemini 敘述清理',
+         lambda: legacy_clean_response(SAMPLE_ANALYSIS),
+         lambda: clean_lines(remove_phrases(SAMPLE_ANALYSIS))),
+    ]
+
+    print(f"{'案例':<20}{'原本 ms':>10}{'新版 ms':>10}{'倍數':>8}")
+    for name, legacy, current in cases:
+        if legacy() != current():
+            print(f"{name}: 輸出不一致")
+            sys.exit(1)
+        legacy_time = timeit.timeit(legacy, number=args.repeat) / args.repeat * 1000
+        current_time = timeit.timeit(current, number=args.repeat) / args.repeat * 1000
+        print(f"{name:<20}{legacy_time:>10.3f}{current_time:>10.3f}{legacy_time / current_time:>8.2f}")
+
+    # 建立轉換器的成本，原本每個 PerplexityClient / GeminiFileClient 各付一次
+    setup = timeit.timeit(lambda: OpenCC('s2tw'), number=5) / 5 * 1000
+    print(f"{'建立 OpenCC 轉換器':<20}{setup:>10.3f}{'0（共用）':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""比較原始解析度與縮小後的人臉偵測結果與速度
+
+對每張圖片或影片中平均取樣的影格，分別以原始解析度（detect_height=0）與
+工作高度執行 SmartImageProcessor._score_frame，統計單臉判定一致率、
+臉部框 IoU 與每格耗時（清晰度加分一律以原始解析度計算，不受工作高度影響）。
+
+使用方式: python scripts/tools/compare_face_detection.py <圖片或影片...> [--detect-height 540] [--frames 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import cv2
+
+# 將 scripts 目錄加入路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_center_crop import SmartImageProcessor
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+
+# 預設比較的工作高度
+CANDIDATE_HEIGHT = 540
+
+
+def iter_samples(path, frames_per_video):
+    """圖片返回本身，影片返回平均取樣的影格"""
+    if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS:
+        image = cv2.imread(path)
+        if image is not None:
+            yield path, image
+        return
+
+    cap = cv2.VideoCapture(path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for i in range(frames_per_video):
+            index = int(total * (i + 0.5) / frames_per_video)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if ret:
+                yield f"{path}#{index}", frame
+    finally:
+        cap.release()
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = w * h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def timed_score(processor, frame):
+    start = time.perf_counter()
+    result = processor._score_frame(frame)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較原始解析度與縮小後的人臉偵測')
+    parser.add_argument('inputs', nargs='+', help='圖片或影片路徑')
+    parser.add_argument('--detect-height', type=int, default=CANDIDATE_HEIGHT, help='縮小後的工作高度')
+    parser.add_argument('--frames', type=int, default=20, help='每支影片取樣的影格數')
+    parser.add_argument('--verbose', action='store_true', help='列出每格結果')
+    args = parser.parse_args()
+
+    full = SmartImageProcessor(detect_height=0)
+    small = SmartImageProcessor(detect_height=args.detect_height)
+
+    total = agree = 0
+    ious = []
+    full_time = small_time = 0.0
+    for path in args.inputs:
+        for name, frame in iter_samples(path, args.frames):
+            (full_score, full_faces, _), t_full = timed_score(full, frame)
+            (small_score, small_faces, _), t_small = timed_score(small, frame)
+            full_time += t_full
+            small_time += t_small
+            total += 1
+
+            full_single = full_score > 0
+            small_single = small_score > 0
+            agree += full_single == small_single
+            if full_single and small_single:
+                ious.append(iou(full_faces[0], small_faces[0]))
+            if args.verbose or full_single != small_single:
+                print(f"{name}: 原始 {len(full_faces)} 張臉 / 縮小 {len(small_faces)} 張臉")
+
+    if not total:
+        print("沒有可比較的影格")
+        sys.exit(1)
+
+    print(f"影格數: {total}")
+    print(f"單臉判定一致率: {agree / total:.1%}")
+    if ious:
+        print(f"臉部框平均 IoU: {sum(ious) / len(ious):.3f}（最低 {min(ious):.3f}）")
+    print(f"每格耗時: 原始 {full_time / total * 1000:.1f} ms / 縮小 {small_time / total * 1000:.1f} ms"
+          f"（{full_time / small_time:.1f} 倍）")
+
+
+if __name__ == "__main__":
+    main()
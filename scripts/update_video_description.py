@@ -105,24 +105,30 @@ class VideoDescriptionUpdater:
             logger.error(f"下載影片時發生錯誤: {str(e)}")
             return None
 
-    def analyze_video(self, video_path: str) -> Optional[str]:
+    def _tidy_description(self, video_description: str) -> str:
+        """只需要簡單清理多餘的空白和換行"""
+        import re
+        video_description = re.sub(r'\n\s*\n', '\n\n', video_description)
+        return video_description.strip()
+
+    def analyze_video(self, video_path: str, youtube_id: Optional[str] = None) -> Optional[str]:
         """使用 Gemini 分析影片
         
         Args:
             video_path: 影片路徑
+            youtube_id: 影片的 YouTube ID（可選），用於分析結果快取
             
         Returns:
             str: 影片描述或 None（如果分析失敗）
         """
         try:
             # 使用 GeminiVideoAnalyzer 分析影片，指定不使用 WordPress 格式
-            video_description = self.gemini_analyzer.analyze_video_file(video_path, use_wordpress_format=False)
+            video_description = self.gemini_analyzer.analyze_video_file(
+                video_path, use_wordpress_format=False, youtube_id=youtube_id
+            )
             
             if video_description:
-                # 只需要簡單清理多餘的空白和換行
-                import re
-                video_description = re.sub(r'\n\s*\n', '\n\n', video_description)
-                video_description = video_description.strip()
+                video_description = self._tidy_description(video_description)
                 
                 logger.info(f"影片分析成功，描述長度: {len(video_description)} 字元")
                 return video_description
@@ -190,6 +196,7 @@ class VideoDescriptionUpdater:
         # 從 URL 中提取影片 ID
         import re
         video_id = None
+        youtube_id = None
         
         # 嘗試從 YouTube URL 中提取 ID
         youtube_patterns = [
@@ -202,8 +209,16 @@ class VideoDescriptionUpdater:
             match = re.search(pattern, video_url)
             if match:
                 video_id = match.group(1)
+                youtube_id = video_id
                 break
                 
+        # 已有分析結果時直接使用，不必重新下載與分析
+        if youtube_id:
+            cached = self.gemini_analyzer.get_cached_analysis(youtube_id)
+            if cached:
+                logger.info(f"使用快取的影片分析結果: {youtube_id}")
+                return self.update_video_description(post_id, self._tidy_description(cached))
+                
         if not video_id:
             # 如果不是 YouTube URL，使用隨機 ID
             import uuid
@@ -215,7 +230,7 @@ class VideoDescriptionUpdater:
             return False
             
         # 分析影片
-        description = self.analyze_video(video_path)
+        description = self.analyze_video(video_path, youtube_id=youtube_id)
         if not description:
             return False
             
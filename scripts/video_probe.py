@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# video_probe.py
+
+import re
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict
+
+import yt_dlp
+from logger import get_workflow_logger
+from result_cache import ResultCache
+
+logger = get_workflow_logger('1', 'video_probe')
+
+# 探測結果的磁碟快取（cache/video_probe.sqlite3），只保存 VideoInfo 的欄位，不含完整的 yt-dlp 資訊
+PROBE_CACHE_TTL = 30 * 24 * 60 * 60  # 30 天
+PROBE_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+# YouTube 的串流網址約 6 小時後失效，超過此時間的 formats 不再直接拿來下載
+FORMATS_TTL = 6 * 60 * 60
+
+YOUTUBE_ID_PATTERNS = [
+    re.compile(r'(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'),
+    re.compile(r'youtube\.com/(?:embed|v|shorts)/([a-zA-Z0-9_-]{11})'),
+]
+
+# 同一個程序內共用的探測結果（含 raw），避免每個呼叫端都重新讀取快取
+_memory_cache: Dict[str, 'VideoInfo'] = {}
+_memory_lock = threading.Lock()
+_disk_cache: Optional[ResultCache] = None
+
+
+@dataclass
+class VideoInfo:
+    """單支影片的 yt-dlp 探測結果"""
+    url: str
+    id: str
+    title: str
+    duration: float
+    thumbnail: Optional[str]
+    formats: List[Dict]
+    fetched_at: float
+    raw: Dict = field(default_factory=dict, repr=False)
+
+    @property
+    def formatted_duration(self) -> str:
+        """時長轉換為 MM:SS 格式"""
+        minutes, seconds = divmod(self.duration or 0, 60)
+        return f"{int(minutes)}:{int(seconds):02}"
+
+    def formats_fresh(self) -> bool:
+        """formats 中的串流網址是否仍可直接用來下載"""
+        return bool(self.raw) and time.time() - self.fetched_at < FORMATS_TTL
+
+    def to_dict(self) -> Dict:
+        """磁碟快取保存的欄位；raw 動輒數百 KB 且串流網址數小時後失效，只留在記憶體"""
+        return {
+            'url': self.url,
+            'id': self.id,
+            'title': self.title,
+            'duration': self.duration,
+            'thumbnail': self.thumbnail,
+            'formats': self.formats,
+            'fetched_at': self.fetched_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'VideoInfo':
+        return cls(
+            url=data['url'],
+            id=data['id'],
+            title=data.get('title', '無標題'),
+            duration=data.get('duration') or 0,
+            thumbnail=data.get('thumbnail'),
+            formats=data.get('formats', []),
+            fetched_at=data.get('fetched_at', 0),
+        )
+
+
+def youtube_id_from_url(url: str) -> Optional[str]:
+    """不呼叫 yt-dlp，直接從網址解析 YouTube 影片 ID"""
+    for pattern in YOUTUBE_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def canonical_url(url: str) -> str:
+    """將各種 YouTube 網址格式統一成 watch?v= 形式，作為快取鍵"""
+    url = url.strip()
+    youtube_id = youtube_id_from_url(url)
+    if youtube_id:
+        return f"https://www.youtube.com/watch?v={youtube_id}"
+    return url
+
+
+def _get_disk_cache() -> ResultCache:
+    global _disk_cache
+    with _memory_lock:
+        if _disk_cache is None:
+            _disk_cache = ResultCache('video_probe', ttl=PROBE_CACHE_TTL, max_bytes=PROBE_CACHE_MAX_BYTES)
+        return _disk_cache
+
+
+def _load_cached(url: str) -> Optional[VideoInfo]:
+    data = _get_disk_cache().get(url)
+    if not data:
+        return None
+    try:
+        return VideoInfo.from_dict(data)
+    except Exception as e:
+        logger.warning(f"讀取探測快取失敗 {url}: {str(e)}")
+        return None
+
+
+def _save_cached(info: VideoInfo) -> None:
+    _get_disk_cache().set(info.url, info.to_dict())
+
+
+def _compact_formats(formats: List[Dict]) -> List[Dict]:
+    """只保留挑選格式時會用到的欄位"""
+    keys = ('format_id', 'ext', 'height', 'fps', 'vcodec', 'acodec', 'tbr', 'filesize')
+    return [{k: f.get(k) for k in keys if f.get(k) is not None} for f in formats or []]
+
+
+def _extract(url: str) -> VideoInfo:
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'noplaylist': True,
+        'no_cookies': True
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        raw = ydl.sanitize_info(info)
+
+    return VideoInfo(
+        url=url,
+        id=info.get('id'),
+        title=info.get('title', '無標題'),
+        duration=info.get('duration') or 0,
+        thumbnail=info.get('thumbnail'),
+        formats=_compact_formats(info.get('formats')),
+        fetched_at=time.time(),
+        raw=raw,
+    )
+
+
+def probe_video(url: str, max_retries: int = 3, refresh: bool = False) -> VideoInfo:
+    """探測影片 metadata，一支影片只呼叫一次 yt-dlp
+
+    結果會保存在記憶體與 cache/video_probe.sqlite3，以標準化網址為鍵。
+    磁碟快取保存 PROBE_CACHE_TTL 並以 PROBE_CACHE_MAX_BYTES 限制大小，不含 raw，
+    所以從磁碟讀回的結果 formats_fresh() 為 False，下載端會重新擷取；
+    formats 超過 FORMATS_TTL 後同樣改為重新擷取。
+
+    Args:
+        url: 影片網址
+        max_retries: 最大重試次數，預設為 3
+        refresh: 是否忽略快取重新探測
+
+    Returns:
+        VideoInfo: 探測結果
+    """
+    url = canonical_url(url)
+
+    if not refresh:
+        with _memory_lock:
+            cached = _memory_cache.get(url)
+        if cached is None:
+            cached = _load_cached(url)
+            if cached:
+                with _memory_lock:
+                    _memory_cache[url] = cached
+        if cached:
+            logger.debug(f"使用快取的影片資訊: {url}")
+            return cached
+
+    for attempt in range(max_retries):
+        try:
+            info = _extract(url)
+            with _memory_lock:
+                _memory_cache[url] = info
+            _save_cached(info)
+            return info
+        except Exception as e:
+            if attempt < max_retries - 1:
+                logger.error(f"擷取資訊失敗 (嘗試 {attempt + 1}/{max_retries}): {str(e)}")
+                time.sleep(5)
+                continue
+            raise
@@ -5,13 +5,13 @@ import os
 import re
 import json
 import requests
-import yt_dlp
 from requests.auth import HTTPBasicAuth
 from typing import Optional, List, Dict, Union
 from pathlib import Path
 from datetime import datetime, timedelta
 from PIL import Image
 from io import BytesIO
+from video_probe import probe_video
 
 class WordPressAPI:
 
@@ -35,6 +35,26 @@ class WordPressAPI:
             self.logger.error(f"刪除文章 {post_id} 時發生錯誤: {str(e)}")
             return False
 
+    def delete_media(self, media_id: int) -> bool:
+        """永久刪除指定 ID 的媒體檔案（媒體沒有垃圾桶，需 force=true）
+        Args:
+            media_id: 媒體 ID
+        Returns:
+            bool: 刪除是否成功
+        """
+        endpoint = f"{self.api_base}/media/{media_id}"
+        try:
+            response = requests.delete(endpoint, auth=self.auth, headers=self.headers, params={'force': 'true'})
+            if response.status_code in [200, 204]:
+                self.logger.info(f"已成功刪除媒體 {media_id}")
+                return True
+            else:
+                self.logger.error(f"刪除媒體 {media_id} 失敗: {response.status_code}, {response.text}")
+                return False
+        except Exception as e:
+            self.logger.error(f"刪除媒體 {media_id} 時發生錯誤: {str(e)}")
+            return False
+
     def __init__(self, logger):
         """初始化 WordPress API 客戶端"""
         self.logger = logger
@@ -58,8 +78,17 @@ class WordPressAPI:
         video_tag: Optional[List[int]] = None,
         video_id: str = None,
         meta_data: Optional[Dict] = None,
+        thumbnail_url: Optional[str] = None,
+        featured_media: Optional[int] = None,
+        upload_thumbnail: bool = True,
     ) -> Dict:
-        """建立影片草稿"""
+        """建立影片草稿
+
+        thumbnail_url 可由呼叫端直接提供（例如探測結果中的縮圖），
+        未提供時才依 video_id 查詢。
+        若呼叫端已先用 upload_thumbnail 上傳縮圖，可直接傳入 featured_media；
+        呼叫端已嘗試上傳但失敗時傳入 upload_thumbnail=False，不再重新上傳。
+        """
         endpoint = f"{self.api_base}/video"
         
         # 準備基本的 meta 資料
@@ -93,22 +122,12 @@ class WordPressAPI:
             
         try:
             # 如果有提供影片 ID，嘗試下載並上傳縮圖
-            if video_id:
-                thumbnail_url = self.get_thumbnail_url(video_id)
-                if thumbnail_url:
-                    # 下載縮圖
-                    image_data = self.download_thumbnail(thumbnail_url)
-                    if image_data:
-                        # 壓縮圖片
-                        compressed_data = self.compress_image(image_data)
-                        
-                        # 上傳縮圖
-                        media = self.upload_media(
-                            file_data=compressed_data,
-                            filename=f"{video_id}-thumbnail.jpg"
-                        )
-                        if media and 'id' in media:
-                            data['featured_media'] = media['id']
+            if featured_media:
+                data['featured_media'] = featured_media
+            elif video_id and upload_thumbnail:
+                media_id = self.upload_thumbnail(video_id, thumbnail_url)
+                if media_id:
+                    data['featured_media'] = media_id
 
             response = requests.post(endpoint, auth=self.auth, json=data)
             
@@ -172,6 +191,38 @@ class WordPressAPI:
             self.logger.error(f"建立草稿時發生錯誤: {str(e)}")
             return None
             
+    def upload_thumbnail(self, video_id: str, thumbnail_url: Optional[str] = None) -> Optional[int]:
+        """下載、壓縮並上傳影片縮圖
+
+        Args:
+            video_id: YouTube 影片 ID
+            thumbnail_url: 縮圖網址，未提供時依 video_id 查詢
+
+        Returns:
+            int: 上傳後的媒體 ID，失敗時返回 None
+        """
+        if not thumbnail_url:
+            thumbnail_url = self.get_thumbnail_url(video_id)
+        if not thumbnail_url:
+            return None
+
+        # 下載縮圖
+        image_data = self.download_thumbnail(thumbnail_url)
+        if not image_data:
+            return None
+
+        # 壓縮圖片
+        compressed_data = self.compress_image(image_data)
+
+        # 上傳縮圖
+        media = self.upload_media(
+            file_data=compressed_data,
+            filename=f"{video_id}-thumbnail.jpg"
+        )
+        if media and 'id' in media:
+            return media['id']
+        return None
+
     def upload_media(self, file_data: Union[str, Path, bytes], filename: Optional[str] = None, post_id: Optional[int] = None) -> Optional[Dict]:
         """上傳媒體檔案到 WordPress
         
@@ -363,16 +414,8 @@ class WordPressAPI:
     def get_thumbnail_url(self, video_id: str) -> Optional[str]:
         """從 YouTube 影片 ID 獲取縮圖網址"""
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': True,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-                if info and 'thumbnail' in info:
-                    return info['thumbnail']
-                return None
+            info = probe_video(f"https://www.youtube.com/watch?v={video_id}")
+            return info.thumbnail
         except Exception as e:
             self.logger.error(f"獲取縮圖失敗：{str(e)}")
             return None
@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import tempfile
+import subprocess
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import analysis_proxy
+from scripts.analysis_proxy import make_analysis_proxy, proxy_path_for
+
+def fake_run(proxy_bytes=b'p' * 1024, fail=False):
+    """模擬 ffmpeg 寫出暫存檔、ffprobe 回報時長"""
+    calls = []
+
+    def run(command, **kwargs):
+        calls.append(command)
+        if '-vf' in command:
+            with open(command[-1], 'wb') as f:
+                f.write(proxy_bytes)
+            if fail:
+                raise subprocess.CalledProcessError(1, command, stderr='encode error')
+            return MagicMock(stdout='', returncode=0)
+        return MagicMock(stdout='12.5\n', returncode=0)
+    return run, calls
+
+class TestAnalysisProxy(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.source = os.path.join(self.temp_dir.name, 'video.mp4')
+        with open(self.source, 'wb') as f:
+            f.write(b's' * 4096)
+
+    def test_report_fields(self):
+        """測試轉檔後返回代理檔報告"""
+        run, calls = fake_run()
+        with patch.object(analysis_proxy.subprocess, 'run', side_effect=run):
+            report = make_analysis_proxy(self.source)
+        self.assertEqual(report['path'], proxy_path_for(self.source))
+        self.assertTrue(os.path.exists(report['path']))
+        self.assertEqual(report['height'], 360)
+        self.assertEqual(report['fps'], 1)
+        self.assertEqual(report['ratio'], 0.25)
+        self.assertEqual(report['duration'], 12.5)
+        self.assertFalse(report['cached'])
+        self.assertEqual(len(calls), 2)
+
+    def test_reuse_when_newer_than_source(self):
+        """測試代理檔比來源新時沿用，來源較新時重新轉檔"""
+        run, calls = fake_run()
+        with patch.object(analysis_proxy.subprocess, 'run', side_effect=run):
+            make_analysis_proxy(self.source)
+            report = make_analysis_proxy(self.source)
+            self.assertTrue(report['cached'])
+            # 只有第二次的 ffprobe，沒有再執行 ffmpeg
+            self.assertEqual(sum('-vf' in c for c in calls), 1)
+
+            future = time.time() + 60
+            os.utime(self.source, (future, future))
+            report = make_analysis_proxy(self.source)
+            self.assertFalse(report['cached'])
+            self.assertEqual(sum('-vf' in c for c in calls), 2)
+
+    def test_failure_removes_tmp_file(self):
+        """測試轉檔失敗時刪除暫存檔並返回 None"""
+        run, _ = fake_run(fail=True)
+        with patch.object(analysis_proxy.subprocess, 'run', side_effect=run):
+            self.assertIsNone(make_analysis_proxy(self.source))
+        proxy_dir = os.path.dirname(proxy_path_for(self.source))
+        self.assertEqual(os.listdir(proxy_dir), [])
+
+    def test_concurrent_tmp_files_do_not_collide(self):
+        """測試不同執行緒轉同一支影片時使用不同的暫存檔"""
+        run, calls = fake_run()
+        barrier = threading.Barrier(2, timeout=5)
+
+        def run_together(command, **kwargs):
+            # 兩個執行緒都開始轉檔後才寫出暫存檔
+            if '-vf' in command:
+                barrier.wait()
+            return run(command, **kwargs)
+
+        with patch.object(analysis_proxy.subprocess, 'run', side_effect=run_together):
+            threads = [threading.Thread(target=make_analysis_proxy, args=(self.source,)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        tmp_paths = [c[-1] for c in calls if '-vf' in c]
+        self.assertEqual(len(set(tmp_paths)), 2)
+        self.assertTrue(all(path.endswith('.tmp.mp4') for path in tmp_paths))
+        self.assertTrue(os.path.exists(proxy_path_for(self.source)))
+
+    def test_empty_source_ratio(self):
+        """測試來源為空檔時 ratio 為 None 且不會拋出例外"""
+        open(self.source, 'wb').close()
+        run, _ = fake_run()
+        with patch.object(analysis_proxy.subprocess, 'run', side_effect=run):
+            report = make_analysis_proxy(self.source)
+        self.assertIsNone(report['ratio'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import time
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.concurrency import ServiceLimiter, StageGraph, StageFailed
+
+class TestStageGraph(unittest.TestCase):
+    def test_results_follow_dependencies(self):
+        """測試節點依相依順序接收結果"""
+        graph = StageGraph()
+        graph.add('a', lambda: 1)
+        graph.add('b', lambda a: a + 1, deps=['a'])
+        graph.add('c', lambda a: a * 10, deps=['a'])
+        graph.add('d', lambda b, c: (b, c), deps=['b', 'c'])
+        results = graph.run()
+        self.assertEqual(results, {'a': 1, 'b': 2, 'c': 10, 'd': (2, 10)})
+
+    def test_independent_stages_overlap(self):
+        """測試互不相依的節點並行執行"""
+        barrier = threading.Barrier(2, timeout=2)
+        graph = StageGraph()
+        graph.add('root', lambda: None)
+        graph.add('left', lambda _: barrier.wait(), deps=['root'])
+        graph.add('right', lambda _: barrier.wait(), deps=['root'])
+        # 若兩個節點沒有同時執行，barrier 會逾時並讓節點失敗
+        graph.run()
+
+    def test_failure_skips_dependents(self):
+        """測試節點失敗後不啟動相依節點"""
+        called = []
+
+        def fail(_):
+            raise ValueError("boom")
+
+        graph = StageGraph()
+        graph.add('root', lambda: 'ok')
+        graph.add('bad', fail, deps=['root'])
+        graph.add('after', lambda _: called.append('after'), deps=['bad'])
+        with self.assertRaises(StageFailed) as ctx:
+            graph.run()
+        self.assertEqual(ctx.exception.stage, 'bad')
+        self.assertIsInstance(ctx.exception.error, ValueError)
+        self.assertEqual(ctx.exception.results, {'root': 'ok'})
+        self.assertEqual(called, [])
+
+    def test_unknown_dependency(self):
+        """測試相依節點必須先加入"""
+        graph = StageGraph()
+        with self.assertRaises(ValueError):
+            graph.add('a', lambda b: b, deps=['b'])
+
+class TestServiceLimiter(unittest.TestCase):
+    def test_limit_caps_concurrency(self):
+        """測試同一服務的同時執行數不超過上限"""
+        limiter = ServiceLimiter({'gemini': 2})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with limiter.limit('gemini'):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(max(peak), 2)
+
+    def test_unknown_service_is_unlimited(self):
+        """測試未設定的服務不受限制"""
+        limiter = ServiceLimiter({'gemini': 1})
+        with limiter.limit('wordpress'):
+            with limiter.limit('wordpress'):
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
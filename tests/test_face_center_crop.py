@@ -0,0 +1,281 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+import random
+import json
+
+import cv2
+import numpy as np
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+from scripts import face_center_crop
+from scripts.face_center_crop import (
+    SmartImageProcessor, TopCandidates, candidate_capacity, process_batch, collect_inputs, SAMPLE_KEYFRAMES
+)
+
+FPS = 24
+WIDTH, HEIGHT = 320, 240
+
+def write_video(path, frame_count, brightness=lambda i: (i * 2) % 256, noise=lambda i: 0, fps=FPS):
+    """寫出每格亮度不同的測試影片，用亮度辨識讀到的是第幾格，noise 控制清晰度分數"""
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (WIDTH, HEIGHT))
+    for i in range(frame_count):
+        frame = np.full((HEIGHT, WIDTH, 3), brightness(i), np.int16)
+        if noise(i):
+            frame += rng.integers(-noise(i), noise(i) + 1, frame.shape, dtype=np.int16)
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+
+class FakeCascade:
+    """依灰階亮度決定是否有臉的假偵測器（測試環境的 OpenCV 沒有 Haar cascade）"""
+    instances = 0
+
+    def __init__(self, *args):
+        FakeCascade.instances += 1
+        self.calls = 0
+
+    def detectMultiScale(self, gray, **kwargs):
+        self.calls += 1
+        self.last_shape = gray.shape
+        self.last_kwargs = kwargs
+        if 40 <= gray.mean() < 80:
+            return np.array([[10, 10, 100, 100]])
+        return ()
+
+class TestSmartImageProcessor(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        patcher = patch.object(cv2, 'CascadeClassifier', FakeCascade, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.processor = SmartImageProcessor()
+
+    def video(self, frame_count=120, **kwargs):
+        path = os.path.join(self.temp_dir.name, 'video.avi')
+        write_video(path, frame_count, **kwargs)
+        return path
+
+    def test_sequential_sampling_matches_seek(self):
+        """測試依序解碼取樣與逐格定位讀到相同的影格"""
+        cap = cv2.VideoCapture(self.video())
+        self.addCleanup(cap.release)
+        sampled = list(self.processor._iter_frames(cap, FPS, 6, 48))
+        self.assertEqual([index for index, _, _ in sampled], list(range(0, 48, 6)))
+        for index, frame_pos, frame in sampled:
+            self.assertAlmostEqual(frame_pos, index / FPS)
+            self.assertLess(abs(frame.mean() - index * 2), 2)
+
+    def test_keyframe_sampling(self):
+        """測試只讀取關鍵影格，超過結尾的關鍵影格不讀"""
+        cap = cv2.VideoCapture(self.video())
+        self.addCleanup(cap.release)
+        sampled = list(self.processor._iter_frames(cap, FPS, 6, 48, keyframes=[0.0, 1.0, 2.5]))
+        self.assertEqual([index for index, _, _ in sampled], [0, 24])
+        self.assertLess(abs(sampled[1][2].mean() - 48), 2)
+
+    def test_keyframe_sampling_fractional_fps(self):
+        """測試 29.97fps 影片的關鍵影格秒數以實際影格率換算，不因取整為 29 而偏移"""
+        cap = cv2.VideoCapture(self.video(600, fps=30000 / 1001))
+        self.addCleanup(cap.release)
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        sampled = list(self.processor._iter_frames(cap, fps, fps // 4, 510, keyframes=[10.0, 15.0]))
+        self.assertEqual([index for index, _, _ in sampled], [300, 450])
+        self.assertEqual([t for _, t, _ in sampled], [10.0, 15.0])
+        for index, _, frame in sampled:
+            self.assertLess(abs(frame.mean() - (index * 2) % 256), 2)
+
+    def test_process_video_writes_face_covers(self):
+        """測試有臉的影格輸出 top 封面"""
+        output = os.path.join(self.temp_dir.name, 'cover.jpg')
+        result = self.processor.process_video(self.video(), output)
+        self.assertEqual(result, os.path.join(self.temp_dir.name, 'cover_top1.jpg'))
+        image = cv2.imread(result)
+        self.assertEqual(image.shape, (3414, 1920, 3))
+
+    def test_keyframe_probe_failure_falls_back(self):
+        """測試無法取得關鍵影格時改用依序取樣"""
+        output = os.path.join(self.temp_dir.name, 'cover.jpg')
+        with patch.object(face_center_crop, 'probe_keyframes', return_value=None):
+            result = self.processor.process_video(self.video(), output, SAMPLE_KEYFRAMES)
+        self.assertTrue(result and os.path.exists(result))
+
+    def test_empty_keyframe_list_falls_back(self):
+        """測試 ffprobe 沒有列出任何關鍵影格時改用依序取樣"""
+        output = os.path.join(self.temp_dir.name, 'cover.jpg')
+        probe = MagicMock(stdout=json.dumps({'frames': [], 'streams': [{'start_time': '0.000000'}]}))
+        with patch.object(face_center_crop.subprocess, 'run', return_value=probe):
+            self.assertIsNone(face_center_crop.probe_keyframes(self.video()))
+            result = self.processor.process_video(self.video(), output, SAMPLE_KEYFRAMES)
+        self.assertTrue(result and os.path.exists(result))
+
+    def test_keyframe_times_relative_to_stream_start(self):
+        """測試關鍵影格時間扣掉串流 start_time"""
+        probe = MagicMock(stdout=json.dumps({
+            'frames': [{'pts_time': '11.400000'}, {'pts_time': '1.400000'}, {'pts_time': 'N/A'}],
+            'streams': [{'start_time': '1.400000'}],
+        }))
+        with patch.object(face_center_crop.subprocess, 'run', return_value=probe):
+            keyframes = face_center_crop.probe_keyframes('video.mp4')
+        self.assertEqual([round(t, 6) for t in keyframes], [0.0, 10.0])
+
+    def test_no_face_single_pass(self):
+        """測試找不到臉時只掃描一次就以品質分數輸出封面"""
+        output = os.path.join(self.temp_dir.name, 'cover.jpg')
+        result = self.processor.process_video(self.video(brightness=lambda i: 200), output)
+        self.assertEqual(result, os.path.join(self.temp_dir.name, 'cover_noface_top1.jpg'))
+        # 24fps 每 6 格取樣，扣掉最後 3 秒共 8 格，每格只偵測一次
+        self.assertEqual(self.processor.face_cascade.calls, 8)
+
+    def test_downscaled_detection(self):
+        """測試在工作高度上偵測，minSize 依比例縮小，臉部框換算回原始座標"""
+        frame = np.full((1080, 1920, 3), 60, np.uint8)
+        processor = SmartImageProcessor(detect_height=540)
+        face_score, faces, quality_score = processor._score_frame(frame)
+        self.assertEqual(processor.face_cascade.last_shape, (540, 960))
+        self.assertEqual(processor.face_cascade.last_kwargs['minSize'], (40, 40))
+        self.assertEqual(face_score, 30)
+        self.assertEqual(faces.tolist(), [[20, 20, 200, 200]])
+        self.assertIsInstance(quality_score, float)
+
+        # 預設不縮小，使用原始解析度
+        _, faces, _ = self.processor._score_frame(frame)
+        self.assertEqual(self.processor.face_cascade.last_shape, (1080, 1920))
+        self.assertEqual(np.asarray(faces).tolist(), [[10, 10, 100, 100]])
+
+    def test_sharpness_bonus_independent_of_detect_height(self):
+        """測試清晰度以原始解析度計算，縮小偵測不改變加分與品質分數"""
+        # 週期 16 像素的條紋：原始解析度的 Laplacian 變異數低於門檻，縮小一半後會超過
+        row = 60 + 50 * np.sin(2 * np.pi * np.arange(1920) / 16)
+        frame = np.repeat(np.tile(row, (1080, 1))[:, :, None], 3, axis=2).astype(np.uint8)
+        full = self.processor._score_frame(frame)
+        small = SmartImageProcessor(detect_height=540)._score_frame(frame)
+        self.assertEqual(full[0], 30)
+        self.assertEqual(small[0], full[0])
+        self.assertAlmostEqual(small[2], full[2], places=3)
+
+    def scan(self, path, workers):
+        cap = cv2.VideoCapture(path)
+        self.addCleanup(cap.release)
+        end_frame = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) - 3 * FPS
+        capacity = candidate_capacity(3, 2.0, 4)
+        if workers > 1:
+            return self.processor._scan_parallel(path, FPS, 6, end_frame, None, capacity, workers)
+        return self.processor._scan_candidates(cap, FPS, 6, end_frame, None, capacity)
+
+    def picks(self, ranked):
+        return [(score, index, pos) for score, index, _, pos in
+                self.processor.pick_diverse_top_k(ranked, k=3, time_threshold=2.0)]
+
+    def test_parallel_scan_matches_single_process(self):
+        """測試分段多程序掃描挑出的影格與單一程序相同（含同分與無臉的 fallback）"""
+        cases = [
+            # 部分影格有臉，分數大量同分
+            dict(brightness=lambda i: (i * 7) % 256),
+            # 沒有臉，依雜訊強度產生不同的品質分數
+            dict(brightness=lambda i: 200, noise=lambda i: (i * 13) % 40),
+        ]
+        for case in cases:
+            path = os.path.join(self.temp_dir.name, 'long.avi')
+            write_video(path, 20 * FPS, **case)
+            single_faces, single_quality = self.scan(path, 1)
+            for workers in (2, 3):
+                faces, quality = self.scan(path, workers)
+                self.assertEqual(self.picks(faces), self.picks(single_faces))
+                self.assertEqual(self.picks(quality), self.picks(single_quality))
+            self.assertTrue(self.picks(single_faces) or self.picks(single_quality))
+
+    def test_top_candidates_match_full_sort(self):
+        """測試只保留有限候選時挑選結果與保留全部相同（含同分）"""
+        rng = random.Random(7)
+        samples_per_sec = 4
+        capacity = candidate_capacity(3, 2.0, samples_per_sec)
+        for _ in range(50):
+            full = []
+            top = TopCandidates(capacity)
+            for index in range(rng.randint(0, 400)):
+                score = rng.choice([30, 40]) if rng.random() < 0.5 else rng.random()
+                frame_pos = index / samples_per_sec
+                full.append((score, index, None, frame_pos))
+                top.push(score, index, frame_pos)
+            full.sort(key=lambda x: x[0], reverse=True)
+            self.assertLessEqual(len(top), capacity)
+            self.assertEqual(
+                self.processor.pick_diverse_top_k(top.ranked(), k=3, time_threshold=2.0),
+                self.processor.pick_diverse_top_k(full, k=3, time_threshold=2.0)
+            )
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        patcher = patch.object(cv2, 'CascadeClassifier', FakeCascade, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.input_dir = os.path.join(self.temp_dir.name, 'input')
+        os.makedirs(self.input_dir)
+        write_video(os.path.join(self.input_dir, 'a.avi'), 120)
+        write_video(os.path.join(self.input_dir, 'b.avi'), 120, brightness=lambda i: 200)
+        noisy = np.random.default_rng(0).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(self.input_dir, 'c.jpg'), noisy)
+        # 先前輸出的封面與其他檔案不列入
+        cv2.imwrite(os.path.join(self.input_dir, 'a_top1.jpg'), noisy)
+        open(os.path.join(self.input_dir, 'notes.txt'), 'w').close()
+
+    def test_collect_inputs(self):
+        """測試展開目錄時只取支援的檔案並略過輸出的封面"""
+        names = [os.path.basename(p) for p in collect_inputs([self.input_dir])]
+        self.assertEqual(names, ['a.avi', 'b.avi', 'c.jpg'])
+
+    def test_batch_reuses_processor_and_writes_index(self):
+        """測試單一工作程序只建立一次偵測器，並寫出結果索引"""
+        output_dir = os.path.join(self.temp_dir.name, 'covers')
+        FakeCascade.instances = 0
+        results = process_batch([self.input_dir], output_dir, workers=1)
+        self.assertEqual(FakeCascade.instances, 1)
+        self.assertEqual([r['status'] for r in results], ['ok', 'ok', 'ok'])
+        self.assertEqual(results[0]['output'], os.path.join(output_dir, 'a_top1.jpg'))
+        self.assertEqual(results[1]['output'], os.path.join(output_dir, 'b_noface_top1.jpg'))
+        self.assertEqual(results[2]['output'], os.path.join(output_dir, 'c_cover.jpg'))
+
+        with open(os.path.join(output_dir, 'cover_index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.assertEqual(index['count'], 3)
+        self.assertEqual(index['succeeded'], 3)
+
+    def test_batch_dotted_video_names(self):
+        """測試檔名含點的影片輸出到同一目錄時不會互相覆蓋"""
+        input_dir = os.path.join(self.temp_dir.name, 'versions')
+        os.makedirs(input_dir)
+        for name in ('ad.v1.avi', 'ad.v2.avi'):
+            write_video(os.path.join(input_dir, name), 120)
+        output_dir = os.path.join(self.temp_dir.name, 'covers')
+        results = process_batch([input_dir], output_dir, workers=1)
+        self.assertEqual([r['output'] for r in results], [
+            os.path.join(output_dir, 'ad.v1_top1.jpg'),
+            os.path.join(output_dir, 'ad.v2_top1.jpg'),
+        ])
+
+    def test_batch_worker_pool(self):
+        """測試多程序批次的結果依輸入順序，失敗的檔案記錄錯誤"""
+        missing = os.path.join(self.input_dir, 'missing.mp4')
+        index_path = os.path.join(self.temp_dir.name, 'index.json')
+        results = process_batch([self.input_dir, missing], workers=2, index_path=index_path)
+        self.assertEqual([os.path.basename(r['input']) for r in results], ['a.avi', 'b.avi', 'c.jpg', 'missing.mp4'])
+        self.assertEqual([r['status'] for r in results], ['ok', 'ok', 'ok', 'failed'])
+        self.assertEqual(results[0]['output'], os.path.join(self.input_dir, 'a_top1.jpg'))
+        self.assertTrue(os.path.exists(index_path))
+
+if __name__ == '__main__':
+    unittest.main()
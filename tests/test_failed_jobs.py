@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import tempfile
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（replay 以模組名稱匯入 gemini_scheduler）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+from scripts import failed_jobs
+from scripts.failed_jobs import (
+    record_failure, mark_resolved, load_pending, import_legacy, replay, JOB_PERPLEXITY, JOB_TAGS
+)
+
+class TestFailedJobs(unittest.TestCase):
+    def setUp(self):
+        """每個測試寫入獨立的日誌"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, 'failed_jobs.jsonl')
+        patcher = patch.object(failed_jobs, 'JOURNAL_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resolved_jobs_not_pending(self):
+        """測試標記已解決的任務不再列出，相同任務合併為一筆"""
+        first = record_failure(JOB_PERPLEXITY, {"title": "A"}, RuntimeError("timeout"))
+        second = record_failure(JOB_PERPLEXITY, {"title": "A"}, RuntimeError("503"))
+        record_failure(JOB_TAGS, {"title": "B", "content": "內容"})
+
+        jobs = load_pending()
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(jobs[0].duplicate_ids, [second])
+        self.assertEqual(jobs[0].error, "503")
+        self.assertEqual([job.kind for job in load_pending([JOB_TAGS])], [JOB_TAGS])
+
+        mark_resolved([first, second], "<p>內容</p>")
+        self.assertEqual([job.payload['title'] for job in load_pending()], ["B"])
+
+    def test_concurrent_appends(self):
+        """測試多執行緒同時寫入時每行都是完整的 JSON"""
+        threads = [
+            threading.Thread(target=record_failure, args=(JOB_PERPLEXITY, {"title": f"影片 {i}" * 50}))
+            for i in range(20)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 20)
+        for line in lines:
+            json.loads(line)
+
+    def test_import_legacy(self):
+        """測試匯入舊版 failed_jobs.json 並依欄位判斷任務種類"""
+        legacy = os.path.join(self.temp_dir.name, 'failed_jobs.json')
+        with open(legacy, 'w', encoding='utf-8') as f:
+            json.dump([{"title": "A", "error": "x"}, {"title": "B", "content": "內容", "error": "y"}], f)
+        self.assertEqual(import_legacy(legacy), 2)
+        self.assertEqual({job.kind for job in load_pending()}, {JOB_PERPLEXITY, JOB_TAGS})
+        self.assertFalse(os.path.exists(legacy))
+
+    def test_replay(self):
+        """測試重新執行後成功的任務標記為已解決，失敗的保留"""
+        record_failure(JOB_PERPLEXITY, {"title": "成功"})
+        record_failure(JOB_PERPLEXITY, {"title": "失敗"})
+
+        def run(payload):
+            if payload['title'] == "失敗":
+                raise RuntimeError("still failing")
+            return "<p>內容</p>"
+
+        with patch.dict(failed_jobs.HANDLERS, {JOB_PERPLEXITY: lambda: run}):
+            counts = replay(workers=2)
+        self.assertEqual(counts, {'resolved': 1, 'failed': 1})
+        self.assertEqual([job.payload['title'] for job in load_pending()], ["失敗"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import gemini_scheduler
+from scripts.gemini_scheduler import QuotaScheduler, estimate_tokens
+
+class TestEstimateTokens(unittest.TestCase):
+    def test_scales_with_duration(self):
+        """測試 token 估計隨影片時長增加"""
+        self.assertGreater(estimate_tokens(600), estimate_tokens(60))
+
+    def test_unknown_duration_uses_default(self):
+        """測試未知時長使用預設秒數"""
+        self.assertEqual(estimate_tokens(None), estimate_tokens(gemini_scheduler.DEFAULT_VIDEO_DURATION))
+
+@patch.object(gemini_scheduler, 'WINDOW', 0.3)
+class TestQuotaScheduler(unittest.TestCase):
+    def test_rpm_limit(self):
+        """測試超過每分鐘請求數時等待視窗釋出"""
+        scheduler = QuotaScheduler(rpm=2, tpm=10**9, max_concurrent=10)
+        start = time.time()
+        for _ in range(3):
+            with scheduler.slot(1):
+                pass
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_tpm_limit(self):
+        """測試超過每分鐘 token 數時等待視窗釋出"""
+        scheduler = QuotaScheduler(rpm=100, tpm=1000, max_concurrent=10)
+        start = time.time()
+        with scheduler.slot(600):
+            pass
+        with scheduler.slot(600):
+            pass
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_within_quota_runs_immediately(self):
+        """測試配額內的請求不等待"""
+        scheduler = QuotaScheduler(rpm=10, tpm=10**6, max_concurrent=10)
+        start = time.time()
+        for _ in range(5):
+            with scheduler.slot(1000):
+                pass
+        self.assertLess(time.time() - start, 0.1)
+
+    def test_max_concurrent(self):
+        """測試同時進行中的請求數不超過上限"""
+        scheduler = QuotaScheduler(rpm=100, tpm=10**9, max_concurrent=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with scheduler.slot(1):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(max(peak), 2)
+
+if __name__ == '__main__':
+    unittest.main()
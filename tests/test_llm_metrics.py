@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import llm_metrics
+from scripts.llm_metrics import track_call, load_records, summarize, percentile, latency_percentile, OUTCOME_FAILED
+
+class TestLLMMetrics(unittest.TestCase):
+    def setUp(self):
+        """每個測試寫入獨立的紀錄檔"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, 'llm_metrics.jsonl')
+        patcher = patch.object(llm_metrics, 'METRICS_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_track_call_records_usage(self):
+        """測試記錄 token、嘗試次數與結果"""
+        with track_call('gemini', 'gemini-1.5-flash', video='abc') as metrics:
+            metrics.attempts = 2
+            metrics.add_usage(100, 20)
+            metrics.add_usage(100, None)
+        records = load_records(self.path)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['prompt_tokens'], 200)
+        self.assertEqual(records[0]['completion_tokens'], 20)
+        self.assertEqual(records[0]['attempts'], 2)
+        self.assertEqual(records[0]['outcome'], 'success')
+
+    def test_exception_recorded_as_error(self):
+        """測試區塊拋出例外時記為 error 並繼續拋出"""
+        with self.assertRaises(ValueError):
+            with track_call('openai', 'gpt-4.1-nano'):
+                raise ValueError("boom")
+        self.assertEqual(load_records(self.path)[0]['outcome'], 'error')
+
+    def test_summary(self):
+        """測試彙整每支影片的 token 與延遲百分位數"""
+        for video, tokens in (('a', 100), ('a', 50), ('b', 300)):
+            with track_call('perplexity', 'sonar', video=video) as metrics:
+                metrics.add_usage(tokens, 0)
+        with track_call('perplexity', 'sonar', video='c') as metrics:
+            metrics.outcome = OUTCOME_FAILED
+
+        summary = summarize(load_records(self.path))['perplexity/sonar']
+        self.assertEqual(summary['calls'], 4)
+        self.assertEqual(summary['success_rate'], 0.75)
+        self.assertEqual(summary['videos'], 3)
+        self.assertEqual(summary['p50_tokens_per_video'], 150)
+        self.assertEqual(summary['p95_tokens_per_video'], 300)
+
+    def test_percentile(self):
+        """測試最近排名法百分位數"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_latency_percentile(self):
+        """測試只以一次就成功的呼叫計算延遲百分位數"""
+        self.assertIsNone(latency_percentile('perplexity', 'sonar', 90))
+        records = [{'service': 'perplexity', 'model': 'sonar', 'outcome': 'success', 'attempts': 1, 'latency': i}
+                   for i in range(1, 11)]
+        records.append({'service': 'perplexity', 'model': 'sonar', 'outcome': 'success', 'attempts': 3, 'latency': 500})
+        with patch.object(llm_metrics, 'load_records', return_value=records):
+            self.assertEqual(latency_percentile('perplexity', 'sonar', 90), 9)
+            self.assertIsNone(latency_percentile('perplexity', 'sonar', 90, min_samples=20))
+
+if __name__ == '__main__':
+    unittest.main()
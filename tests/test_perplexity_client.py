@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import tempfile
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（perplexity_client 以模組名稱匯入其他模組）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import llm_metrics
+import result_cache
+import failed_jobs
+from scripts import perplexity_client
+from scripts.perplexity_client import PerplexityClient, HedgeBudget, normalize_title
+
+def make_response(content, status_code=200):
+    """建立模擬的 Perplexity API 回應"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": 900, "completion_tokens": 300}
+    }
+    return response
+
+class TestPerplexityClient(unittest.TestCase):
+    def setUp(self):
+        """使用獨立的快取、呼叫紀錄與失敗任務日誌"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        for patcher in (
+            patch.dict(os.environ, {'PERPLEXITY_API_KEY': 'test'}),
+            patch.object(result_cache, 'CACHE_DIR', self.temp_dir.name),
+            patch.object(llm_metrics, 'METRICS_PATH', os.path.join(self.temp_dir.name, 'llm_metrics.jsonl')),
+            patch.object(failed_jobs, 'JOURNAL_PATH', os.path.join(self.temp_dir.name, 'failed_jobs.jsonl')),
+            patch('time.sleep'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        post_patcher = patch.object(perplexity_client.requests, 'post')
+        self.post = post_patcher.start()
+        self.addCleanup(post_patcher.stop)
+        # 對沖時每個請求使用各自的 Session，同樣轉給 self.post
+        self.sessions = []
+        session_patcher = patch.object(perplexity_client.requests, 'Session', side_effect=self._session)
+        session_patcher.start()
+        self.addCleanup(session_patcher.stop)
+
+    def _session(self):
+        session = MagicMock()
+        session.post = self.post
+        self.sessions.append(session)
+        return session
+
+    def test_normalize_title(self):
+        """測試全形字元、空白與大小寫不影響快取鍵"""
+        self.assertEqual(normalize_title(" ＡＢＣ  廣告\n"), normalize_title("abc 廣告"))
+
+    def test_search_cached(self):
+        """測試相同標題重新搜尋時使用快取，並保存原始與古騰堡格式"""
+        self.post.return_value = make_response("第一段\n\n第二段")
+        first = PerplexityClient().search("Nike 廣告")
+        self.assertIn("<!-- wp:paragraph -->", first)
+
+        client = PerplexityClient()
+        self.assertEqual(client.search("nike  廣告"), first)
+        self.assertEqual(self.post.call_count, 1)
+        cached = client.cache.get(client._cache_key("Nike 廣告"))
+        self.assertEqual(cached['raw'], "第一段\n\n第二段")
+
+        PerplexityClient(bypass_cache=True).search("Nike 廣告")
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_failure_not_cached(self):
+        """測試重試用盡時不寫入快取並記錄失敗任務"""
+        self.post.return_value = make_response("", status_code=500)
+        self.assertIsNone(PerplexityClient().search("標題"))
+        self.assertEqual(self.post.call_count, 5)
+        self.assertEqual(len(failed_jobs.load_pending()), 1)
+
+        # 重新執行失敗任務時不再寫入日誌
+        self.assertIsNone(PerplexityClient().search("標題", journal_failures=False))
+        self.assertEqual(len(failed_jobs.load_pending()), 1)
+
+        self.post.return_value = make_response("內容")
+        self.assertIn("內容", PerplexityClient().search("標題"))
+
+    def _slow_first(self, delay):
+        """第一個請求延遲 delay 秒，之後的請求立即返回"""
+        calls = []
+
+        def post(*args, **kwargs):
+            calls.append(time.time())
+            if len(calls) == 1:
+                # time.sleep 已被替換，以 Event 等待模擬慢速回應
+                threading.Event().wait(delay)
+                return make_response("慢")
+            return make_response("快")
+        self.post.side_effect = post
+        return calls
+
+    def test_hedge_takes_faster_response(self):
+        """測試第一個請求超過等待時間時送出對沖請求並採用先返回的結果"""
+        calls = self._slow_first(1.0)
+        with patch.object(perplexity_client, '_hedge_budget', HedgeBudget(1)):
+            client = PerplexityClient(hedge=True)
+            client.hedge_delay = 0.05
+            start = time.time()
+            result = client.search("標題")
+        self.assertIn("快", result)
+        self.assertEqual(len(calls), 2)
+        self.assertLess(time.time() - start, 0.8)
+        record = llm_metrics.load_records()[0]
+        self.assertEqual(record['hedged'], 1)
+        # 較慢的請求被捨棄，兩個請求的 Session 都已關閉
+        self.assertEqual(record['hedge_abandoned'], 1)
+        self.assertEqual(len(self.sessions), 2)
+        for session in self.sessions:
+            session.close.assert_called_once()
+
+    def test_hedge_budget_exhausted(self):
+        """測試對沖額度用完時只等待原本的請求"""
+        calls = self._slow_first(0.2)
+        with patch.object(perplexity_client, '_hedge_budget', HedgeBudget(0)):
+            client = PerplexityClient(hedge=True)
+            client.hedge_delay = 0.05
+            self.assertIn("慢", client.search("標題"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(llm_metrics.load_records()[0]['hedge_abandoned'], 0)
+        self.sessions[0].close.assert_called_once()
+
+    def test_hedge_delay_from_metrics(self):
+        """測試等待時間取自呼叫紀錄的 p90 延遲，紀錄不足時使用預設值"""
+        self.assertEqual(PerplexityClient(hedge=True).hedge_delay, perplexity_client.HEDGE_DEFAULT_DELAY)
+        with patch.object(perplexity_client, 'latency_percentile', return_value=7.5) as mock_percentile:
+            self.assertEqual(PerplexityClient(hedge=True).hedge_delay, 7.5)
+        mock_percentile.assert_called_once_with('perplexity', perplexity_client.MODEL, 90)
+
+if __name__ == '__main__':
+    unittest.main()
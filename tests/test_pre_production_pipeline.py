@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（pre_production_pipeline 以模組名稱匯入其他模組）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import tag_matcher
+import result_cache
+import perplexity_client
+import pre_production_pipeline
+from pre_production_pipeline import process_one_row
+
+class TestProcessOneRow(unittest.TestCase):
+    def setUp(self):
+        """以模擬的探測、下載、Perplexity 與 WordPress 執行單筆資料"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.video_info = MagicMock(id='abc123', title='標題', formatted_duration='1:00',
+                                    thumbnail='https://example.com/thumb.jpg', duration=60)
+        self.client = MagicMock()
+        self.client.return_value.search.return_value = '內容'
+        for patcher in (
+            patch.dict(os.environ, {'OPENAI_API_KEY': 'test'}),
+            patch.object(tag_matcher, 'TAXONOMY_DIR', os.path.join(self.temp_dir.name, 'taxonomy')),
+            patch.object(result_cache, 'CACHE_DIR', os.path.join(self.temp_dir.name, 'cache')),
+            patch.object(pre_production_pipeline, 'ENABLE_GEMINI', False),
+            patch.object(pre_production_pipeline, 'probe_video', return_value=self.video_info),
+            patch.object(pre_production_pipeline, 'download_and_convert', return_value='abc123.mp4'),
+            patch.object(perplexity_client, 'PerplexityClient', self.client),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.wp = MagicMock()
+        self.wp.site_url = 'https://example.com'
+        self.wp.upload_thumbnail.return_value = 77
+        self.wp.create_draft.return_value = {'id': 5}
+
+    def run_row(self):
+        updates = []
+        process_one_row(2, 'https://youtu.be/abc123', '100', MagicMock(), updates, self.temp_dir.name, self.wp)
+        return {update['range']: update['values'][0][0] for update in updates}
+
+    def test_empty_taxonomy_still_creates_draft(self):
+        """測試沒有詞彙檔時略過標籤生成，草稿只使用 featured 標籤"""
+        cells = self.run_row()
+        self.assertEqual(cells['K2'], 'done')
+        self.assertEqual(cells['I2'], '5')
+        kwargs = self.wp.create_draft.call_args.kwargs
+        self.assertEqual(kwargs['video_tag'], [136])
+        self.assertEqual(kwargs['featured_media'], 77)
+        self.wp.convert_tags_to_ids.assert_not_called()
+
+    def test_failed_row_deletes_uploaded_thumbnail(self):
+        """測試之後的步驟失敗而沒有建立草稿時刪除已上傳的縮圖"""
+        self.client.return_value.search.side_effect = RuntimeError("perplexity down")
+        with self.assertRaises(RuntimeError):
+            self.run_row()
+        self.wp.create_draft.assert_not_called()
+        self.wp.delete_media.assert_called_once_with(77)
+
+    def test_thumbnail_failure_is_not_retried_by_draft(self):
+        """測試縮圖上傳失敗時草稿不設特色圖片，也不在建立草稿時重新上傳"""
+        self.wp.upload_thumbnail.side_effect = RuntimeError("upload failed")
+        cells = self.run_row()
+        self.assertEqual(cells['K2'], 'done')
+        kwargs = self.wp.create_draft.call_args.kwargs
+        self.assertIsNone(kwargs['featured_media'])
+        self.assertFalse(kwargs['upload_thumbnail'])
+        self.wp.delete_media.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
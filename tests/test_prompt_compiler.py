@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import prompt_compiler
+from scripts.prompt_compiler import get_prompt, count_tokens
+
+class TestPromptCompiler(unittest.TestCase):
+    def setUp(self):
+        """每個測試使用複製的提示詞目錄與空的編譯快取"""
+        self.temp_dir = tempfile.mkdtemp()
+        shutil.copytree(prompt_compiler.PROMPTS_DIR, os.path.join(self.temp_dir, 'prompts'))
+        patcher = patch.object(prompt_compiler, 'PROMPTS_DIR', os.path.join(self.temp_dir, 'prompts'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        prompt_compiler._compiled.clear()
+        self.addCleanup(prompt_compiler._compiled.clear)
+
+    def test_render_parameters(self):
+        """測試代入參數，參數值中的大括號不再被解析"""
+        prompt = get_prompt('perplexity/content_generation')
+        self.assertEqual(prompt.parameters, ('title',))
+        rendered = prompt.render(title='標題 {video_info}')
+        self.assertIn('標題 {video_info}', rendered)
+        self.assertNotIn('{title}', rendered)
+
+    def test_render_only_substitutes_intro(self):
+        """測試只替換開場白中的參數，規則中的 {title} 文字保持原樣"""
+        path = prompt_compiler.prompt_path('perplexity/content_generation')
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config['rules']['writing_style']['items'].append('不要在內文重複 {title} 這類佔位文字')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+
+        prompt = get_prompt('perplexity/content_generation')
+        self.assertEqual(prompt.parameters, ('title',))
+        rendered = prompt.render(title='影片標題')
+        self.assertIn('影片標題', rendered)
+        self.assertIn('不要在內文重複 {title} 這類佔位文字', rendered)
+        self.assertTrue(rendered.startswith(config['intro']['content'].format(title='影片標題')))
+
+    def test_missing_parameter(self):
+        """測試缺少參數時拋出例外"""
+        with self.assertRaises(KeyError):
+            get_prompt('gemini/video_analysis').render(video_type='YouTube')
+
+    def test_openai_matches_formatted_prompt(self):
+        """測試 openai 系統提示詞與 formatted_prompt.txt 逐位元組相同"""
+        path = os.path.join(prompt_compiler.PROMPTS_DIR, 'openai', 'formatted_prompt.txt')
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = f.read()
+        self.assertEqual(get_prompt('openai/system_prompt').template, expected)
+
+    def test_cached_until_file_changes(self):
+        """測試編譯結果在檔案修改前重複使用，修改後更新版本"""
+        first = get_prompt('gemini/video_analysis')
+        self.assertIs(get_prompt('gemini/video_analysis'), first)
+
+        path = prompt_compiler.prompt_path('gemini/video_analysis')
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config['rules']['writing_style']['items'].append('新增的規則')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        os.utime(path, (first.mtime + 10, first.mtime + 10))
+
+        second = get_prompt('gemini/video_analysis')
+        self.assertNotEqual(second.version, first.version)
+        self.assertIn('新增的規則', second.template)
+        self.assertGreater(second.token_count, first.token_count)
+
+    def test_version_ignores_json_formatting(self):
+        """測試只改變 JSON 排版時版本不變"""
+        first = get_prompt('gemini/video_analysis')
+        path = prompt_compiler.prompt_path('gemini/video_analysis')
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=8)
+        os.utime(path, (first.mtime + 10, first.mtime + 10))
+        self.assertEqual(get_prompt('gemini/video_analysis').version, first.version)
+
+    def test_count_tokens(self):
+        """測試 token 數隨文字增加"""
+        self.assertGreater(count_tokens('影片內容描述' * 10), count_tokens('影片'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import result_cache
+from scripts.result_cache import ResultCache
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        """每個測試使用獨立的快取目錄"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        patcher = patch.object(result_cache, 'CACHE_DIR', self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_set(self):
+        """測試寫入後讀取，bypass 時不讀取"""
+        cache = ResultCache('test')
+        cache.set('a', {'raw': '內容'})
+        self.assertEqual(cache.get('a'), {'raw': '內容'})
+        self.assertIsNone(ResultCache('test', bypass=True).get('a'))
+
+    def test_ttl(self):
+        """測試過期項目不再返回"""
+        cache = ResultCache('test', ttl=10)
+        cache.set('a', 1)
+        with patch.object(result_cache.time, 'time', return_value=result_cache.time.time() + 20):
+            self.assertIsNone(cache.get('a'))
+
+    def test_max_entries(self):
+        """測試超過筆數上限時淘汰最久未使用的項目"""
+        cache = ResultCache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_max_bytes(self):
+        """測試超過大小上限時淘汰最久未使用的項目，大小以 UTF-8 位元組計算"""
+        value = '影' * 100  # JSON 後約 302 位元組
+        cache = ResultCache('test', max_bytes=700)
+        cache.set('a', value)
+        cache.set('b', value)
+        cache.get('a')
+        cache.set('c', value)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), value)
+        self.assertEqual(cache.get('c'), value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.retry_policy import (
+    RetryPolicy, RetryExhausted, classify_error, retry_after, is_video_unavailable,
+    ERROR_QUOTA, ERROR_TRANSIENT, ERROR_PERMANENT
+)
+
+class FakeAPIError(Exception):
+    """模擬 google.genai 的 APIError（code、status、details）"""
+    def __init__(self, code, status, details=None):
+        super().__init__(f"{code} {status}. {details}")
+        self.code = code
+        self.status = status
+        self.details = details
+
+class TestClassifyError(unittest.TestCase):
+    def test_quota(self):
+        """測試 429 與 RESOURCE_EXHAUSTED 歸類為 quota"""
+        self.assertEqual(classify_error(FakeAPIError(429, 'RESOURCE_EXHAUSTED')), ERROR_QUOTA)
+
+    def test_transient(self):
+        """測試 5xx 與逾時歸類為 transient"""
+        self.assertEqual(classify_error(FakeAPIError(503, 'UNAVAILABLE')), ERROR_TRANSIENT)
+        self.assertEqual(classify_error(TimeoutError("read timed out")), ERROR_TRANSIENT)
+
+    def test_permanent(self):
+        """測試參數錯誤與私人影片歸類為 permanent"""
+        self.assertEqual(classify_error(FakeAPIError(400, 'INVALID_ARGUMENT')), ERROR_PERMANENT)
+        self.assertEqual(classify_error(RuntimeError("ERROR: Private video")), ERROR_PERMANENT)
+
+    def test_missing_file(self):
+        """測試本機檔案不存在歸類為 permanent，不重試"""
+        error = FileNotFoundError(2, "No such file or directory", "/tmp/missing.mp4")
+        self.assertEqual(classify_error(error), ERROR_PERMANENT)
+        self.assertEqual(classify_error(FileNotFoundError("timeout.mp4")), ERROR_PERMANENT)
+
+    def test_video_unavailable(self):
+        """測試區分單一影片無法存取與其他 permanent 錯誤"""
+        self.assertTrue(is_video_unavailable(RuntimeError("ERROR: [youtube] abc: Private video")))
+        self.assertTrue(is_video_unavailable("下載或分析 YouTube 影片時發生錯誤: Video unavailable"))
+        self.assertFalse(is_video_unavailable(FakeAPIError(400, 'INVALID_ARGUMENT')))
+
+    def test_retry_hint(self):
+        """測試讀取 RetryInfo 的 retryDelay"""
+        details = {'error': {'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '37s'}]}}
+        self.assertEqual(retry_after(FakeAPIError(429, 'RESOURCE_EXHAUSTED', details)), 37.0)
+        self.assertIsNone(retry_after(FakeAPIError(503, 'UNAVAILABLE')))
+
+class TestRetryPolicy(unittest.TestCase):
+    @patch('scripts.retry_policy.time.sleep')
+    def test_permanent_stops_immediately(self, mock_sleep):
+        """測試 permanent 錯誤不重試"""
+        func = MagicMock(side_effect=FakeAPIError(400, 'INVALID_ARGUMENT'))
+        with self.assertRaises(RetryExhausted) as ctx:
+            RetryPolicy(max_attempts=5).call(func)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(ctx.exception.error_class, ERROR_PERMANENT)
+        mock_sleep.assert_not_called()
+
+    @patch('scripts.retry_policy.time.sleep')
+    def test_transient_then_success(self, mock_sleep):
+        """測試 transient 錯誤重試後成功"""
+        func = MagicMock(side_effect=[FakeAPIError(503, 'UNAVAILABLE'), 'ok'])
+        self.assertEqual(RetryPolicy(max_attempts=3).call(func), 'ok')
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @patch('scripts.retry_policy.time.sleep')
+    def test_quota_honours_server_hint(self, mock_sleep):
+        """測試 quota 錯誤依伺服器提示的時間等待"""
+        error = FakeAPIError(429, 'RESOURCE_EXHAUSTED', {'retryDelay': '20s'})
+        func = MagicMock(side_effect=[error, 'ok'])
+        RetryPolicy(max_attempts=3).call(func)
+        self.assertGreaterEqual(mock_sleep.call_args[0][0], 20)
+
+    @patch('scripts.retry_policy.time.sleep')
+    def test_server_hint_above_max_delay(self, mock_sleep):
+        """測試伺服器提示超過 max_delay 時仍完整等待，超過剩餘額度時放棄而不提早重試"""
+        error = FakeAPIError(429, 'RESOURCE_EXHAUSTED', {'retryDelay': '120s'})
+        func = MagicMock(side_effect=[error, 'ok'])
+        RetryPolicy(max_attempts=3, max_delay=90, max_total_wait=300).call(func)
+        self.assertGreaterEqual(mock_sleep.call_args[0][0], 120)
+
+        mock_sleep.reset_mock()
+        func = MagicMock(side_effect=[error, 'ok'])
+        with self.assertRaises(RetryExhausted) as ctx:
+            RetryPolicy(max_attempts=3, max_delay=90, max_total_wait=100).call(func)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(ctx.exception.error_class, ERROR_QUOTA)
+        mock_sleep.assert_not_called()
+
+    @patch('scripts.retry_policy.time.sleep')
+    def test_total_wait_is_bounded(self, mock_sleep):
+        """測試累計等待不超過上限"""
+        func = MagicMock(side_effect=FakeAPIError(503, 'UNAVAILABLE'))
+        policy = RetryPolicy(max_attempts=50, base_delay=10, max_delay=40, max_total_wait=100)
+        with self.assertRaises(RetryExhausted) as ctx:
+            policy.call(func)
+        self.assertLessEqual(sum(c[0][0] for c in mock_sleep.call_args_list), 100)
+        self.assertLessEqual(ctx.exception.waited, 100)
+        self.assertLess(func.call_count, 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+import threading
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（strategy_selector 以模組名稱匯入 result_cache）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import result_cache
+from scripts.strategy_selector import StrategySelector, FAILURE_STREAK, STATS_WINDOW
+
+class TestStrategySelector(unittest.TestCase):
+    def setUp(self):
+        """每個測試使用獨立的統計資料目錄"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = patch.object(result_cache, 'CACHE_DIR', self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+        self.selector = StrategySelector('test_stats', {'file': 60, 'youtube': 90, 'download': 240})
+
+    def test_default_order_without_history(self):
+        """測試沒有紀錄時依預設耗時排序"""
+        self.assertEqual(self.selector.order(['youtube', 'download', 'file']), ['file', 'youtube', 'download'])
+
+    def test_faster_reliable_strategy_moves_first(self):
+        """測試較快且穩定的策略排到前面"""
+        for _ in range(5):
+            self.selector.record('youtube', True, 10)
+            self.selector.record('file', True, 120)
+        self.assertEqual(self.selector.order(['file', 'youtube']), ['youtube', 'file'])
+
+    def test_failing_strategy_is_skipped(self):
+        """測試連續失敗的策略暫時略過"""
+        for _ in range(FAILURE_STREAK):
+            self.selector.record('youtube', False, 5)
+        self.assertTrue(self.selector.stats('youtube')['suspended'])
+        self.assertEqual(self.selector.order(['youtube', 'download']), ['download'])
+
+    def test_never_skips_all_strategies(self):
+        """測試全部暫停時仍保留一個策略"""
+        for _ in range(FAILURE_STREAK):
+            self.selector.record('youtube', False, 5)
+        self.assertEqual(self.selector.order(['youtube']), ['youtube'])
+
+    def test_video_specific_failures_do_not_suspend(self):
+        """測試單一影片無法存取的失敗不計入連續失敗"""
+        for _ in range(FAILURE_STREAK):
+            self.selector.record('youtube', False, 5, video_specific=True)
+        self.assertFalse(self.selector.stats('youtube')['suspended'])
+        self.selector.record('youtube', False, 5)
+        self.assertFalse(self.selector.stats('youtube')['suspended'])
+
+    def test_concurrent_records_from_separate_instances(self):
+        """測試多個實例同時記錄不會遺失紀錄，且只保留統計期間內的筆數"""
+        def worker():
+            selector = StrategySelector('test_stats')
+            for _ in range(STATS_WINDOW // 4):
+                selector.record('file', True, 1)
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.selector.stats('file')['attempts'], STATS_WINDOW)
+
+        self.selector.record('file', False, 1)
+        stats = self.selector.stats('file')
+        self.assertEqual(stats['attempts'], STATS_WINDOW)
+        self.assertEqual(stats['success_rate'], round(STATS_WINDOW / (STATS_WINDOW + 2), 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.tag_matcher import TagMatcher, Term, AhoCorasick, surface_forms, refresh_taxonomy, KIND_CATEGORIES
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_patterns(self):
+        """測試重疊與互為後綴的模式都能找到"""
+        automaton = AhoCorasick()
+        for pattern in ('he', 'she', 'his', 'hers'):
+            automaton.add(pattern)
+        found = sorted((end, automaton.pattern(pid)) for end, pid in automaton.search('ushers'))
+        self.assertEqual(found, [(4, 'he'), (4, 'she'), (6, 'hers')])
+
+class TestTagMatcher(unittest.TestCase):
+    def test_surface_forms(self):
+        """測試產生去除標注的基本名稱與括號內的原文、英文名稱"""
+        forms = surface_forms('名偵探柯南（名探偵コナン / Detective Conan）')
+        self.assertIn('名偵探柯南', forms)
+        self.assertIn('名探偵コナン', forms)
+        self.assertIn('detective conan', forms)
+
+    def test_match_variants(self):
+        """測試內容只出現基本名稱或英文名稱時比對到完整標籤"""
+        matcher = TagMatcher([
+            Term(1, '麥當勞（McDonald\'s）', 'tags'),
+            Term(2, '《傲慢與偏見》（Pride and Prejudice）', 'tags'),
+            Term(3, '日本', 'tags'),
+        ])
+        names = [term.name for term in matcher.match('PRIDE AND PREJUDICE 改編', '麥當勞的新廣告')]
+        self.assertEqual(names, ['《傲慢與偏見》（Pride and Prejudice）', '麥當勞（McDonald\'s）'])
+
+    def test_word_boundary(self):
+        """測試拉丁字母詞彙需完整單字才算比對到"""
+        matcher = TagMatcher([Term(1, 'Art', 'tags')])
+        self.assertEqual(matcher.match('Start the engine'), [])
+        self.assertEqual(len(matcher.match('Street art 展覽')), 1)
+
+    def test_from_files(self):
+        """測試從詞彙 JSON 檔載入並依檔名區分標籤與分類"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'categories.json'), 'w', encoding='utf-8') as f:
+                json.dump([{"id": 7, "name": "廣告"}, {"id": None, "name": "動畫"}, {"id": 8}], f, ensure_ascii=False)
+            with open(os.path.join(temp_dir, 'tags.json'), 'w', encoding='utf-8') as f:
+                json.dump([{"id": 9, "name": "Ben &amp; Jerry&#039;s"}], f)
+            matcher = TagMatcher.from_directory(temp_dir)
+
+        self.assertEqual(len(matcher), 3)
+        matched = matcher.match("Ben & Jerry's 的動畫廣告")
+        self.assertEqual([term.id for term in matched], [9, None, 7])
+        self.assertEqual(matched[2].kind, KIND_CATEGORIES)
+
+    def test_refresh_taxonomy(self):
+        """測試從 WordPress 匯出詞彙檔，回傳空結果的分類法保留原本的檔案"""
+        terms = {'tags': [{"id": 1, "name": "日本"}], 'categories': []}
+        manager = MagicMock()
+        manager.return_value.get_all_terms.side_effect = lambda kind: terms[kind]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'categories.json'), 'w', encoding='utf-8') as f:
+                json.dump([{"id": 7, "name": "廣告"}], f, ensure_ascii=False)
+            with patch.dict(sys.modules, {'wordpress_taxonomy_manager': MagicMock(WordPressTaxonomyManager=manager)}):
+                counts = refresh_taxonomy(temp_dir)
+            matcher = TagMatcher.from_directory(temp_dir)
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['categories.json', 'tags.json'])
+
+        self.assertEqual(counts, {'tags': 1, 'categories': 0})
+        self.assertEqual([term.name for term in matcher.match('日本的廣告')], ['日本', '廣告'])
+
+if __name__ == '__main__':
+    unittest.main()
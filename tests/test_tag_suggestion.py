@@ -0,0 +1,184 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（tag_suggestion 以模組名稱匯入 llm_metrics）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import llm_metrics
+import tag_matcher
+import result_cache
+import failed_jobs
+from scripts import tag_suggestion
+from scripts.tag_suggestion import TagSuggester
+
+TAGS = {
+    "existing_tags": {"tags": {"人": {"名人": ["馬修·麥康納"]}}, "categories": {"類型": ["廣告"]}},
+    "new_tag_suggestions": {"tags": {}, "categories": {}, "reasoning": {}}
+}
+
+def make_batch_response(results):
+    """建立模擬的批次回應"""
+    return make_response(json.dumps({"results": results}, ensure_ascii=False), name="suggest_tags_batch")
+
+def make_response(arguments, name="suggest_tags"):
+    """建立模擬的 Chat Completions 回應"""
+    tool_call = MagicMock()
+    tool_call.function.name = name
+    tool_call.function.arguments = arguments
+    response = MagicMock()
+    response.choices[0].message.tool_calls = [tool_call]
+    response.usage.prompt_tokens = 1200
+    response.usage.completion_tokens = 80
+    return response
+
+class TestTagSuggester(unittest.TestCase):
+    def setUp(self):
+        """使用模擬的 OpenAI 客戶端與獨立的呼叫紀錄檔"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.metrics_path = os.path.join(self.temp_dir.name, 'llm_metrics.jsonl')
+        for patcher in (
+            patch.object(llm_metrics, 'METRICS_PATH', self.metrics_path),
+            patch.object(tag_matcher, 'TAXONOMY_DIR', self.temp_dir.name),
+            patch.object(result_cache, 'CACHE_DIR', os.path.join(self.temp_dir.name, 'cache')),
+            patch.object(failed_jobs, 'JOURNAL_PATH', os.path.join(self.temp_dir.name, 'failed_jobs.jsonl')),
+            patch.dict(os.environ, {'OPENAI_API_KEY': 'test'}),
+            patch.object(tag_suggestion, 'OpenAI'),
+            patch.object(tag_suggestion.time, 'sleep'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # 提示詞中的標籤列表來自詞彙檔
+        self.write_taxonomy('tags.json', [{"id": 1, "name": "麥當勞（McDonald's）"}, {"id": 2, "name": "德州"}])
+        self.write_taxonomy('categories.json', [{"id": 3, "name": "廣告"}])
+        self.suggester = TagSuggester()
+        self.create = self.suggester.client.chat.completions.create
+
+    def write_taxonomy(self, filename, terms):
+        with open(os.path.join(self.temp_dir.name, filename), 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+    def test_single_request(self):
+        """測試只送出一次請求並直接解析函式參數"""
+        self.create.return_value = make_response(json.dumps(TAGS, ensure_ascii=False))
+        result = self.suggester.suggest_tags("標題", "內容")
+
+        self.assertEqual(result, TAGS)
+        self.assertEqual(self.create.call_count, 1)
+        kwargs = self.create.call_args.kwargs
+        self.assertEqual(kwargs['model'], tag_suggestion.MODEL)
+        self.assertEqual(kwargs['tools'][0]['function']['name'], 'suggest_tags')
+        self.assertEqual(kwargs['tool_choice']['function']['name'], 'suggest_tags')
+        self.assertTrue(kwargs['messages'][1]['content'].startswith("標題：標題\n內容：內容\n\n標籤列表"))
+
+        record = llm_metrics.load_records(self.metrics_path)[0]
+        self.assertEqual(record['prompt_tokens'], 1200)
+        self.assertEqual(record['attempts'], 1)
+
+    def test_candidate_tags_in_prompt(self):
+        """測試提示詞只列出內容中出現的現有標籤"""
+        user_content = self.suggester._build_messages("McDonald's 新廣告", "速食店的廣告")[1]['content']
+        self.assertIn("- 麥當勞（McDonald's）", user_content)
+        self.assertIn("- 廣告", user_content)
+        self.assertNotIn("德州", user_content)
+
+    def test_missing_taxonomy_skips_request(self):
+        """測試沒有詞彙檔時不送出請求，避免提示詞引用不存在的標籤列表"""
+        for name in ('tags.json', 'categories.json'):
+            os.remove(os.path.join(self.temp_dir.name, name))
+        suggester = TagSuggester()
+        self.assertFalse(suggester.has_taxonomy)
+        self.assertIsNone(suggester.suggest_tags("標題", "內容"))
+        self.assertEqual(suggester.suggest_tags_batch([("標題", "內容"), ("標題二", "內容")]), [None, None])
+        suggester.client.chat.completions.create.assert_not_called()
+
+    def test_retry_on_invalid_result(self):
+        """測試結果僅有 ['video'] 時重試"""
+        self.create.side_effect = [
+            make_response(json.dumps({"existing_tags": {"tags": {"general": ["video"]}}})),
+            make_response(json.dumps(TAGS, ensure_ascii=False)),
+        ]
+        self.assertEqual(self.suggester.suggest_tags("標題", "內容"), TAGS)
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_cached_result_skips_request(self):
+        """測試相同標題與內容重新執行時使用快取"""
+        self.create.return_value = make_response(json.dumps(TAGS, ensure_ascii=False))
+        self.suggester.suggest_tags("標題", "內容")
+        self.assertEqual(TagSuggester().suggest_tags("標題", "內容"), TAGS)
+        self.assertEqual(self.create.call_count, 1)
+
+        # 內容改變或略過快取時重新生成
+        self.suggester.suggest_tags("標題", "新的內容")
+        TagSuggester(bypass_cache=True).suggest_tags("標題", "內容")
+        self.assertEqual(self.create.call_count, 3)
+
+    def test_fallback_after_retries(self):
+        """測試重試用盡後回傳預設標籤並記錄失敗任務"""
+        self.create.side_effect = RuntimeError("server error")
+        result = self.suggester.suggest_tags("標題", "內容")
+
+        self.assertEqual(result, {"existing_tags": {"tags": {"general": ["video"]}}})
+        self.assertEqual(self.create.call_count, 5)
+        jobs = failed_jobs.load_pending()
+        self.assertEqual([(job.kind, job.payload['title']) for job in jobs], [(failed_jobs.JOB_TAGS, "標題")])
+        self.assertEqual(llm_metrics.load_records(self.metrics_path)[0]['outcome'], 'failed')
+
+        # 重新執行失敗任務時不再寫入日誌
+        self.suggester.suggest_tags("標題", "內容", journal_failures=False)
+        self.assertEqual(len(failed_jobs.load_pending()), 1)
+
+        # 預設標籤不寫入快取，下次仍會重新請求
+        self.create.side_effect = None
+        self.create.return_value = make_response(json.dumps(TAGS, ensure_ascii=False))
+        self.assertEqual(self.suggester.suggest_tags("標題", "內容"), TAGS)
+
+class TestTagSuggesterBatch(unittest.TestCase):
+    setUp = TestTagSuggester.setUp
+    write_taxonomy = TestTagSuggester.write_taxonomy
+
+    def test_batch_tool_schema(self):
+        """測試批次函式定義包含 index 與單支影片的所有欄位"""
+        item = self.suggester.batch_tool['function']['parameters']['properties']['results']['items']
+        self.assertEqual(item['required'], ['index', 'existing_tags', 'new_tag_suggestions'])
+        self.assertIn('new_tag_suggestions', item['properties'])
+
+    def test_batch_splits_results(self):
+        """測試一次請求生成多支影片的標籤並依順序拆回"""
+        other = {"existing_tags": {"tags": {"地": {"國家": ["日本"]}}}, "new_tag_suggestions": {}}
+        self.create.return_value = make_batch_response([dict(other, index=2), dict(TAGS, index=1)])
+        results = self.suggester.suggest_tags_batch([("標題一", "內容一"), ("標題二", "內容二")])
+
+        self.assertEqual(results, [TAGS, other])
+        self.assertEqual(self.create.call_count, 1)
+        self.assertIn("### 影片 2", self.create.call_args.kwargs['messages'][1]['content'])
+        # 結果寫入快取，個別呼叫時不再請求
+        self.assertEqual(self.suggester.suggest_tags("標題二", "內容二"), other)
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_invalid_items_retried_individually(self):
+        """測試缺少或未通過驗證的影片改以單支請求重試"""
+        invalid = {"index": 2, "existing_tags": {"tags": {"general": ["video"]}}}
+        self.create.side_effect = [
+            make_batch_response([dict(TAGS, index=1), invalid]),
+            make_response(json.dumps(TAGS, ensure_ascii=False)),
+            make_response(json.dumps(TAGS, ensure_ascii=False)),
+        ]
+        results = self.suggester.suggest_tags_batch([("一", "a"), ("二", "b"), ("三", "c")])
+
+        self.assertEqual(results, [TAGS, TAGS, TAGS])
+        self.assertEqual(self.create.call_count, 3)
+        retried = [c.kwargs['messages'][1]['content'].split("\n\n")[0] for c in self.create.call_args_list[1:]]
+        self.assertEqual(retried, ["標題：二\n內容：b", "標題：三\n內容：c"])
+
+if __name__ == '__main__':
+    unittest.main()
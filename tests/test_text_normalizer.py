@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import re
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄到 Python 路徑
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.text_normalizer import (
+    add_cjk_spacing, normalize_llm_text, format_subtitle_line, remove_phrases,
+    clean_lines, split_paragraphs, to_gutenberg, get_converter
+)
+
+# 原本逐次取代的實作，用來確認輸出不變
+def legacy_add_spaces(text):
+    text = re.sub(r'([一-鿿])([a-zA-Z0-9])', r'\1 \2', text)
+    return re.sub(r'([a-zA-Z0-9])([一-鿿])', r'\1 \2', text)
+
+def legacy_subtitle_line(line):
+    line = line.replace(r'\N', '__NEWLINE__')
+    line = line.replace('……', '⋯⋯')
+    for punct in ['-', '=', '+', '*', '/', '\\']:
+        line = re.sub(re.escape(punct), f' {punct} ', line)
+    for pattern in (r'([一-鿿])([a-zA-Z])', r'([a-zA-Z])([一-鿿])',
+                    r'([一-鿿])([0-9])', r'([0-9])([一-鿿])'):
+        line = re.sub(pattern, r'\1 \2', line)
+    line = line.replace('__NEWLINE__', r'\N')
+    return re.sub(r'\s+', ' ', line).strip()
+
+def legacy_clean_response(response):
+    for phrase in ["影片開始", "影片結束", "影片開始時", "影片結束時", "影片一開始", "影片最後", "影片結尾"]:
+        response = response.replace(phrase, "")
+    return "\n".join([line.strip() for line in response.split("\n") if line.strip()])
+
+class TestTextNormalizer(unittest.TestCase):
+    def test_cjk_spacing_matches_legacy(self):
+        """測試單次掃描的中英文空格與原本兩次取代相同"""
+        samples = ["中a中", "中1中2中", "abc中文def", "2023年10月", "已經有空格 a 中", "純中文", "plain text", ""]
+        for text in samples:
+            self.assertEqual(add_cjk_spacing(text), legacy_add_spaces(text), text)
+
+    def test_normalize_llm_text(self):
+        """測試繁簡轉換、移除粗體標記後再加空格"""
+        self.assertEqual(normalize_llm_text("**简介**：这部MV"), "簡介：這部 MV")
+        self.assertEqual(normalize_llm_text("中**a**"), "中 a")
+
+    def test_gutenberg(self):
+        """測試分段並包裝為古騰堡段落"""
+        paragraphs = split_paragraphs("第一段\n\n  \n\n 第二段 ")
+        self.assertEqual(paragraphs, ["第一段", "第二段"])
+        self.assertEqual(
+            to_gutenberg(paragraphs),
+            "<!-- wp:paragraph -->\n<p>第一段</p>\n<!-- /wp:paragraph -->\n\n"
+            "<!-- wp:paragraph -->\n<p>第二段</p>\n<!-- /wp:paragraph -->"
+        )
+
+    def test_subtitle_line_matches_legacy(self):
+        """測試字幕行格式與原本相同，\\N 換行標記保持不變"""
+        samples = [
+            "我今天要去Tokyo看3場演唱會\\N然後再回台北……\n",
+            "價格是100-20=80元，折扣*2/3\n",
+            "路徑a\\b\\\\N中\n",
+            "第\\N2集\n",
+            "  多餘   空白\t\n",
+        ]
+        for line in samples:
+            self.assertEqual(format_subtitle_line(line), legacy_subtitle_line(line), line)
+        self.assertEqual(format_subtitle_line("台北\\N台中\n"), "台北\\N台中")
+
+    def test_remove_phrases_matches_legacy(self):
+        """測試一次移除敘述詞語與原本逐一取代相同"""
+        text = "影片開始時，畫面出現夜景。\n\n  影片一開始主角登場  \n影片結束時大合照\n影片結尾"
+        self.assertEqual(clean_lines(remove_phrases(text)), legacy_clean_response(text))
+
+    def test_shared_converter(self):
+        """測試轉換器在程序內共用"""
+        self.assertIs(get_converter(), get_converter())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import time
+import tempfile
+
+# Mock logger
+sys.modules['logger'] = MagicMock()
+
+# 加入專案根目錄與 scripts 目錄到 Python 路徑（video_probe 以模組名稱匯入 result_cache）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import result_cache
+from scripts import video_probe
+from scripts.video_probe import VideoInfo, probe_video
+
+def make_info(url):
+    """建立帶有大型 raw 的探測結果"""
+    return VideoInfo(
+        url=url, id='abcdefghijk', title='標題', duration=95, thumbnail='https://example.com/t.jpg',
+        formats=[{'format_id': '22', 'height': 720}], fetched_at=time.time(),
+        raw={'formats': [{'url': 'https://example.com/stream'}] * 1000}
+    )
+
+class TestVideoProbe(unittest.TestCase):
+    def setUp(self):
+        """使用獨立的快取目錄與空的記憶體快取"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        for patcher in (
+            patch.object(result_cache, 'CACHE_DIR', self.temp_dir.name),
+            patch.object(video_probe, '_disk_cache', None),
+            patch.dict(video_probe._memory_cache, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_disk_cache_excludes_raw(self):
+        """測試磁碟快取只保存 VideoInfo 欄位，raw 只留在記憶體"""
+        with patch.object(video_probe, '_extract', side_effect=make_info) as extract:
+            info = probe_video('https://youtu.be/abcdefghijk')
+            self.assertTrue(info.formats_fresh())
+            self.assertEqual(extract.call_count, 1)
+
+            # 新的程序：記憶體快取為空，從磁碟讀回
+            video_probe._memory_cache.clear()
+            cached = probe_video('https://www.youtube.com/watch?v=abcdefghijk')
+            self.assertEqual(extract.call_count, 1)
+
+        self.assertEqual((cached.title, cached.duration, cached.formats), ('標題', 95, info.formats))
+        self.assertEqual(cached.raw, {})
+        self.assertFalse(cached.formats_fresh())
+        stored = video_probe._get_disk_cache().get(info.url)
+        self.assertNotIn('raw', stored)
+
+if __name__ == '__main__':
+    unittest.main()